@@ -1,13 +1,28 @@
 from boto3 import client
+from botocore.config import Config
 from enum import Enum
 from config import config
+import threading
 
 class ServiceNameAWS(Enum):
     S3 = 's3'
     SQS = 'sqs'
 
+# Clients are thread-safe and reused across warm invocations
+_instances = {}
+_instances_lock = threading.Lock()
+
 def get_instance_aws(service_name: ServiceNameAWS):
-    return client(
-        service_name.value,
-        region_name=config.REGION,
-    )
+    with _instances_lock:
+        instance = _instances.get(service_name)
+        if instance is None:
+            instance = client(
+                service_name.value,
+                region_name=config.REGION,
+                config=Config(
+                    max_pool_connections=config.AWS_MAX_POOL_CONNECTIONS,
+                    retries={"mode": "standard"},
+                ),
+            )
+            _instances[service_name] = instance
+        return instance
@@ -1,24 +1,144 @@
 from aws.boto_aws import get_instance_aws, ServiceNameAWS
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from config import config
+from certified_builder.utils.metrics import MetricsCollector, metrics as default_metrics
+from typing import BinaryIO, Dict, Iterable, Set, Tuple, Union
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 class S3Service:
-    def __init__(self):
+    def __init__(self, metrics: MetricsCollector = None):
         self.aws = get_instance_aws(
             ServiceNameAWS.S3
         )
         self.bucket_name = config.BUCKET_NAME
+        self.metrics = metrics or default_metrics
+        self.transfer_config = TransferConfig(
+            multipart_threshold=config.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=config.S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=config.S3_MAX_CONCURRENCY,
+        )
+        # One upload per pooled connection of the shared client
+        self.max_workers = config.AWS_MAX_POOL_CONNECTIONS
 
-    def upload_file(self, file_path: str, key: str):
+    def upload_file(self, file_path: str, key: str, delete_after: bool = False):
         try:
-            response = self.aws.upload_file(
-                file_path,
-                self.bucket_name,
-                key
-            )
-            logger.info(f"Arquivo {file_path} enviado para o bucket {self.bucket_name} com sucesso")
+            size = os.path.getsize(file_path)
+            with self.metrics.span("s3_upload"):
+                self.aws.upload_file(
+                    file_path,
+                    self.bucket_name,
+                    key,
+                    Config=self.transfer_config
+                )
+            self.metrics.add_bytes("s3_upload", size)
+            logger.debug(f"Arquivo {file_path} enviado para o bucket {self.bucket_name} com sucesso")
         except Exception as e:
             logger.error(f"Erro ao enviar o arquivo {file_path} para o bucket {self.bucket_name}: {e}")
             raise e
+        if delete_after:
+            # Free Lambda ephemeral storage once the copy is in S3
+            try:
+                os.remove(file_path)
+            except OSError as e:
+                logger.warning(f"Erro ao remover o arquivo temporário {file_path}: {e}")
+
+    def upload_fileobj(self, fileobj: BinaryIO, key: str, content_type: str = "image/png"):
+        try:
+            size = fileobj.seek(0, os.SEEK_END)
+            fileobj.seek(0)
+            with self.metrics.span("s3_upload"):
+                self.aws.upload_fileobj(
+                    fileobj,
+                    self.bucket_name,
+                    key,
+                    ExtraArgs={"ContentType": content_type},
+                    Config=self.transfer_config
+                )
+            self.metrics.add_bytes("s3_upload", size)
+            logger.debug(f"Objeto {key} enviado da memória para o bucket {self.bucket_name} com sucesso")
+        except Exception as e:
+            logger.error(f"Erro ao enviar o objeto {key} para o bucket {self.bucket_name}: {e}")
+            raise e
+
+    def upload_many(self, uploads: Iterable[Tuple[Union[str, BinaryIO], str]], delete_after: bool = False) -> Dict[str, dict]:
+        """Upload (file path or file object, key) pairs concurrently.
+
+        Returns {key: {"success": True}} or {key: {"success": False, "error": ...}}
+        for every key, so a partial failure does not abort the whole batch.
+        """
+        uploads = list(uploads)
+        if not uploads:
+            return {}
+
+        def upload(item):
+            payload, key = item
+            try:
+                if isinstance(payload, str):
+                    self.upload_file(payload, key, delete_after=delete_after)
+                else:
+                    self.upload_fileobj(payload, key)
+                return key, {"success": True}
+            except Exception as e:
+                return key, {"success": False, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(uploads))) as executor:
+            results = dict(executor.map(upload, uploads))
+
+        failed = sum(1 for result in results.values() if not result["success"])
+        logger.info(f"{len(results) - failed} de {len(results)} arquivos enviados para o bucket {self.bucket_name}")
+        return results
+
+    def exists(self, key: str) -> bool:
+        """Return True if key is already in the bucket (HEAD request)."""
+        try:
+            with self.metrics.span("s3_head"):
+                self.aws.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def existing_keys(self, keys: Iterable[str]) -> Set[str]:
+        """Return the keys already in the bucket.
+
+        Keys are grouped by prefix (``certificates/{product_id}/{order_id}/``)
+        and each prefix is listed once with ListObjectsV2, instead of one HEAD
+        request per key. The keys of a prefix whose listing fails are reported
+        as missing, so those certificates are generated again rather than
+        silently skipped.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return set()
+        prefixes = {}
+        for key in keys:
+            prefixes.setdefault(key.rpartition("/")[0] + "/", []).append(key)
+
+        def check(item):
+            prefix, prefix_keys = item
+            try:
+                listed = self.list_keys(prefix)
+            except Exception as e:
+                logger.warning(f"Erro ao listar o prefixo {prefix} no bucket {self.bucket_name}: {e}")
+                return set()
+            return listed.intersection(prefix_keys)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prefixes))) as executor:
+            existing = set().union(*executor.map(check, prefixes.items()))
+
+        logger.info(f"{len(existing)} de {len(keys)} certificados já existem no bucket {self.bucket_name}")
+        return existing
+
+    def list_keys(self, prefix: str) -> Set[str]:
+        """Return every key under prefix, following ListObjectsV2 pagination."""
+        listed = set()
+        with self.metrics.span("s3_list"):
+            for page in self.aws.get_paginator("list_objects_v2").paginate(Bucket=self.bucket_name, Prefix=prefix):
+                listed.update(item["Key"] for item in page.get("Contents", ()))
+        return listed
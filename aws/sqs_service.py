@@ -1,16 +1,28 @@
 from aws.boto_aws import get_instance_aws, ServiceNameAWS
 from config import config
-from botocore.exceptions import ClientError
+from certified_builder.utils.metrics import MetricsCollector, metrics as default_metrics
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+import hashlib
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# send_message_batch accepts at most 10 entries per call
+MAX_BATCH_ENTRIES = 10
+# Room left in each body for the message envelope and attributes
+MESSAGE_SIZE_MARGIN = 1024
+
 class SQSService:
-    def __init__(self):
+    def __init__(self, metrics: MetricsCollector = None):
         self.aws = get_instance_aws(ServiceNameAWS.SQS)
         self.queue_url = config.QUEUE_URL        
+        self.is_fifo = self.queue_url.endswith(".fifo")
+        self.max_message_bytes = config.SQS_MAX_MESSAGE_BYTES
+        self.metrics = metrics or default_metrics
 
     def send_message(self, messagens: List[Dict]):
         try:
@@ -26,3 +38,129 @@ class SQSService:
         except ClientError as e:
             logger.error(f"Erro ao enviar mensagem para a fila {self.queue_url}: {str(e)}")
             raise
+
+    def send_results(self, results: List[Dict], retries: int = 3, backoff: float = 0.2) -> int:
+        """Publish results split into messages below the SQS size limit.
+
+        Each message body is a JSON list of results, like send_message. The
+        messages are sent with send_message_batch (10 entries per call), the
+        calls run concurrently, and only the entries SQS reports as failed are
+        retried. On FIFO queues results are grouped by order_id, which becomes
+        the MessageGroupId, and the batches of one group are sent in order.
+
+        Returns the number of messages sent; raises RuntimeError if some
+        entries still fail after the retries.
+        """
+        if not results:
+            return 0
+
+        lanes = []
+        for group_id, group_results in self._groups(results).items():
+            entries = [
+                self._entry(body, group_id)
+                for body in self._pack(group_results)
+            ]
+            lanes.append(self._batches(entries))
+        if not self.is_fifo:
+            # Standard queues have no ordering, every batch can go in parallel
+            lanes = [[batch] for lane in lanes for batch in lane]
+
+        total = sum(len(batch) for lane in lanes for batch in lane)
+        logger.info(f"Enviando {len(results)} resultados para a fila {self.queue_url} em {total} mensagens")
+
+        def send_lane(lane):
+            failed = []
+            for batch in lane:
+                failed.extend(self._send_batch(batch, retries, backoff))
+            return failed
+
+        with ThreadPoolExecutor(max_workers=min(len(lanes), config.AWS_MAX_POOL_CONNECTIONS)) as executor:
+            failed = [entry for lane_failed in executor.map(send_lane, lanes) for entry in lane_failed]
+
+        if failed:
+            logger.error(f"{len(failed)} de {total} mensagens não foram enviadas para a fila {self.queue_url}: {failed}")
+            raise RuntimeError(f"Failed to send {len(failed)} of {total} result messages")
+        logger.info(f"{total} mensagens enviadas com sucesso")
+        return total
+
+    def _groups(self, results: List[Dict]) -> Dict[str, List[Dict]]:
+        if not self.is_fifo:
+            return {None: results}
+        groups = {}
+        for result in results:
+            groups.setdefault(str(result.get("order_id", "")), []).append(result)
+        return groups
+
+    def _pack(self, results: List[Dict]) -> List[str]:
+        """Split results into JSON list bodies that fit in one message."""
+        limit = self.max_message_bytes - MESSAGE_SIZE_MARGIN
+        bodies = []
+        current, current_size = [], 2  # "[" and "]"
+        for result in results:
+            item = json.dumps(result)
+            item_size = len(item.encode("utf-8"))
+            if item_size + 2 > limit:
+                raise ValueError(f"Result larger than the SQS message limit: {item_size} bytes")
+            # ", " separator between items
+            if current and current_size + item_size + 2 > limit:
+                bodies.append("[" + ", ".join(current) + "]")
+                current, current_size = [], 2
+            current_size += item_size + (2 if current else 0)
+            current.append(item)
+        if current:
+            bodies.append("[" + ", ".join(current) + "]")
+        return bodies
+
+    def _entry(self, body: str, group_id: str) -> Dict:
+        entry = {"MessageBody": body}
+        if self.is_fifo:
+            entry["MessageGroupId"] = group_id
+            entry["MessageDeduplicationId"] = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        return entry
+
+    def _batches(self, entries: List[Dict]) -> List[List[Dict]]:
+        """Group entries into send_message_batch calls within the entry and payload limits."""
+        batches = []
+        current, current_size = [], 0
+        for entry in entries:
+            size = len(entry["MessageBody"].encode("utf-8"))
+            if current and (len(current) == MAX_BATCH_ENTRIES or current_size + size > self.max_message_bytes):
+                batches.append(current)
+                current, current_size = [], 0
+            current.append(entry)
+            current_size += size
+        if current:
+            batches.append(current)
+        for batch in batches:
+            for position, entry in enumerate(batch):
+                entry["Id"] = str(position)
+        return batches
+
+    def _send_batch(self, entries: List[Dict], retries: int, backoff: float) -> List[Dict]:
+        """Send one batch, retrying only the failed entries; returns the failures left at the end."""
+        pending = entries
+        # Sender faults (bad request) would fail again, so they are never retried
+        permanent_failures = []
+        failures = []
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * (2 ** (attempt - 1)))
+            try:
+                with self.metrics.span("sqs_send"):
+                    response = self.aws.send_message_batch(QueueUrl=self.queue_url, Entries=pending)
+                self.metrics.add_bytes("sqs_send", sum(len(entry["MessageBody"].encode("utf-8")) for entry in pending))
+            except (ClientError, BotoCoreError) as e:
+                # Connection errors and timeouts (BotoCoreError) fail the whole batch like an API error
+                logger.warning(f"Erro ao enviar lote para a fila {self.queue_url} (tentativa {attempt + 1}): {str(e)}")
+                failures = [{"Id": entry["Id"], "Code": type(e).__name__, "Message": str(e)} for entry in pending]
+                continue
+
+            failed = response.get("Failed", [])
+            permanent_failures.extend(failure for failure in failed if failure.get("SenderFault"))
+            failures = [failure for failure in failed if not failure.get("SenderFault")]
+            if not failures:
+                break
+            logger.warning(f"{len(failures)} mensagens do lote falharam, tentando novamente")
+            retry_ids = {failure["Id"] for failure in failures}
+            pending = [entry for entry in pending if entry["Id"] in retry_ids]
+        return permanent_failures + failures
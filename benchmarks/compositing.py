@@ -0,0 +1,61 @@
+"""Microbenchmark of the canvas compositing backends: Pillow vs NumPy.
+
+Times rendering a certificate up to the RGB image handed to the encoder
+(Pillow renders RGBA and encode_image converts it; NumPy renders RGB).
+
+    python -m benchmarks.compositing --count 50
+"""
+import argparse
+import hashlib
+import sys
+import time
+
+
+def render_all(builder, participants, prepared_template):
+    seconds = 0.0
+    digests = []
+    for participant in participants:
+        start = time.perf_counter()
+        certificate = builder.render_certificate(participant, prepared_template)
+        rgb = certificate if certificate.mode == "RGB" else certificate.convert("RGB")
+        seconds += time.perf_counter() - start
+        digests.append(hashlib.sha256(rgb.tobytes()).digest())
+    return digests, seconds
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compositing backend microbenchmark")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--templates", nargs="+", default=["1080p", "a4_150dpi", "a4_300dpi"])
+    args = parser.parse_args(argv)
+
+    from benchmarks.fixtures import make_background, make_logo, synthetic_participants, TEMPLATE_SIZES
+    from certified_builder.certified_builder import CertifiedBuilder
+    from certified_builder.utils.compositing import NUMPY_AVAILABLE
+
+    if not NUMPY_AVAILABLE:
+        print("NumPy não instalado")
+        return 1
+
+    print(f"{args.count} certificados por template")
+    for template in args.templates:
+        participants = synthetic_participants(args.count, template)
+        background, logo = make_background(TEMPLATE_SIZES[template]), make_logo()
+        timings = {}
+        digests = {}
+        for backend in ("pillow", "numpy"):
+            builder = CertifiedBuilder(compositing=backend)
+            prepared_template = builder.prepare_template(background, logo)
+            # First render builds the template arrays, outside the measurement
+            builder.render_certificate(participants[0], prepared_template)
+            digests[backend], timings[backend] = render_all(builder, participants, prepared_template)
+        identical = sum(1 for left, right in zip(digests["pillow"], digests["numpy"]) if left == right)
+        for backend in ("pillow", "numpy"):
+            per_certificate = timings[backend] / args.count * 1000
+            print(f"{template + ' (' + backend + ')':<24}{per_certificate:>10.1f} ms/certificado")
+        print(f"{'':<24}{timings['pillow'] / timings['numpy']:>10.1f}x, {identical}/{args.count} idênticos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
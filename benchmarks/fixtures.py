@@ -0,0 +1,100 @@
+import random
+from datetime import datetime
+from typing import Dict, List, Tuple
+from PIL import Image, ImageDraw
+from models.participant import Participant
+from models.certificate import Certificate
+from models.event import Event
+
+# Landscape sizes of the backgrounds used by real events
+TEMPLATE_SIZES: Dict[str, Tuple[int, int]] = {
+    "1080p": (1920, 1080),
+    "a4_150dpi": (1754, 1240),
+    "a4_300dpi": (3508, 2480),
+}
+FIXTURE_HOST = "https://fixtures.certified-builder.local"
+
+FIRST_NAMES = ["Ana", "Bruno", "Camila", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João", "Larissa", "Matheus"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento", "Carvalho", "de Souza Lima"]
+DETAILS = (
+    "In recognition of their participation in the 84st edition of the Python Floripa Community Meeting, "
+    "held on March 29, 2025, in Florianópolis, Brazil."
+)
+
+
+def background_url(template: str) -> str:
+    return f"{FIXTURE_HOST}/{template}/background.png"
+
+
+def logo_url(template: str) -> str:
+    return f"{FIXTURE_HOST}/{template}/logo.png"
+
+
+def make_background(size: Tuple[int, int]) -> Image.Image:
+    """Return a deterministic textured background, so PNG encoding costs like a real template."""
+    width, height = size
+    horizontal = Image.linear_gradient("L").rotate(90).resize(size)
+    vertical = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    background = Image.merge("RGBA", (horizontal, vertical, radial, Image.new("L", size, 255)))
+    draw = ImageDraw.Draw(background)
+    shapes = random.Random(f"{width}x{height}")
+    for _ in range(40):
+        x, y = shapes.randrange(width), shapes.randrange(height)
+        radius = shapes.randrange(20, max(21, width // 8))
+        color = tuple(shapes.randrange(256) for _ in range(3)) + (255,)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), outline=color, width=3)
+    return background
+
+
+def make_logo() -> Image.Image:
+    """Return a deterministic logo with a transparent corner area."""
+    logo = Image.new("RGBA", (400, 400), (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((20, 20, 380, 380), fill=(30, 90, 160, 230))
+    return logo
+
+
+def fixture_images(templates: List[str]) -> Dict[str, Image.Image]:
+    """Map the fixture URLs of templates to their images, as fetch_files_certificate would."""
+    images = {}
+    logo = make_logo()
+    for template in templates:
+        images[background_url(template)] = make_background(TEMPLATE_SIZES[template])
+        images[logo_url(template)] = logo
+    return images
+
+
+def participant_payload(index: int, template: str, seed: int = 0) -> dict:
+    """Return one synthetic SQS participant, in the format read by the handler."""
+    names = random.Random(seed * 1_000_003 + index)
+    return {
+        "first_name": names.choice(FIRST_NAMES),
+        "last_name": " ".join(names.sample(LAST_NAMES, names.randint(1, 2))),
+        "email": f"participante{index}@example.com",
+        "phone": "(48) 90000-0000",
+        "cpf": "000.000.000-00",
+        "order_id": 1000 + index // 10,
+        "product_id": 316,
+        "product_name": "Python Floripa #84",
+        "certificate_details": DETAILS,
+        "certificate_logo": logo_url(template),
+        "certificate_background": background_url(template),
+        "order_date": "2025-03-26 20:55:25",
+    }
+
+
+def synthetic_participants(count: int, template: str, seed: int = 0) -> List[Participant]:
+    """Return count deterministic participants of an event using the given fixture template."""
+    participants = []
+    for index in range(count):
+        data = participant_payload(index, template, seed)
+        participants.append(Participant(
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            email=data["email"],
+            phone=data["phone"],
+            cpf=data["cpf"],
+            certificate=Certificate(details=data["certificate_details"], logo=data["certificate_logo"], background=data["certificate_background"]),
+            event=Event(order_id=data["order_id"], product_id=data["product_id"], product_name=data["product_name"], date=datetime(2025, 3, 26, 20, 55, 25)),
+        ))
+    return participants
@@ -0,0 +1,63 @@
+"""Microbenchmark of name and validation code rasterization: FreeType vs glyph atlas.
+
+    python -m benchmarks.glyphs --count 5000
+"""
+import argparse
+import hashlib
+import sys
+import time
+
+
+def draw_all(draw_text, texts, font, width, height):
+    from certified_builder.certified_builder import TEXT_COLOR
+    from certified_builder.utils.font_registry import font_registry
+    from PIL import Image
+
+    seconds = 0.0
+    digests = []
+    for text in texts:
+        bbox = font_registry.textbbox(text, font)
+        # Centered like the certificate, so positions keep their half-pixel offsets
+        position = ((width - (bbox[2] - bbox[0])) / 2, 8)
+        image = Image.new("RGBA", (width, height), (255, 255, 255, 0))
+        start = time.perf_counter()
+        draw_text(image, position, text, font, TEXT_COLOR)
+        seconds += time.perf_counter() - start
+        digests.append(hashlib.sha256(image.tobytes()).digest())
+    return digests, seconds
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Glyph atlas microbenchmark")
+    parser.add_argument("--count", type=int, default=5_000)
+    args = parser.parse_args(argv)
+
+    from PIL import ImageDraw
+    from benchmarks.fixtures import synthetic_participants
+    from certified_builder.certified_builder import FONT_NAME, NAME_FONT_SIZE, VALIDATION_CODE, VALIDATION_CODE_FONT_SIZE
+    from certified_builder.utils.font_registry import get_font
+    from certified_builder.utils.glyph_atlas import GlyphAtlas
+
+    def freetype(image, position, text, font, fill):
+        ImageDraw.Draw(image).text(position, text, fill=fill, font=font)
+
+    participants = synthetic_participants(args.count, "1080p")
+    cases = [
+        ("nomes", [participant.name_completed() for participant in participants], get_font(FONT_NAME, NAME_FONT_SIZE), 110),
+        ("códigos", [participant.formated_validation_code() for participant in participants], get_font(VALIDATION_CODE, VALIDATION_CODE_FONT_SIZE), 40),
+    ]
+
+    print(f"{args.count} certificados")
+    for label, texts, font, height in cases:
+        atlas = GlyphAtlas()
+        expected, freetype_seconds = draw_all(freetype, texts, font, 1920, height)
+        actual, atlas_seconds = draw_all(atlas.draw_text, texts, font, 1920, height)
+        identical = sum(1 for left, right in zip(expected, actual) if left == right)
+        print(f"{label + ' (FreeType)':<28}{freetype_seconds * 1000:>10.1f} ms")
+        print(f"{label + ' (atlas)':<28}{atlas_seconds * 1000:>10.1f} ms  ({freetype_seconds / atlas_seconds:.1f}x, "
+              f"{identical}/{len(texts)} idênticos, {atlas.stats()['glyphs_cached']} glifos)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Microbenchmark of participant ingestion and per-participant string work.
+
+    python -m benchmarks.participants --count 10000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime
+from typing import Optional
+
+os.environ.setdefault("REGION", "us-east-1")
+os.environ.setdefault("BUCKET_NAME", "benchmark")
+os.environ.setdefault("QUEUE_URL", "https://sqs.local/benchmark")
+os.environ.setdefault("VALIDATION_CODE_SECRET", "benchmark")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def legacy_participant_model():
+    """Return the Participant model as it was before bulk ingestion (EmailStr and a random code per instance)."""
+    from pydantic import BaseModel, EmailStr, Field
+    from models.certificate import Certificate
+    from models.event import Event
+
+    class LegacyParticipant(BaseModel):
+        first_name: str
+        last_name: str
+        email: EmailStr
+        phone: str
+        cpf: str
+        validation_code: Optional[str] = Field(default_factory=lambda: ''.join(random.choices(string.hexdigits, k=9)))
+        certificate: Optional[Certificate] = None
+        event: Optional[Event] = None
+
+    return LegacyParticipant
+
+
+def create_legacy_participant(participant_model, participant_data):
+    """Build a participant the way the handler did before: three models and strptime, one participant at a time."""
+    from models.certificate import Certificate
+    from models.event import Event
+
+    certificate = Certificate(
+        details=participant_data.get('certificate_details'),
+        logo=participant_data.get('certificate_logo'),
+        background=participant_data.get('certificate_background')
+    )
+    event = Event(
+        order_id=participant_data.get('order_id'),
+        product_id=participant_data.get('product_id'),
+        product_name=participant_data.get('product_name'),
+        date=datetime.strptime(participant_data.get('order_date'), "%Y-%m-%d %H:%M:%S"),
+        time_checkin=datetime.strptime(participant_data.get('time_checkin'), "%Y-%m-%d %H:%M:%S") if participant_data.get('time_checkin') else None,
+        checkin_latitude=float(participant_data.get('checkin_latitude')) if participant_data.get('checkin_latitude') else None,
+        checkin_longitude=float(participant_data.get('checkin_longitude')) if participant_data.get('checkin_longitude') else None
+    )
+    return participant_model(
+        first_name=participant_data.get('first_name'),
+        last_name=participant_data.get('last_name'),
+        email=participant_data.get('email'),
+        phone=participant_data.get('phone'),
+        cpf=participant_data.get('cpf', ''),
+        certificate=certificate,
+        event=event
+    )
+
+
+def derive_strings(participants):
+    # A certificate asks for its name, code and file name several times (render, key, result)
+    for participant in participants:
+        participant.name_completed()
+        participant.formated_validation_code()
+        participant.create_name_certificate()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Participant ingestion microbenchmark")
+    parser.add_argument("--count", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    import lambda_function
+    from benchmarks.fixtures import participant_payload
+
+    payload = [participant_payload(index, "1080p") for index in range(args.count)]
+    legacy_model = legacy_participant_model()
+    # Build the TypeAdapter and warm imports outside the measurements
+    lambda_function.create_participant_objects(payload[:1])
+    create_legacy_participant(legacy_model, payload[0])
+
+    _, one_by_one = timed(lambda: [create_legacy_participant(legacy_model, data) for data in payload])
+    created, bulk = timed(lambda_function.create_participant_objects, payload)
+    participants = [participant for participant, _ in created]
+    _, first_pass = timed(derive_strings, participants)
+    _, cached_pass = timed(derive_strings, participants)
+
+    print(f"{args.count} participantes")
+    print(f"{'modelos separados (um a um, anterior)':<40}{one_by_one * 1000:>10.1f} ms")
+    print(f"{'create_participant_objects (TypeAdapter)':<40}{bulk * 1000:>10.1f} ms  ({one_by_one / bulk:.1f}x)")
+    print(f"{'nome, código e arquivo (1ª vez)':<40}{first_pass * 1000:>10.1f} ms")
+    print(f"{'nome, código e arquivo (memoizados)':<40}{cached_pass * 1000:>10.1f} ms  ({first_pass / cached_pass:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
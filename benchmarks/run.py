@@ -0,0 +1,243 @@
+"""Offline throughput benchmark for certificate generation.
+
+Every scenario runs in a fresh interpreter, so peak RSS and warm caches do
+not leak between them. Templates are generated locally and image downloads,
+S3 and SQS are stubbed, so results only depend on the machine and the code.
+
+    python -m benchmarks.run --count 50
+    python -m benchmarks.run --save-baseline main
+    python -m benchmarks.run --baseline main --fail-on-regression
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+SCENARIOS = ("builder", "handler")
+DEFAULT_TEMPLATES = ("1080p", "a4_150dpi", "a4_300dpi")
+# Relative change in throughput or p99 latency reported as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of values."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], seconds: float) -> Dict:
+    from certified_builder.utils.metrics import peak_rss_bytes
+    return {
+        "count": len(latencies),
+        "seconds": round(seconds, 4),
+        "certificates_per_second": round(len(latencies) / seconds, 3) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(peak_rss_bytes() / (1024 * 1024), 1),
+    }
+
+
+def run_builder(template: str, count: int, output_profile: str = None) -> Dict:
+    """Time CertifiedBuilder.build_certificates, certificates saved to a temporary directory."""
+    from benchmarks.fixtures import fixture_images, synthetic_participants
+    from certified_builder.certified_builder import CertifiedBuilder
+
+    images = fixture_images([template])
+    participants = synthetic_participants(count, template)
+    builder = CertifiedBuilder(**({"output_profile": output_profile} if output_profile else {}))
+    latencies = []
+    build_one = builder._build_certificate
+
+    def timed_build(participant, prepared_template, in_memory=False):
+        start = time.perf_counter()
+        result = build_one(participant, prepared_template, in_memory)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    with tempfile.TemporaryDirectory() as temp_dir, \
+         patch("certified_builder.certified_builder.fetch_files_certificate", side_effect=lambda urls: {url: images[url] for url in urls}), \
+         patch.object(builder, "_build_certificate", side_effect=timed_build):
+        builder.temp_dir = temp_dir
+        start = time.perf_counter()
+        results = builder.build_certificates(participants)
+        seconds = time.perf_counter() - start
+
+    failed = [result["error"] for result in results if not result["success"]]
+    if failed:
+        raise RuntimeError(f"{len(failed)} certificates failed: {failed[0]}")
+    return summarize(latencies, seconds)
+
+
+class StubS3:
+    """S3Service stand-in that keeps nothing and records when each upload finished."""
+
+    max_workers = 8
+
+    def __init__(self):
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def existing_keys(self, keys):
+        return set()
+
+    def upload_fileobj(self, fileobj, key, content_type="image/png"):
+        self._finish(key)
+
+    def upload_file(self, file_path, key, delete_after=False):
+        if delete_after:
+            os.remove(file_path)
+        self._finish(key)
+
+    def _finish(self, key):
+        with self._lock:
+            self.finished[key] = time.perf_counter()
+
+
+class StubSQS:
+    def send_results(self, results, retries=3, backoff=0.2):
+        return len(results)
+
+
+def run_handler(template: str, count: int, output_profile: str = None) -> Dict:
+    """Time lambda_handler end to end (render, encode, upload) with stubbed AWS services."""
+    import lambda_function
+    from benchmarks.fixtures import fixture_images, participant_payload
+
+    images = fixture_images([template])
+    payload = [participant_payload(index, template) for index in range(count)]
+    if output_profile:
+        for participant in payload:
+            participant["certificate_output_profile"] = output_profile
+    event = {"Records": [{"messageId": "benchmark", "body": json.dumps(payload)}]}
+
+    s3 = StubS3()
+    lambda_function._warm_state.update(s3_service=s3, sqs_service=StubSQS())
+    builder = lambda_function.get_builder()
+    started = {}
+    render = builder.render_certificate
+
+    def timed_render(participant, prepared_template):
+        started[builder.certificate_key(participant)] = time.perf_counter()
+        return render(participant, prepared_template)
+
+    with patch("certified_builder.certified_builder.fetch_files_certificate", side_effect=lambda urls: {url: images[url] for url in urls}), \
+         patch.object(builder, "render_certificate", side_effect=timed_render):
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(event, None)
+        seconds = time.perf_counter() - start
+
+    if response["statusCode"] != 200 or response["batchItemFailures"]:
+        raise RuntimeError(f"Handler failed: {response['body']}")
+    # Latency of a certificate: from the start of its rendering to the end of its upload
+    latencies = [s3.finished[key] - started[key] for key in started]
+    return summarize(latencies, seconds)
+
+
+def run_scenario(scenario: str, template: str, count: int, output_profile: str = None) -> Dict:
+    runner = {"builder": run_builder, "handler": run_handler}[scenario]
+    return runner(template, count, output_profile)
+
+
+def run_isolated(scenario: str, template: str, count: int, output_profile: str = None) -> Dict:
+    """Run one scenario in a fresh interpreter and return its summary."""
+    command = [sys.executable, "-m", "benchmarks.run", "--worker", scenario, template, "--count", str(count)]
+    if output_profile:
+        command += ["--output-profile", output_profile]
+    env = {"REGION": "us-east-1", "BUCKET_NAME": "benchmark", "QUEUE_URL": "https://sqs.local/benchmark", "VALIDATION_CODE_SECRET": "benchmark", **os.environ}
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario}/{template} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    """Compare two result sets, flagging throughput drops and p99 increases above tolerance."""
+    rows = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        throughput = result["certificates_per_second"] / reference["certificates_per_second"] - 1
+        p99 = result["p99_ms"] / reference["p99_ms"] - 1
+        rows.append({
+            "scenario": name,
+            "throughput_change": round(throughput, 4),
+            "p99_change": round(p99, 4),
+            "regression": throughput < -tolerance or p99 > tolerance,
+        })
+    return rows
+
+
+def environment() -> Dict:
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline certificate generation benchmark")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--templates", nargs="+", default=list(DEFAULT_TEMPLATES))
+    parser.add_argument("--count", type=int, default=30, help="certificates per scenario")
+    parser.add_argument("--output-profile", help="output profile used for every certificate")
+    parser.add_argument("--save-baseline", metavar="NAME", help="save results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--baseline", metavar="NAME", help="compare against a saved baseline (name or path)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker", nargs=2, metavar=("SCENARIO", "TEMPLATE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker[0], args.worker[1], args.count, args.output_profile)))
+        return 0
+
+    current = {"environment": environment(), "count": args.count, "output_profile": args.output_profile, "results": {}}
+    print(f"{'scenario':<24}{'cert/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+    for scenario in args.scenarios:
+        for template in args.templates:
+            name = f"{scenario}/{template}"
+            result = run_isolated(scenario, template, args.count, args.output_profile)
+            current["results"][name] = result
+            print(f"{name:<24}{result['certificates_per_second']:>10.2f}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['peak_rss_mb']:>10.1f}")
+
+    if args.save_baseline:
+        path = baseline_path(args.save_baseline)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {path}")
+
+    if args.baseline:
+        with open(baseline_path(args.baseline), "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.tolerance)
+        print(f"\n{'scenario':<24}{'cert/s':>10}{'p99':>10}")
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['scenario']:<24}{row['throughput_change']:>+10.1%}{row['p99_change']:>+10.1%}{flag}")
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
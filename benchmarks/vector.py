@@ -0,0 +1,51 @@
+"""Microbenchmark of the vector backend: raster PNG vs SVG vs PDF certificates.
+
+Times rendering and encoding each certificate, the template already
+prepared from its URLs like in a batch (and its PNG already encoded for the
+profiles that embed it).
+
+    python -m benchmarks.vector --count 50
+"""
+import argparse
+import sys
+import time
+
+
+def encode_all(builder, participants, prepared_template):
+    seconds = 0.0
+    size = 0
+    for participant in participants:
+        start = time.perf_counter()
+        encoded = builder.encode_certificate(builder.render_certificate(participant, prepared_template), participant)
+        seconds += time.perf_counter() - start
+        size += encoded.size
+    return seconds, size
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vector backend microbenchmark")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--templates", nargs="+", default=["1080p", "a4_150dpi", "a4_300dpi"])
+    parser.add_argument("--profiles", nargs="+", default=["png_fast", "svg", "svg_linked", "pdf"])
+    args = parser.parse_args(argv)
+
+    from benchmarks.fixtures import make_background, make_logo, synthetic_participants, TEMPLATE_SIZES
+    from certified_builder.certified_builder import CertifiedBuilder
+    from certified_builder.prepared_template import template_key
+
+    print(f"{args.count} certificados por template")
+    for template in args.templates:
+        participants = synthetic_participants(args.count, template)
+        background, logo = make_background(TEMPLATE_SIZES[template]), make_logo()
+        for profile in args.profiles:
+            builder = CertifiedBuilder(output_profile=profile)
+            prepared_template = builder.prepare_template(background, logo, template_key(participants[0].certificate))
+            # First certificate encodes the template PNG once, outside the measurement
+            builder.encode_certificate(builder.render_certificate(participants[0], prepared_template), participants[0])
+            seconds, size = encode_all(builder, participants, prepared_template)
+            print(f"{template + ' (' + profile + ')':<24}{seconds / args.count * 1000:>10.1f} ms/certificado{size / args.count / 1024:>10.1f} KB/certificado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,93 @@
+import hashlib
 import logging
-from typing import List
+from collections import OrderedDict
+from typing import Iterator, List, Tuple
 from models.participant import Participant
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+import math
 import os
-from certified_builder.utils.fetch_file_certificate import fetch_file_certificate
+from certified_builder.utils.fetch_file_certificate import fetch_files_certificate
+from certified_builder.utils.encoder import (
+    DEFAULT_OUTPUT_PROFILE,
+    EncodedCertificate,
+    OutputProfile,
+    encode_image,
+    get_output_profile,
+)
+from certified_builder.utils.compositing import COMPOSITING_BACKENDS, COMPOSITING_NUMPY, COMPOSITING_PILLOW, NUMPY_AVAILABLE
+from certified_builder.utils.font_registry import font_registry, get_font
+from certified_builder.utils.glyph_atlas import glyph_atlas
+from certified_builder.utils.pdf_writer import DEFAULT_PDF_DPI, PdfWriter, png_idat
+from certified_builder.utils.image_cache import image_cache
+from certified_builder.utils.metrics import MetricsCollector, metrics as default_metrics
+from certified_builder.utils.text_layout import text_layout
+from certified_builder.utils.vector_document import TextRun, VectorCertificate, encode_vector
+from certified_builder.parallel import DEFAULT_CHUNK_TIMEOUT, fork_available, iter_in_processes
+from certified_builder.prepared_template import (
+    LOGO_POSITION,
+    LOGO_SIZE,
+    PreparedTemplate,
+    ensure_valid_rgba,
+    intersects,
+    template_key,
+)
 import tempfile
 FONT_NAME = os.path.join(os.path.dirname(__file__), "fonts/PinyonScript/PinyonScript-Regular.ttf")
 VALIDATION_CODE = os.path.join(os.path.dirname(__file__), "fonts/ChakraPetch/ChakraPetch-SemiBold.ttf")
 DETAILS_FONT = os.path.join(os.path.dirname(__file__), "fonts/ChakraPetch/ChakraPetch-Regular.ttf")
 TEXT_COLOR = (0, 0, 0)
+NAME_FONT_SIZE = 70
+DETAILS_FONT_SIZE = 18
+VALIDATION_CODE_FONT_SIZE = 20
+# Long names are shrunk down to this size to keep this margin on both sides
+MIN_NAME_FONT_SIZE = 36
+NAME_MARGIN = 100
+# Details lines wider than the certificate minus this margin on both sides are wrapped
+DETAILS_MARGIN = 100
+# Pages per PDF file in build_pdfs
+PDF_PAGES_PER_FILE = 500
+# Prepared templates kept between batches of a warm container
+PREPARED_TEMPLATE_CACHE_SIZE = 4
+# Extra rows kept around each text band so no antialiased pixel is clipped
+LAYER_PADDING = 4
+
+RENDER_MODE_CANVAS = "canvas"
+RENDER_MODE_LEGACY = "legacy"
+RENDER_MODES = (RENDER_MODE_CANVAS, RENDER_MODE_LEGACY)
 
 logger = logging.getLogger(__name__)
 
 class CertifiedBuilder:
-    def __init__(self):
+    def __init__(self, render_mode: str = RENDER_MODE_CANVAS, workers: int = 1, chunk_size: int = 16, output_profile: str = DEFAULT_OUTPUT_PROFILE, template_cache_size: int = PREPARED_TEMPLATE_CACHE_SIZE, metrics: MetricsCollector = None, use_glyph_atlas: bool = True, compositing: str = COMPOSITING_PILLOW, chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT):
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Invalid render mode: {render_mode}")
+        if compositing not in COMPOSITING_BACKENDS:
+            raise ValueError(f"Invalid compositing backend: {compositing}")
+        self.render_mode = render_mode
+        # Opt-in NumPy blending of the canvas bands, Pillow when NumPy is not installed
+        if compositing == COMPOSITING_NUMPY and not NUMPY_AVAILABLE:
+            logger.warning("NumPy não instalado, usando composição do Pillow")
+            compositing = COMPOSITING_PILLOW
+        self.compositing = compositing
+        # Canvas mode draws the name and validation code from cached glyph bitmaps (same pixels as FreeType)
+        self.use_glyph_atlas = use_glyph_atlas
+        # Per-stage timings, shared with the AWS services unless one is injected
+        self.metrics = metrics or default_metrics
+        # Default encoding, overridden per event by Certificate.output_profile
+        self.output_profile = get_output_profile(output_profile).name
+        # Opt-in parallel rendering in forked processes (workers > 1)
+        if workers > 1 and not fork_available():
+            logger.warning("Renderização paralela indisponível nesta plataforma, usando um único processo")
+            workers = 1
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.chunk_timeout = chunk_timeout
+        # (background, logo, prepared template) per template key, reused while the cached images are unchanged
+        self.template_cache_size = template_cache_size
+        self._prepared_templates = OrderedDict()
+        # Cache statistics of the last build_certificates call
+        self.last_batch_stats = {}
         # Ensure temp directory exists
         self.temp_dir = "/tmp/certificates"
         os.makedirs(self.temp_dir, exist_ok=True)
@@ -22,87 +95,572 @@ class CertifiedBuilder:
         
     def build_certificates(self, participants: List[Participant]):
         """Build certificates for all participants."""
+        results = [None] * len(participants)
+        for index, result in self.build_certificates_iter(participants):
+            results[index] = result
+        return results
+
+    def build_certificates_iter(self, participants: List[Participant], in_memory: bool = False) -> Iterator[Tuple[int, dict]]:
+        """Yield (index, result) for every participant as soon as its certificate is ready.
+
+        Results come in completion order (grouped by template, chunk by chunk
+        with worker processes); index is the participant's position in
+        participants. By default each certificate is saved to temp_dir as in
+        build_certificates. With in_memory nothing is written: the result
+        holds the EncodedCertificate under "certificate" and its
+        "certificate_path" is None.
+        """
         try:
             logger.info(f"Iniciando geração de {len(participants)} certificados")
-            results = []
-            
-            # Cache for background and logo if they are the same for all participants
-            certificate_template = None
-            logo = None
-            
-            # Check if all participants share the same background and logo
-            if participants:
-                first_participant = participants[0]
-                all_same_background = all(p.certificate.background == first_participant.certificate.background for p in participants)
-                all_same_logo = all(p.certificate.logo == first_participant.certificate.logo for p in participants)
-                
-                # Download shared resources once if they are the same for all
-                if all_same_background:
-                    certificate_template = self._download_image(first_participant.certificate.background)
-                if all_same_logo:
-                    logo = self._download_image(first_participant.certificate.logo)
-            
-            for participant in participants:
-                try:
-                    # Download template and logo only if they are not shared
-                    if not all_same_background:
-                        certificate_template = self._download_image(participant.certificate.background)
-                    if not all_same_logo:
-                        logo = self._download_image(participant.certificate.logo)
-                    
-                    # Generate and save certificate
-                    certificate_generated = self.generate_certificate(participant, certificate_template, logo)
-                    certificate_path = self.save_certificate(certificate_generated, participant)
-                    
-                    results.append({
-                        "participant": participant.model_dump(),
-                        "certificate_path": certificate_path,
-                        "certificate_key": f"certificates/{participant.event.product_id}/{participant.event.order_id}/{participant.create_name_certificate()}",
-                        "success": True
-                    })
-                                        
-                    logger.info(f"Certificado gerado para {participant.name_completed()} com codigo de validação {participant.formated_validation_code()}")
-                except Exception as e:
-                    logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(e)}")
-                    results.append({
-                        "participant": participant.model_dump(),
-                        "error": str(e),
-                        "success": False
-                    })
-                
-            return results
+            generated = 0
+
+            if self.workers > 1:
+                batch_results = self._build_in_processes(participants, in_memory)
+            else:
+                batch_results = self._build_in_process(participants, in_memory)
+            for index, result in batch_results:
+                generated += result["success"]
+                yield index, result
+
+            self._record_batch_stats()
+            logger.info(f"{generated} de {len(participants)} certificados gerados")
         except Exception as e:
             logger.error(f"Erro geral na geração de certificados: {str(e)}")
             raise
 
-    def _download_image(self, url: str) -> Image:
-        """Download and open image with error handling."""
+    def _build_in_process(self, participants: List[Participant], in_memory: bool) -> Iterator[Tuple[int, dict]]:
+        for members, prepared_template, error in self.prepared_groups(participants):
+            if error is not None:
+                yield from self._group_errors(members, error)
+                continue
+            for index, participant in members:
+                yield index, self._build_certificate(participant, prepared_template, in_memory)
+
+    def _build_in_processes(self, participants: List[Participant], in_memory: bool) -> Iterator[Tuple[int, dict]]:
+        """Build every certificate of the batch in one set of forked workers.
+
+        Every template is prepared first and the workers are forked once,
+        before the first result is yielded, so no fork happens after the
+        caller has started threads.
+        """
+        items, failed = [], []
+        for members, prepared_template, error in self.prepared_groups(participants):
+            if error is not None:
+                failed.append((members, error))
+                continue
+            if any(self._embeds_template(participant, prepared_template) for _, participant in members):
+                # Encoded before forking so the workers share the template PNG
+                prepared_template.background_png()
+            items.extend((index, participant, prepared_template) for index, participant in members)
+
+        if items:
+            batch_results = iter_in_processes(
+                lambda item: self._build_certificate(item[1], item[2], in_memory),
+                items,
+                self.workers,
+                self.chunk_size,
+                lambda item, error: self._error_result(item[1], error),
+                self.chunk_timeout,
+                # Spans recorded in the workers come back with each chunk
+                chunk_state=self.metrics.drain,
+                merge_state=self.metrics.merge,
+            )
+            for position, result in batch_results:
+                yield items[position][0], result
+        for members, error in failed:
+            yield from self._group_errors(members, error)
+
+    def _group_errors(self, members: list, error: Exception) -> Iterator[Tuple[int, dict]]:
+        for index, participant in members:
+            logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(error)}")
+            yield index, self._error_result(participant, error)
+
+    def build_pdfs(self, participants: List[Participant], pages_per_file: int = PDF_PAGES_PER_FILE, in_memory: bool = False, dpi: int = DEFAULT_PDF_DPI) -> Iterator[dict]:
+        """Render the certificates into multi-page PDFs, one page per participant, yielding one result per file.
+
+        Participants are split by event (product_id) and each event's pages
+        into files of at most pages_per_file pages, written incrementally
+        as the pages are rendered. Every template background is embedded
+        once per file; a page draws it and adds only the name, details and
+        validation code tiles on top, with the same pixels as the PNG. For
+        events with a vector output profile (svg or pdf) the page typesets
+        those lines instead, with fonts embedded once per file.
+
+        A file result holds its S3 certificate_key, its certificate_path (or,
+        with in_memory, the EncodedCertificate under "certificate"), the page
+        count, the participants of its pages and the error results of those
+        that could not be rendered. Pages are rendered in this process.
+        """
         try:
-            return fetch_file_certificate(url)
+            logger.info(f"Iniciando geração de PDFs para {len(participants)} certificados")
+            chunks = {}
+
+            for members, prepared_template, error in self.prepared_groups(participants):
+                for _, participant in members:
+                    product_id = participant.event.product_id
+                    chunk = chunks.get(product_id)
+                    if chunk is None:
+                        chunk = chunks[product_id] = self._open_pdf_chunk(product_id, in_memory, dpi)
+                    if error is not None:
+                        logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(error)}")
+                        chunk["errors"].append(self._error_result(participant, error))
+                        continue
+                    try:
+                        self._add_pdf_page(chunk, participant, prepared_template)
+                    except Exception as e:
+                        logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(e)}")
+                        chunk["errors"].append(self._error_result(participant, e))
+                        continue
+                    if chunk["writer"].page_count >= pages_per_file:
+                        yield self._close_pdf_chunk(chunks.pop(product_id))
+
+            for chunk in chunks.values():
+                yield self._close_pdf_chunk(chunk)
+            self._record_batch_stats()
         except Exception as e:
-            logger.error(f"Erro ao baixar imagem de {url}: {str(e)}")
-            raise RuntimeError(f"Error downloading image from {url}: {str(e)}")
+            logger.error(f"Erro geral na geração de PDFs: {str(e)}")
+            raise
 
-    def _ensure_valid_rgba(self, img: Image) -> Image:
-        """Ensure image has a valid RGBA mode with proper transparency channel."""
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
+    def _open_pdf_chunk(self, product_id: int, in_memory: bool, dpi: int) -> dict:
+        if in_memory:
+            fileobj = EncodedCertificate(get_output_profile("pdf"))
+        else:
+            fileobj = tempfile.NamedTemporaryFile(dir=self.temp_dir, prefix=f"{product_id}-", suffix=".pdf", delete=False)
+        return {
+            "product_id": product_id,
+            "fileobj": fileobj,
+            "writer": PdfWriter(fileobj, dpi=dpi),
+            # Background image object of each template already embedded in this file
+            "backgrounds": {},
+            # Font object of each font path used by the vector pages of this file
+            "fonts": {},
+            "participants": [],
+            "keys": [],
+            "errors": [],
+        }
+
+    def _add_pdf_page(self, chunk: dict, participant: Participant, prepared_template: PreparedTemplate):
+        writer = chunk["writer"]
+        size = prepared_template.size
+        if self.output_profile_for(participant).vector:
+            certificate = self.render_certificate(participant, prepared_template)
+            with self.metrics.span("encode"):
+                background = chunk["backgrounds"].get(prepared_template.key)
+                if background is None:
+                    background = chunk["backgrounds"][prepared_template.key] = writer.add_image_data(png_idat(certificate.background), size)
+                certificate.add_pdf_page(writer, background, chunk["fonts"])
+            chunk["participants"].append(participant)
+            chunk["keys"].append(self.certificate_key(participant))
+            return
+        if self.render_mode == RENDER_MODE_LEGACY:
+            # Legacy renders have no shared background, each page is a full image
+            certificate = self.render_certificate(participant, prepared_template)
+            with self.metrics.span("encode"):
+                placements = [(writer.add_image(certificate), (0, 0) + size)]
+        else:
+            tiles = self.render_certificate_tiles(participant, prepared_template)
+            with self.metrics.span("encode"):
+                background = chunk["backgrounds"].get(prepared_template.key)
+                if background is None:
+                    background = chunk["backgrounds"][prepared_template.key] = writer.add_image(prepared_template.image)
+                placements = [(background, (0, 0) + size)]
+                placements += [(writer.add_image(tile), box) for box, tile in tiles]
+        writer.add_page(size, placements)
+        chunk["participants"].append(participant)
+        chunk["keys"].append(self.certificate_key(participant))
+
+    def _close_pdf_chunk(self, chunk: dict) -> dict:
+        writer, fileobj = chunk["writer"], chunk["fileobj"]
+        result = {
+            "certificate_path": None,
+            "certificate_key": None,
+            "pages": writer.page_count,
+            "participants": [participant.model_dump() for participant in chunk["participants"]],
+            "errors": chunk["errors"],
+            "success": writer.page_count > 0,
+        }
+        if writer.page_count == 0:
+            fileobj.close()
+            if not isinstance(fileobj, EncodedCertificate):
+                os.remove(fileobj.name)
+            return result
+
+        writer.close()
+        # Named after its pages, so a redelivered batch overwrites the same object
+        digest = hashlib.sha256("\n".join(chunk["keys"]).encode("utf-8")).hexdigest()[:16]
+        result["certificate_key"] = f"certificates/{chunk['product_id']}/pdf/{digest}.pdf"
+        if isinstance(fileobj, EncodedCertificate):
+            fileobj.seek(0)
+            result["certificate"] = fileobj
+            result["certificate_bytes"] = fileobj.size
+        else:
+            fileobj.close()
+            certificate_path = os.path.join(self.temp_dir, f"{chunk['product_id']}-{digest}.pdf")
+            os.replace(fileobj.name, certificate_path)
+            result["certificate_path"] = certificate_path
+            result["certificate_bytes"] = os.path.getsize(certificate_path)
+        self.metrics.add_bytes("save", result["certificate_bytes"])
+        logger.info(f"PDF com {writer.page_count} certificados gerado: {result['certificate_key']}")
+        return result
+
+    def prepared_groups(self, participants: List[Participant]):
+        """Yield (members, prepared_template, error) per template, members being (index, participant) pairs.
+
+        Participants are grouped by (background URL, logo URL) and each
+        distinct URL is fetched once; error is set when the group's images
+        could not be downloaded or prepared.
+        """
+        self.reset_batch_stats()
+        groups = self._group_by_template(participants)
+        images = self._download_images([url for key in groups for url in key])
+        logger.info(f"{len(groups)} templates distintos, {len(images)} imagens distintas")
         
-        # Some PNG images may have problematic transparency channels
-        # Create a new image with proper alpha channel
+        for key, members in groups.items():
+            try:
+                # Template prepared once and shared by every participant of the group
+                prepared_template = self._prepared_template(key, self._downloaded(images, key[0]), self._downloaded(images, key[1]))
+            except Exception as e:
+                yield members, None, e
+                continue
+            yield members, prepared_template, None
+
+    def _prepared_template(self, key: tuple, background: Image, logo: Image) -> PreparedTemplate:
+        """Return the prepared template for key, reusing the one of a previous batch if its images did not change."""
+        cached = self._prepared_templates.get(key)
+        # The image cache returns the same objects until a URL's content changes
+        if cached is not None and cached[0] is background and cached[1] is logo:
+            self._prepared_templates.move_to_end(key)
+            return cached[2]
+        with self.metrics.span("prepare_template"):
+            prepared_template = self.prepare_template(background, logo, key)
+        if self.template_cache_size > 0:
+            self._prepared_templates[key] = (background, logo, prepared_template)
+            while len(self._prepared_templates) > self.template_cache_size:
+                self._prepared_templates.popitem(last=False)
+        return prepared_template
+
+    def prewarm(self):
+        """Load the fonts used by every certificate ahead of the first batch."""
+        for path, size in ((FONT_NAME, NAME_FONT_SIZE), (DETAILS_FONT, DETAILS_FONT_SIZE), (VALIDATION_CODE, VALIDATION_CODE_FONT_SIZE)):
+            get_font(path, size)
+
+    def render_certificates(self, participants: List[Participant]):
+        """Yield (index, participant, image, error) as each certificate is rendered, without saving it."""
+        for members, prepared_template, error in self.prepared_groups(participants):
+            for index, participant in members:
+                certificate, certificate_error = None, error
+                if error is None:
+                    try:
+                        certificate = self.render_certificate(participant, prepared_template)
+                    except Exception as e:
+                        certificate_error = e
+                yield index, participant, certificate, certificate_error
+        self._record_batch_stats()
+
+    def reset_batch_stats(self):
+        """Forget the stats of the previous batch, so a batch that renders nothing does not report them."""
+        image_cache.reset_stats()
+        text_layout.reset_stats()
+        glyph_atlas.reset_stats()
+        self.last_batch_stats = {}
+
+    def _record_batch_stats(self):
+        self.last_batch_stats = {
+            "fonts": font_registry.stats(),
+            "images": image_cache.stats(),
+            "layout": text_layout.stats(),
+            "glyphs": glyph_atlas.stats(),
+            "metrics": self.metrics.summary(),
+        }
+        logger.info(f"Cache de fontes: {self.last_batch_stats['fonts']}")
+        logger.info(f"Cache de imagens: {self.last_batch_stats['images']}")
+
+    def certificate_key(self, participant: Participant) -> str:
+        """Return the S3 key of a participant's certificate."""
+        extension = self.output_profile_for(participant).extension
+        return f"certificates/{participant.event.product_id}/{participant.event.order_id}/{participant.create_name_certificate(extension)}"
+
+    def _build_certificate(self, participant: Participant, prepared_template: PreparedTemplate, in_memory: bool = False) -> dict:
+        """Render and save (or only encode, with in_memory) one certificate, returning its result dict."""
         try:
-            new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            new_img.paste(img, (0, 0), img if 'A' in img.mode else None)
-            return new_img
+            # Generate and save certificate
+            certificate_generated = self.render_certificate(participant, prepared_template)
+            encoded = None
+            if in_memory:
+                encoded = self.encode_certificate(certificate_generated, participant)
+                certificate_path = None
+                encode_stats = encoded.stats()
+            else:
+                encode_stats = {}
+                certificate_path = self.save_certificate(certificate_generated, participant, encode_stats=encode_stats)
+            
+            logger.debug(f"Certificado gerado para {participant.name_completed()} com codigo de validação {participant.formated_validation_code()}")
+            result = {
+                "participant": participant.model_dump(),
+                "certificate_path": certificate_path,
+                "certificate_key": self.certificate_key(participant),
+                "success": True,
+                **encode_stats
+            }
+            if encoded is not None:
+                result["certificate"] = encoded
+            return result
         except Exception as e:
-            logger.warning(f"Erro ao processar transparência, usando método alternativo: {str(e)}")
-            # Fallback method if there's an issue with the alpha channel
-            new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            new_img.paste(img.convert('RGB'), (0, 0))
-            return new_img
+            logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(e)}")
+            return self._error_result(participant, e)
+
+    def _error_result(self, participant: Participant, error: Exception) -> dict:
+        return {
+            "participant": participant.model_dump(),
+            "error": str(error),
+            "success": False
+        }
+
+    def _group_by_template(self, participants: List[Participant]) -> dict:
+        """Group (index, participant) pairs by template key, keeping first-seen order."""
+        groups = {}
+        for index, participant in enumerate(participants):
+            groups.setdefault(template_key(participant.certificate), []).append((index, participant))
+        return groups
+
+    def _download_images(self, urls: List[str]) -> dict:
+        """Download each distinct URL once, in parallel, mapping it to its image or to the download error."""
+        downloaded = image_cache.bytes_downloaded
+        with self.metrics.span("fetch"):
+            images = fetch_files_certificate(urls)
+        self.metrics.add_bytes("fetch", image_cache.bytes_downloaded - downloaded)
+        for url, image in images.items():
+            if isinstance(image, Exception):
+                logger.error(f"Erro ao baixar imagem de {url}: {str(image)}")
+                images[url] = RuntimeError(f"Error downloading image from {url}: {str(image)}")
+        return images
+
+    def _downloaded(self, images: dict, url: str) -> Image:
+        image = images[url]
+        if isinstance(image, Exception):
+            raise image
+        return image
+
+    def _ensure_valid_rgba(self, img: Image) -> Image:
+        """Ensure image has a valid RGBA mode with proper transparency channel."""
+        return ensure_valid_rgba(img)
+
+    def prepare_template(self, certificate_template: Image, logo: Image, key: tuple = None) -> PreparedTemplate:
+        """Normalize the background and composite the resized logo once for a batch."""
+        return PreparedTemplate(certificate_template, logo, key, keep_sources=self.render_mode == RENDER_MODE_LEGACY)
+
+    def render_certificate(self, participant: Participant, prepared_template: PreparedTemplate):
+        """Generate a certificate for a participant from a prepared template.
+
+        Returns an image, or a VectorCertificate when the event's output profile is a vector one.
+        """
+        with self.metrics.span("render"):
+            if self.output_profile_for(participant).vector:
+                return self._render_vector(participant, prepared_template)
+            if self.render_mode == RENDER_MODE_LEGACY:
+                return self._generate_certificate_legacy(participant, prepared_template.source_background, prepared_template.source_logo)
+            return self._render_on_canvas(participant, prepared_template)
 
     def generate_certificate(self, participant: Participant, certificate_template: Image, logo: Image):
         """Generate a certificate for a participant."""
+        if self.output_profile_for(participant).vector:
+            return self._render_vector(participant, PreparedTemplate(certificate_template, logo))
+        if self.render_mode == RENDER_MODE_LEGACY:
+            return self._generate_certificate_legacy(participant, certificate_template, logo)
+        return self._render_on_canvas(participant, PreparedTemplate(certificate_template, logo))
+
+    def _render_on_canvas(self, participant: Participant, prepared_template: PreparedTemplate) -> Image:
+        """Draw the text layers onto a copy of the prepared template.
+
+        Only tiles around the name, details and validation code (from their
+        text bounding boxes) are allocated and composited, so the work per
+        certificate grows with the text area rather than the template size.
+        Each tile goes through the same paste/alpha_composite steps as the
+        legacy path, so the output is pixel-equivalent. With the NumPy
+        backend the result is the same pixels already converted to RGB.
+        """
+        try:
+            compositor = prepared_template.compositor() if self.compositing == COMPOSITING_NUMPY else None
+            with self.metrics.span("composite"):
+                canvas = compositor.new_canvas() if compositor else prepared_template.new_canvas()
+
+            for box, overlay, overlaps_logo in self._render_tiles(participant, prepared_template):
+                origin = (box[0], box[1])
+                with self.metrics.span("composite"):
+                    if compositor:
+                        compositor.composite(canvas, overlay, origin, restore_logo=overlaps_logo)
+                    else:
+                        if overlaps_logo:
+                            prepared_template.restore_background(canvas, box)
+                        canvas.alpha_composite(overlay, origin)
+
+            return canvas
+        except Exception as e:
+            logger.error(f"Erro ao gerar certificado: {str(e)}")
+            raise
+
+    def _render_vector(self, participant: Participant, prepared_template: PreparedTemplate) -> VectorCertificate:
+        """Lay out the certificate's lines over the prepared template without rasterizing them.
+
+        The lines are placed where the raster path draws them; the template
+        PNG is encoded once and shared, so the cost per certificate does not
+        grow with the template resolution.
+        """
+        try:
+            with self.metrics.span("layout"):
+                runs = [TextRun(text, font, position, TEXT_COLOR) for text, font, position in self._text_runs(participant, prepared_template.size)]
+            return VectorCertificate(prepared_template, runs)
+        except Exception as e:
+            logger.error(f"Erro ao gerar certificado vetorial: {str(e)}")
+            raise
+
+    def _embeds_template(self, participant: Participant, prepared_template: PreparedTemplate) -> bool:
+        """Return True if the participant's certificate embeds the template PNG (any vector profile but svg_linked with URLs)."""
+        profile = self.output_profile_for(participant)
+        return profile.vector and not (profile.options.get("link_images") and prepared_template.image_sources() is not None)
+
+    def render_certificate_tiles(self, participant: Participant, prepared_template: PreparedTemplate) -> list:
+        """Return [(box, tile)] with the RGB pixels of every region that differs from the prepared template.
+
+        Drawing each tile at its (left, top, right, bottom) box over
+        prepared_template.image gives the pixels of render_certificate.
+        """
+        with self.metrics.span("render"):
+            tiles = []
+            for box, overlay, overlaps_logo in self._render_tiles(participant, prepared_template):
+                with self.metrics.span("composite"):
+                    tile = prepared_template.image.crop(box)
+                    if overlaps_logo:
+                        prepared_template.restore_background(tile, box, origin=(box[0], box[1]))
+                    tile.alpha_composite(overlay)
+                    tiles.append((box, tile.convert("RGB")))
+            return tiles
+
+    def _render_tiles(self, participant: Participant, prepared_template: PreparedTemplate):
+        """Yield (box, overlay, overlaps_logo) for every tile holding text, merged where layers overlap.
+
+        When overlaps_logo is set the overlay also holds the logo, as the
+        legacy single overlay does, and must be composited over the
+        background without logo.
+        """
+        with self.metrics.span("layout"):
+            layers = self._text_layers(participant, prepared_template.size)
+
+        for box in self._merge_tiles([layer[0] for layer in layers]):
+            origin = (box[0], box[1])
+            with self.metrics.span("text_layers"):
+                overlay = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (255, 255, 255, 0))
+                overlaps_logo = prepared_template.overlaps_logo(box)
+                if overlaps_logo:
+                    # The legacy overlay holds logo and text together, so redo the logo here
+                    overlay = prepared_template.paste_logo(overlay, origin)
+                for layer_box, apply_layer in layers:
+                    if intersects(layer_box, box):
+                        overlay = apply_layer(overlay, origin)
+            yield box, overlay, overlaps_logo
+
+    def _text_layers(self, participant: Participant, size: tuple) -> list:
+        """Return (box, apply) for the name, details and validation code, in drawing order.
+
+        box is the (left, top, right, bottom) tile holding the layer's pixels
+        and apply(overlay, origin) draws the layer on a tile whose top-left
+        pixel is at origin.
+        """
+        width, height = size
+        layers = [self._text_layer(*self._name_run(participant, size))]
+
+        details_font = get_font(DETAILS_FONT, DETAILS_FONT_SIZE)
+        details_y = self._details_y(height)
+        details_layout = self._details_layout(participant.certificate.details, details_font, size)
+        # Rendered once per event, same pixels as the legacy full-size details image
+        details_image = details_layout.image(width, details_font, TEXT_COLOR)
+
+        def apply_details(overlay: Image, origin: tuple) -> Image:
+            details_with_position = Image.new("RGBA", overlay.size, (255, 255, 255, 0))
+            details_with_position.paste(details_image, (-origin[0], details_y - origin[1]), details_image)
+            return Image.alpha_composite(overlay, details_with_position)
+
+        details_box = (
+            math.floor(details_layout.left) - LAYER_PADDING,
+            details_y,
+            math.ceil(details_layout.right) + LAYER_PADDING,
+            math.ceil(details_y + details_layout.bottom) + LAYER_PADDING,
+        )
+        layers.append((details_box, apply_details))
+        layers.append(self._text_layer(*self._validation_code_run(participant, size)))
+
+        clipped = []
+        for (left, top, right, bottom), apply_layer in layers:
+            box = (max(left, 0), max(top, 0), min(right, width), min(bottom, height))
+            if box[2] > box[0] and box[3] > box[1]:
+                clipped.append((box, apply_layer))
+        return clipped
+
+    def _text_runs(self, participant: Participant, size: tuple) -> list:
+        """Return (text, font, position) for every line of the certificate: name, details lines, validation code."""
+        details_font = get_font(DETAILS_FONT, DETAILS_FONT_SIZE)
+        details_y = self._details_y(size[1])
+        runs = [self._name_run(participant, size)]
+        runs += [(line, details_font, (x, details_y + y)) for x, y, line in self._details_lines(participant.certificate.details, details_font, size)]
+        runs.append(self._validation_code_run(participant, size))
+        return runs
+
+    def _name_run(self, participant: Participant, size: tuple) -> tuple:
+        name = participant.name_completed()
+        font = self._name_font(name, size[0])
+        return name, font, self.calculate_text_position(name, font, None, size)
+
+    def _validation_code_run(self, participant: Participant, size: tuple) -> tuple:
+        validation_code = participant.formated_validation_code()
+        font = get_font(VALIDATION_CODE, VALIDATION_CODE_FONT_SIZE)
+        return validation_code, font, self.calculate_validation_code_position(validation_code, font, None, size)
+
+    def _details_y(self, height: int) -> int:
+        """Return the top of the details, just below the center of the certificate."""
+        return height // 2 + 50
+
+    def _text_layer(self, text: str, font: ImageFont, position: tuple) -> tuple:
+        """Return (box, apply) for a single line of text pasted with its own mask."""
+        bbox = font_registry.textbbox(text, font)
+        # The tile must start at or before the text origin so the fractional
+        # offset given to FreeType is the same as in the full-size layer
+        box = (
+            min(math.floor(position[0]), math.floor(position[0] + bbox[0])) - LAYER_PADDING,
+            min(math.floor(position[1]), math.floor(position[1] + bbox[1])) - LAYER_PADDING,
+            math.ceil(position[0] + bbox[2]) + LAYER_PADDING,
+            math.ceil(position[1] + bbox[3]) + LAYER_PADDING,
+        )
+
+        def apply_text(overlay: Image, origin: tuple) -> Image:
+            text_image = Image.new("RGBA", overlay.size, (255, 255, 255, 0))
+            text_position = (position[0] - origin[0], position[1] - origin[1])
+            if self.use_glyph_atlas:
+                glyph_atlas.draw_text(text_image, text_position, text, font, TEXT_COLOR)
+            else:
+                ImageDraw.Draw(text_image).text(text_position, text, fill=TEXT_COLOR, font=font)
+            overlay.paste(text_image, (0, 0), text_image)
+            return overlay
+
+        return box, apply_text
+
+    def _merge_tiles(self, boxes: list) -> list:
+        """Merge overlapping (left, top, right, bottom) boxes until no two intersect."""
+        merged = []
+        for box in boxes:
+            overlapping = True
+            while overlapping:
+                overlapping = False
+                for index, other in enumerate(merged):
+                    if intersects(box, other):
+                        box = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                        del merged[index]
+                        overlapping = True
+                        break
+            merged.append(box)
+        return merged
+
+    def _generate_certificate_legacy(self, participant: Participant, certificate_template: Image, logo: Image):
+        """Generate a certificate by compositing full-size overlays."""
         try:
             # Ensure images have valid transparency channels
             certificate_template = self._ensure_valid_rgba(certificate_template)
@@ -112,17 +670,16 @@ class CertifiedBuilder:
             overlay = Image.new("RGBA", certificate_template.size, (255, 255, 255, 0))
             
             # Optimize logo size
-            logo_size = (150, 150)
-            logo = logo.resize(logo_size, Image.Resampling.LANCZOS)
+            logo = logo.resize(LOGO_SIZE, Image.Resampling.LANCZOS)
             
             # Paste logo - handle potential transparency issues
             try:
                 # Try with mask first
-                overlay.paste(logo, (50, 50), logo)
+                overlay.paste(logo, LOGO_POSITION, logo)
             except Exception as e:
                 logger.warning(f"Erro ao colar logo com máscara, usando método alternativo: {str(e)}")
                 # Fallback without using the logo as its own mask
-                overlay.paste(logo, (50, 50))
+                overlay.paste(logo, LOGO_POSITION)
             
             # Add name
             name_image = self.create_name_image(participant.name_completed(), certificate_template.size)
@@ -186,7 +743,7 @@ class CertifiedBuilder:
         try:
             name_image = Image.new("RGBA", size, (255, 255, 255, 0))
             draw = ImageDraw.Draw(name_image)
-            font = ImageFont.truetype(FONT_NAME, 70)
+            font = self._name_font(name, size[0])
             position = self.calculate_text_position(name, font, draw, size)
             draw.text(position, name, fill=TEXT_COLOR, font=font)
             return name_image
@@ -199,43 +756,34 @@ class CertifiedBuilder:
         try:
             details_image = Image.new("RGBA", size, (255, 255, 255, 0))
             draw = ImageDraw.Draw(details_image)
-            font = ImageFont.truetype(DETAILS_FONT, 18)
+            font = get_font(DETAILS_FONT, DETAILS_FONT_SIZE)
 
-            words = details.split()
-            total_words = len(words)
-            words_per_line = total_words // 3
-            
-            line1 = ' '.join(words[:words_per_line])
-            line2 = ' '.join(words[words_per_line:words_per_line*2])
-            line3 = ' '.join(words[words_per_line*2:])
-            
-            line_height = font.size + 10
-            
-            line1_bbox = draw.textbbox((0, 0), line1, font=font)
-            line2_bbox = draw.textbbox((0, 0), line2, font=font)
-            line3_bbox = draw.textbbox((0, 0), line3, font=font)
-            
-            start_y = 0
-            
-            x1 = (size[0] - (line1_bbox[2] - line1_bbox[0])) / 2
-            x2 = (size[0] - (line2_bbox[2] - line2_bbox[0])) / 2
-            x3 = (size[0] - (line3_bbox[2] - line3_bbox[0])) / 2
-            
-            draw.text((x1, start_y), line1, fill=TEXT_COLOR, font=font)
-            draw.text((x2, start_y + line_height), line2, fill=TEXT_COLOR, font=font)
-            draw.text((x3, start_y + line_height * 2), line3, fill=TEXT_COLOR, font=font)
+            for x, y, line in self._details_lines(details, font, size):
+                draw.text((x, y), line, fill=TEXT_COLOR, font=font)
             
             return details_image
         except Exception as e:
             logger.error(f"Erro ao criar imagem dos detalhes: {str(e)}")
             raise
 
+    def _details_lines(self, details: str, font: ImageFont, size: tuple) -> list:
+        """Return (x, y, text) for each centered line of details."""
+        return self._details_layout(details, font, size).lines
+
+    def _details_layout(self, details: str, font: ImageFont, size: tuple):
+        """Return the cached layout of details: three lines by word count, wrapped by width if they do not fit."""
+        return text_layout.details(details, font, size[0], size[0] - 2 * DETAILS_MARGIN)
+
+    def _name_font(self, name: str, width: int) -> ImageFont:
+        """Return the name font, shrunk if the name is wider than the certificate allows."""
+        return text_layout.fit_font(name, FONT_NAME, NAME_FONT_SIZE, width - 2 * NAME_MARGIN, MIN_NAME_FONT_SIZE)
+
     def create_validation_code_image(self, validation_code: str, size: tuple) -> Image:
         """Create image with validation code."""
         try:
             validation_code_image = Image.new("RGBA", size, (255, 255, 255, 0))
             draw = ImageDraw.Draw(validation_code_image)
-            font = ImageFont.truetype(VALIDATION_CODE, 20)
+            font = get_font(VALIDATION_CODE, VALIDATION_CODE_FONT_SIZE)
             position = self.calculate_validation_code_position(validation_code, font, draw, size)
             draw.text(position, validation_code, fill=TEXT_COLOR, font=font)
             return validation_code_image
@@ -245,28 +793,50 @@ class CertifiedBuilder:
 
     def calculate_text_position(self, text: str, font: ImageFont, draw: ImageDraw, size: tuple) -> tuple:
         """Calculate centered position for text."""
-        text_bbox = draw.textbbox((0, 0), text, font=font)
+        text_bbox = font_registry.textbbox(text, font)
         text_width = text_bbox[2] - text_bbox[0]
         text_height = text_bbox[3] - text_bbox[1]
         return ((size[0] - text_width) / 2, (size[1] - text_height) / 2)
 
     def calculate_validation_code_position(self, validation_code: str, font: ImageFont, draw: ImageDraw, size: tuple) -> tuple:
         """Calculate position for validation code."""
-        text_bbox = draw.textbbox((0, 0), validation_code, font=font)
+        text_bbox = font_registry.textbbox(validation_code, font)
         text_width = text_bbox[2] - text_bbox[0]
         text_height = text_bbox[3] - text_bbox[1]
         return (size[0] - text_width - 50, size[1] - text_height - 40)
 
-    def save_certificate(self, certificate: Image, participant: Participant) -> str:
+    def output_profile_for(self, participant: Participant) -> OutputProfile:
+        """Return the event's output profile, falling back to the builder default."""
+        return get_output_profile(participant.certificate.output_profile or self.output_profile)
+
+    def save_certificate(self, certificate: Image, participant: Participant, encode_stats: dict = None) -> str:
         """Save certificate to temporary directory."""
         try:
-            name_certificate = participant.create_name_certificate()
+            encoded = self.encode_certificate(certificate, participant)
+            name_certificate = participant.create_name_certificate(encoded.profile.extension)
             file_path = os.path.join(self.temp_dir, name_certificate)
-            # Optimize image before saving
-            certificate = certificate.convert('RGB')
-            certificate.save(file_path, format="PNG", optimize=True)            
+            with self.metrics.span("save"), open(file_path, "wb") as f:
+                f.write(encoded.getbuffer())
+            self.metrics.add_bytes("save", encoded.size)
+            if encode_stats is not None:
+                encode_stats.update(encoded.stats())
             return file_path
             
         except Exception as e:
             logger.error(f"Erro ao salvar certificado: {str(e)}")
             raise
+
+    def encode_certificate(self, certificate, participant: Participant = None) -> EncodedCertificate:
+        """Encode certificate (an image or a VectorCertificate) into an in-memory buffer, ready to upload."""
+        try:
+            profile = self.output_profile_for(participant) if participant else get_output_profile(self.output_profile)
+            with self.metrics.span("encode"):
+                if isinstance(certificate, VectorCertificate):
+                    encoded = encode_vector(certificate, profile)
+                else:
+                    encoded = encode_image(certificate, profile)
+            self.metrics.add_bytes("encode", encoded.size)
+            return encoded
+        except Exception as e:
+            logger.error(f"Erro ao codificar certificado: {str(e)}")
+            raise
@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# State inherited by forked workers; set only while a parallel build runs
+_fork_state = {}
+# Seconds a worker may spend on one chunk before it is killed and the chunk reported as failed
+DEFAULT_CHUNK_TIMEOUT = 120
+
+
+def fork_available() -> bool:
+    """Return True when worker processes can inherit memory through fork."""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _worker(conn):
+    render_one = _fork_state["render_one"]
+    items = _fork_state["items"]
+    chunk_state = _fork_state["chunk_state"]
+    while True:
+        chunk = conn.recv()
+        if chunk is None:
+            break
+        results = [(index, render_one(items[index])) for index in chunk]
+        conn.send((results, chunk_state() if chunk_state else None))
+    conn.close()
+
+
+def run_in_processes(render_one: Callable, items: Sequence, workers: int, chunk_size: int, on_error: Callable, chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT, chunk_state: Optional[Callable] = None, merge_state: Optional[Callable] = None) -> List:
+    """Call render_one(item) for every item in forked worker processes, returning results in input order.
+
+    See ``iter_in_processes``.
+    """
+    results = [None] * len(items)
+    for index, result in iter_in_processes(render_one, items, workers, chunk_size, on_error, chunk_timeout, chunk_state, merge_state):
+        results[index] = result
+    return results
+
+
+def iter_in_processes(render_one: Callable, items: Sequence, workers: int, chunk_size: int, on_error: Callable, chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT, chunk_state: Optional[Callable] = None, merge_state: Optional[Callable] = None) -> Iterator[Tuple[int, object]]:
+    """Call render_one(item) for every item in forked worker processes, yielding (index, result) as chunks finish.
+
+    The items, the prepared template captured by render_one and every other
+    object reachable from it are inherited copy-on-write through fork, so the
+    template pixels are never pickled. Chunks of indices are handed out over a
+    Pipe as workers become free. Pipes and plain processes are used instead
+    of multiprocessing.Pool because AWS Lambda has no /dev/shm for the
+    semaphores Pool relies on.
+
+    Every worker is forked before the first result is yielded, so a caller
+    can start threads once it has a result without a fork following them
+    (a thread holding a lock while the process forks leaves that lock held
+    forever in the child).
+
+    If a worker dies, or spends more than chunk_timeout seconds on a chunk
+    (it is then killed), on_error(item, exception) builds the result of
+    every item of that chunk. Workers still running when the caller stops
+    iterating are terminated.
+
+    With chunk_state, each worker calls it after every chunk and sends its
+    return value (e.g. the metrics recorded in the child) along with the
+    results; the parent hands it to merge_state.
+    """
+    chunks = deque(range(start, min(start + chunk_size, len(items))) for start in range(0, len(items), chunk_size))
+    context = multiprocessing.get_context("fork")
+
+    _fork_state.update(render_one=render_one, items=items, chunk_state=chunk_state)
+    connections = {}
+    try:
+        for _ in range(min(workers, len(chunks))):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=_worker, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+            chunk = chunks.popleft()
+            parent_conn.send(chunk)
+            connections[parent_conn] = (process, chunk, time.monotonic() + chunk_timeout)
+    finally:
+        # Workers already hold their own copy of the state
+        _fork_state.clear()
+
+    try:
+        while connections:
+            timeout = max(0.0, min(deadline for _, _, deadline in connections.values()) - time.monotonic())
+            ready = wait(list(connections), timeout=timeout)
+            if not ready:
+                for conn, (process, chunk, deadline) in list(connections.items()):
+                    if deadline > time.monotonic():
+                        continue
+                    logger.error(f"Processo de renderização sem resposta há {chunk_timeout}s, encerrando")
+                    process.terminate()
+                    process.join()
+                    conn.close()
+                    del connections[conn]
+                    error = RuntimeError(f"Render worker timed out after {chunk_timeout}s")
+                    for index in chunk:
+                        yield index, on_error(items[index], error)
+                continue
+            for conn in ready:
+                process, chunk, _ = connections[conn]
+                try:
+                    chunk_results, state = conn.recv()
+                except (EOFError, OSError) as e:
+                    logger.error(f"Processo de renderização encerrado inesperadamente (exitcode {process.exitcode}): {str(e)}")
+                    error = RuntimeError(f"Render worker exited unexpectedly: {str(e) or type(e).__name__}")
+                    del connections[conn]
+                    process.join()
+                    for index in chunk:
+                        yield index, on_error(items[index], error)
+                    continue
+
+                if chunks:
+                    next_chunk = chunks.popleft()
+                    conn.send(next_chunk)
+                    connections[conn] = (process, next_chunk, time.monotonic() + chunk_timeout)
+                else:
+                    conn.send(None)
+                    conn.close()
+                    del connections[conn]
+                    process.join()
+                if merge_state is not None and state is not None:
+                    merge_state(state)
+                yield from chunk_results
+    finally:
+        for conn, (process, _, _) in connections.items():
+            process.terminate()
+            conn.close()
+            process.join()
+
+    # Chunks left when every worker died are reported as errors
+    for chunk in chunks:
+        for index in chunk:
+            yield index, on_error(items[index], RuntimeError("No render worker available"))
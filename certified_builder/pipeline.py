@@ -0,0 +1,184 @@
+import logging
+import queue
+import threading
+from typing import List
+from models.participant import Participant
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream for one stage worker
+_DONE = object()
+
+
+class CertificatePipeline:
+    """Render, encode and upload certificates as overlapping stages.
+
+    Rendering runs in the calling thread. Encoding and S3 uploads run in
+    worker threads fed through bounded queues: Pillow releases the GIL while
+    compressing PNGs and boto3 while waiting on the network, so the first
+    upload starts while later certificates are still being drawn. When the
+    builder has several ``workers`` (and ``in_memory`` is set) rendering and
+    encoding both run in its forked worker processes, forked once per batch
+    before any stage thread starts, and only the uploads run here, fed with
+    the encoded bytes as each chunk finishes. At most
+    ``queue_size`` rendered images wait for each stage, keeping memory flat
+    regardless of the batch size, and the wall time approaches that of the
+    slowest stage instead of the sum of the three.
+
+    With ``in_memory`` (the default) certificates are encoded into a
+    ``BytesIO`` and streamed to S3 without touching ``/tmp``; otherwise they
+    are written to disk and the file is deleted once uploaded.
+
+    With ``skip_existing`` the certificate keys are checked in S3 first and
+    participants whose certificate is already there are reported as
+    successful without being rendered again. This only works when keys are
+    deterministic, i.e. validation codes do not change between deliveries.
+    """
+
+    def __init__(self, builder, s3_service, queue_size: int = 4, encode_workers: int = 2, upload_workers: int = 4, in_memory: bool = True, skip_existing: bool = False):
+        self.builder = builder
+        self.in_memory = in_memory
+        self.skip_existing = skip_existing
+        self.s3_service = s3_service
+        self.queue_size = queue_size
+        self.encode_workers = encode_workers
+        self.upload_workers = upload_workers
+
+    def run(self, participants: List[Participant]) -> List[dict]:
+        """Process every participant, returning build_certificates-style results in input order."""
+        results = [None] * len(participants)
+        self.builder.reset_batch_stats()
+        pending = self._skip_existing(participants, results) if self.skip_existing else list(range(len(participants)))
+        if not pending:
+            self.builder._record_batch_stats()
+            return results
+        encode_queue = queue.Queue(maxsize=self.queue_size)
+        upload_queue = queue.Queue(maxsize=self.queue_size)
+        encoders, uploaders = [], []
+
+        try:
+            if self.in_memory and self.builder.workers > 1:
+                self._render_in_processes(participants, pending, upload_queue, results, uploaders)
+            else:
+                encoders.extend(self._start(self.encode_workers, self._encode_stage, encode_queue, upload_queue, results))
+                uploaders.extend(self._start(self.upload_workers, self._upload_stage, upload_queue, results))
+                for position, participant, certificate, error in self.builder.render_certificates([participants[index] for index in pending]):
+                    index = pending[position]
+                    if error is not None:
+                        logger.error(f"Erro ao gerar certificado para {participant.name_completed()}: {str(error)}")
+                        results[index] = self.builder._error_result(participant, error)
+                        continue
+                    encode_queue.put((index, participant, certificate))
+        finally:
+            self._finish(encode_queue, encoders)
+            self._finish(upload_queue, uploaders)
+        # Taken once the uploads are done, so the upload spans are included
+        self.builder._record_batch_stats()
+
+        generated = sum(1 for result in results if result and result["success"] and not result.get("skipped"))
+        logger.info(f"{generated} de {len(participants)} certificados gerados e enviados")
+        return results
+
+    def _skip_existing(self, participants: List[Participant], results: List[dict]) -> List[int]:
+        """Fill the results of certificates already in S3 and return the indices left to build."""
+        keys = []
+        for index, participant in enumerate(participants):
+            try:
+                keys.append(self.builder.certificate_key(participant))
+            except Exception as e:
+                # Only this participant fails, e.g. an output profile that does not exist
+                logger.error(f"Erro ao montar a chave do certificado de {participant.name_completed()}: {str(e)}")
+                results[index] = self.builder._error_result(participant, e)
+                keys.append(None)
+        existing = self.s3_service.existing_keys([key for key in keys if key is not None])
+        pending = []
+        for index, (participant, certificate_key) in enumerate(zip(participants, keys)):
+            if certificate_key is None:
+                continue
+            if certificate_key in existing:
+                results[index] = {
+                    "participant": participant.model_dump(),
+                    "certificate_path": None,
+                    "certificate_key": certificate_key,
+                    "success": True,
+                    "skipped": True
+                }
+            else:
+                pending.append(index)
+        skipped = sum(1 for result in results if result and result.get("skipped"))
+        if skipped:
+            logger.info(f"{skipped} certificados já existentes ignorados, {len(pending)} a gerar")
+        return pending
+
+    def _render_in_processes(self, participants: List[Participant], pending: List[int], upload_queue: queue.Queue, results: List[dict], uploaders: List[threading.Thread]):
+        """Render and encode in the builder's worker processes, queueing each certificate for upload.
+
+        The upload threads are started once the first result arrives: the
+        workers are all forked by then, so none inherits a lock held by a
+        thread of this process.
+        """
+        for position, result in self.builder.build_certificates_iter([participants[index] for index in pending], in_memory=True):
+            if not uploaders:
+                uploaders.extend(self._start(self.upload_workers, self._upload_stage, upload_queue, results))
+            index = pending[position]
+            if not result["success"]:
+                results[index] = result
+                continue
+            encoded = result["certificate"]
+            upload_queue.put((index, participants[index], encoded, encoded.stats()))
+
+    def _start(self, count: int, target, *args) -> List[threading.Thread]:
+        threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _finish(self, stage_queue: queue.Queue, threads: List[threading.Thread]):
+        for _ in threads:
+            stage_queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    def _encode_stage(self, encode_queue: queue.Queue, upload_queue: queue.Queue, results: List[dict]):
+        while True:
+            item = encode_queue.get()
+            if item is _DONE:
+                break
+            index, participant, certificate = item
+            try:
+                if self.in_memory:
+                    encoded = self.builder.encode_certificate(certificate, participant)
+                    encode_stats = encoded.stats()
+                else:
+                    encode_stats = {}
+                    encoded = self.builder.save_certificate(certificate, participant, encode_stats=encode_stats)
+                upload_queue.put((index, participant, encoded, encode_stats))
+            except Exception as e:
+                logger.error(f"Erro ao salvar certificado de {participant.name_completed()}: {str(e)}")
+                results[index] = self.builder._error_result(participant, e)
+
+    def _upload_stage(self, upload_queue: queue.Queue, results: List[dict]):
+        while True:
+            item = upload_queue.get()
+            if item is _DONE:
+                break
+            index, participant, encoded, encode_stats = item
+            try:
+                certificate_key = self.builder.certificate_key(participant)
+                if self.in_memory:
+                    certificate_path = None
+                    self.s3_service.upload_fileobj(encoded, certificate_key, content_type=encoded.profile.content_type)
+                else:
+                    certificate_path = encoded
+                    self.s3_service.upload_file(certificate_path, certificate_key, delete_after=True)
+                logger.debug(f"Certificado gerado para {participant.name_completed()} com codigo de validação {participant.formated_validation_code()}")
+                results[index] = {
+                    "participant": participant.model_dump(),
+                    "certificate_path": certificate_path,
+                    "certificate_key": certificate_key,
+                    "success": True,
+                    **encode_stats
+                }
+            except Exception as e:
+                logger.error(f"Erro ao enviar certificado de {participant.name_completed()}: {str(e)}")
+                results[index] = self.builder._error_result(participant, e)
@@ -0,0 +1,135 @@
+import logging
+from io import BytesIO
+from typing import List, Optional, Tuple
+from PIL import Image
+from certified_builder.utils.compositing import ArrayCompositor
+from certified_builder.utils.encoder import DOCUMENT_COMPRESS_LEVEL
+from models.certificate import Certificate
+
+logger = logging.getLogger(__name__)
+
+LOGO_SIZE = (150, 150)
+LOGO_POSITION = (50, 50)
+
+
+def template_key(certificate: Certificate) -> Tuple[str, str]:
+    """Return the (background URL, logo URL) pair identifying a template."""
+    return (certificate.background, certificate.logo)
+
+
+def intersects(box: Tuple[int, int, int, int], other: Tuple[int, int, int, int]) -> bool:
+    """Return True if two (left, top, right, bottom) boxes share at least one pixel."""
+    return box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]
+
+
+def ensure_valid_rgba(img: Image) -> Image:
+    """Ensure image has a valid RGBA mode with proper transparency channel."""
+    converted = img.mode != 'RGBA'
+    if converted:
+        img = img.convert('RGBA')
+
+    # Pasting an opaque image through its own alpha changes nothing, a copy is enough
+    if img.getchannel('A').getextrema() == (255, 255):
+        return img if converted else img.copy()
+
+    # Some PNG images may have problematic transparency channels
+    # Create a new image with proper alpha channel
+    try:
+        new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
+        new_img.paste(img, (0, 0), img if 'A' in img.mode else None)
+        return new_img
+    except Exception as e:
+        logger.warning(f"Erro ao processar transparência, usando método alternativo: {str(e)}")
+        # Fallback method if there's an issue with the alpha channel
+        new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
+        new_img.paste(img.convert('RGB'), (0, 0))
+        return new_img
+
+
+class PreparedTemplate:
+    """Background normalized to RGBA with the resized logo already composited.
+
+    Built once per (background URL, logo URL) in a batch; every certificate
+    starts from a copy of ``image`` so only the text layers are drawn per
+    participant. The background behind the logo is kept aside so a text
+    tile that overlaps the logo can be recomposited exactly like the legacy
+    single overlay.
+    """
+
+    def __init__(self, background: Image, logo: Image, key: Optional[Tuple[str, str]] = None, keep_sources: bool = False):
+        self.key = key
+        # Original images are only needed by the legacy renderer
+        self.source_background = background if keep_sources else None
+        self.source_logo = logo if keep_sources else None
+
+        background = ensure_valid_rgba(background)
+        self.logo = ensure_valid_rgba(logo).resize(LOGO_SIZE, Image.Resampling.LANCZOS)
+        self.size = background.size
+
+        left, top = max(LOGO_POSITION[0], 0), max(LOGO_POSITION[1], 0)
+        right = min(LOGO_POSITION[0] + self.logo.width, background.width)
+        bottom = min(LOGO_POSITION[1] + self.logo.height, background.height)
+        self.logo_box = (left, top, right, bottom) if right > left and bottom > top else None
+
+        self.image = background
+        self._logo_background = None
+        self._compositor = None
+        self._background_png = None
+        if self.logo_box:
+            self._logo_background = background.crop(self.logo_box)
+            overlay = Image.new("RGBA", (right - left, bottom - top), (255, 255, 255, 0))
+            self.image.alpha_composite(self.paste_logo(overlay, (left, top)), (left, top))
+
+    def paste_logo(self, overlay: Image, origin: Tuple[int, int]) -> Image:
+        """Paste the logo into an overlay tile whose top-left pixel is at origin."""
+        overlay.paste(self.logo, (LOGO_POSITION[0] - origin[0], LOGO_POSITION[1] - origin[1]), self.logo)
+        return overlay
+
+    def overlaps_logo(self, box: Tuple[int, int, int, int]) -> bool:
+        """Return True if the (left, top, right, bottom) box intersects the logo."""
+        return self.logo_box is not None and intersects(box, self.logo_box)
+
+    def restore_background(self, canvas: Image, box: Tuple[int, int, int, int], origin: Tuple[int, int] = (0, 0)):
+        """Put the background without logo back into the part of box shared with the logo.
+
+        origin is the template pixel at the top-left of canvas, for canvases cropped from the template.
+        """
+        left, top = max(box[0], self.logo_box[0]), max(box[1], self.logo_box[1])
+        right, bottom = min(box[2], self.logo_box[2]), min(box[3], self.logo_box[3])
+        offset_x, offset_y = self.logo_box[0], self.logo_box[1]
+        canvas.paste(self._logo_background.crop((left - offset_x, top - offset_y, right - offset_x, bottom - offset_y)), (left - origin[0], top - origin[1]))
+
+    def new_canvas(self) -> Image:
+        """Return a fresh copy of the prepared image to draw a certificate on."""
+        return self.image.copy()
+
+    def compositor(self) -> ArrayCompositor:
+        """Return the NumPy compositor of this template, created on first use."""
+        if self._compositor is None:
+            self._compositor = ArrayCompositor(self.image, self._logo_background, self.logo_box)
+        return self._compositor
+
+    def image_sources(self) -> Optional[List[Tuple[str, Tuple[int, int, int, int]]]]:
+        """Return [(url, (x, y, width, height))] drawing this template from the images it was built from.
+
+        None when the template was not built from URLs (no key).
+        """
+        if self.key is None:
+            return None
+        background, logo = self.key
+        sources = [(background, (0, 0) + tuple(self.size))]
+        if self.logo_box:
+            sources.append((logo, LOGO_POSITION + LOGO_SIZE))
+        return sources
+
+    def background_png(self) -> bytes:
+        """Return the prepared image (logo included) as an RGB PNG, encoded on first use.
+
+        Vector certificates draw this image under their text, so the
+        template is encoded once however many certificates use it.
+        """
+        if self._background_png is None:
+            buffer = BytesIO()
+            self.image.convert("RGB").save(buffer, format="PNG", compress_level=DOCUMENT_COMPRESS_LEVEL)
+            self._background_png = buffer.getvalue()
+        return self._background_png
@@ -0,0 +1,96 @@
+import importlib.util
+import logging
+from typing import Optional, Tuple
+from PIL import Image
+
+# Checked without importing it: NumPy is only loaded once the NumPy backend is used
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+logger = logging.getLogger(__name__)
+
+COMPOSITING_PILLOW = "pillow"
+COMPOSITING_NUMPY = "numpy"
+COMPOSITING_BACKENDS = (COMPOSITING_PILLOW, COMPOSITING_NUMPY)
+
+# Fixed-point precision of Pillow's alpha_composite (libImaging/AlphaComposite.c)
+_PRECISION_BITS = 7
+_coefficients = None
+
+
+def _source_coefficients():
+    """Return the 256x256 table of Pillow's source weight, indexed by [source alpha, destination alpha]."""
+    global _coefficients
+    if _coefficients is None:
+        import numpy as np
+        source_alpha = np.arange(256, dtype=np.uint64)[:, None]
+        destination_alpha = np.arange(256, dtype=np.uint64)[None, :]
+        out_alpha = source_alpha * 255 + destination_alpha * (255 - source_alpha)
+        weight = source_alpha * (255 * 255 << _PRECISION_BITS) // np.maximum(out_alpha, 1)
+        _coefficients = np.where(out_alpha == 0, 0, weight).astype(np.uint32)
+    return _coefficients
+
+
+def composite_rgb(destination: "np.ndarray", source: "np.ndarray") -> "np.ndarray":
+    """Return the RGB channels of ``Image.alpha_composite(destination, source)`` for two RGBA arrays.
+
+    Uses the same integer arithmetic as Pillow, so the result is identical;
+    only the pixels where source is not fully transparent are computed.
+    """
+    import numpy as np
+    out = np.array(destination[..., :3])
+    covered = source[..., 3] != 0
+    if not covered.any():
+        return out
+    src = source[covered].astype(np.uint32)
+    dst = destination[covered].astype(np.uint32)
+    weight = _source_coefficients()[src[:, 3], dst[:, 3]][:, None]
+    blended = src[:, :3] * weight + dst[:, :3] * ((255 << _PRECISION_BITS) - weight) + (0x80 << _PRECISION_BITS)
+    out[covered] = (((blended >> 8) + blended) >> (8 + _PRECISION_BITS)).astype(np.uint8)
+    return out
+
+
+class ArrayCompositor:
+    """Blend text overlays into an RGB copy of a prepared template with NumPy.
+
+    The prepared RGBA image (and the background behind the logo) are read
+    into arrays once per template. Each certificate then starts from a copy
+    of the template already converted to RGB, and every overlay is blended
+    only inside its bounding box and pasted back as RGB, so no full-frame
+    ``alpha_composite`` or ``convert('RGB')`` runs per certificate.
+    """
+
+    def __init__(self, image: Image, logo_background: Optional[Image] = None, logo_box: Optional[Tuple[int, int, int, int]] = None):
+        import numpy as np
+        self.rgba = np.asarray(image)
+        self.rgb_image = image.convert("RGB")
+        self.logo_background = np.asarray(logo_background) if logo_background is not None else None
+        self.logo_box = logo_box
+
+    def new_canvas(self) -> Image:
+        """Return a fresh RGB copy of the prepared template."""
+        return self.rgb_image.copy()
+
+    def composite(self, canvas: Image, overlay: Image, origin: Tuple[int, int], restore_logo: bool = False):
+        """Alpha composite overlay at origin of canvas, as ``canvas.alpha_composite(overlay, origin)`` on RGBA.
+
+        With restore_logo the overlay already holds the logo, so the part it
+        shares with the logo is blended over the background without logo.
+        """
+        import numpy as np
+        bbox = overlay.getbbox()
+        if bbox is None:
+            return
+        left, top = origin[0] + bbox[0], origin[1] + bbox[1]
+        right, bottom = origin[0] + bbox[2], origin[1] + bbox[3]
+        destination = self.rgba[top:bottom, left:right]
+        if restore_logo and self.logo_box is not None:
+            logo_left, logo_top = max(left, self.logo_box[0]), max(top, self.logo_box[1])
+            logo_right, logo_bottom = min(right, self.logo_box[2]), min(bottom, self.logo_box[3])
+            if logo_right > logo_left and logo_bottom > logo_top:
+                destination = destination.copy()
+                destination[logo_top - top:logo_bottom - top, logo_left - left:logo_right - left] = self.logo_background[
+                    logo_top - self.logo_box[1]:logo_bottom - self.logo_box[1],
+                    logo_left - self.logo_box[0]:logo_right - self.logo_box[0],
+                ]
+        blended = composite_rgb(destination, np.asarray(overlay.crop(bbox)))
+        canvas.paste(Image.fromarray(blended, "RGB"), (left, top))
@@ -0,0 +1,90 @@
+import logging
+import time
+from io import BytesIO
+from typing import Dict
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class OutputProfile:
+    """Image format and encoder options used to write a certificate.
+
+    Vector profiles are written by the vector backend (text typeset with
+    the bundled fonts over the template) instead of encoding a raster.
+    """
+
+    def __init__(self, name: str, format: str, extension: str, content_type: str, options: Dict, vector: bool = False):
+        self.name = name
+        self.format = format
+        self.extension = extension
+        self.content_type = content_type
+        self.options = options
+        self.vector = vector
+
+    def __repr__(self):
+        return f"OutputProfile({self.name!r})"
+
+
+OUTPUT_PROFILES = {
+    profile.name: profile
+    for profile in (
+        # zlib level 1: several times faster than optimize=True for a slightly bigger file
+        OutputProfile("png_fast", "PNG", ".png", "image/png", {"compress_level": 1}),
+        OutputProfile("png_balanced", "PNG", ".png", "image/png", {"compress_level": 3}),
+        # Exhaustive zlib search, the historical output of save_certificate
+        OutputProfile("png_archival", "PNG", ".png", "image/png", {"optimize": True}),
+        OutputProfile("webp_lossless", "WEBP", ".webp", "image/webp", {"lossless": True, "quality": 80, "method": 4}),
+        OutputProfile("jpeg_hq", "JPEG", ".jpg", "image/jpeg", {"quality": 92, "subsampling": 0, "optimize": True}),
+        OutputProfile("svg", "SVG", ".svg", "image/svg+xml", {}, vector=True),
+        # Opt-in: draws the template from the event's URLs, so the file breaks or changes with them
+        OutputProfile("svg_linked", "SVG", ".svg", "image/svg+xml", {"link_images": True}, vector=True),
+        OutputProfile("pdf", "PDF", ".pdf", "application/pdf", {}, vector=True),
+    )
+}
+DEFAULT_OUTPUT_PROFILE = "png_archival"
+# zlib level of the PNG data embedded in documents: PDF images and the template background of vector certificates
+DOCUMENT_COMPRESS_LEVEL = 6
+
+
+def get_output_profile(name: str) -> OutputProfile:
+    """Return the output profile called name."""
+    try:
+        return OUTPUT_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Invalid output profile: {name}. Available: {', '.join(OUTPUT_PROFILES)}")
+
+
+class EncodedCertificate(BytesIO):
+    """In-memory encoded certificate that also carries how it was produced."""
+
+    def __init__(self, profile: OutputProfile):
+        super().__init__()
+        self.profile = profile
+        self.encode_seconds = 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.getbuffer())
+
+    def stats(self) -> Dict:
+        """Return the profile, encode time and output size for result reporting."""
+        return {
+            "output_profile": self.profile.name,
+            "encode_seconds": round(self.encode_seconds, 4),
+            "certificate_bytes": self.size,
+        }
+
+
+def encode_image(image: Image, profile: OutputProfile) -> EncodedCertificate:
+    """Encode an RGB(A) certificate with the given profile."""
+    if profile.vector:
+        raise ValueError(f"Output profile {profile.name} only encodes vector certificates")
+    start = time.perf_counter()
+    encoded = EncodedCertificate(profile)
+    rgb = image if image.mode == 'RGB' else image.convert('RGB')
+    rgb.save(encoded, format=profile.format, **profile.options)
+    encoded.encode_seconds = time.perf_counter() - start
+    encoded.seek(0)
+    logger.debug(f"Certificado codificado ({profile.name}): {encoded.size} bytes em {encoded.encode_seconds:.3f}s")
+    return encoded
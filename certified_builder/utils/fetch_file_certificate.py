@@ -1,23 +1,197 @@
 from PIL import Image
-from io import BytesIO
+from typing import Dict, Iterable, Union
+import asyncio
+import logging
+import threading
 import httpx
-import os
+from certified_builder.utils.image_cache import CachedResponse, ImageCache, image_cache
+
+try:
+    import h2  # noqa: F401 - required by httpx for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Largest image accepted from a CDN before the download is aborted
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# Status codes worth retrying, anything else fails immediately
+RETRY_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ImageFetcher:
+    """Download certificate images through one pooled ``httpx.AsyncClient``.
+
+    The client (and the event loop it is bound to) is created on first use
+    and kept at module level, so warm Lambda invocations reuse open HTTP/2
+    connections instead of paying a new TCP/TLS handshake per image. All
+    unique URLs of a batch are fetched in parallel, bounded by
+    ``concurrency``; every download is streamed with a size limit, retried
+    with exponential backoff on transient errors and bounded by ``deadline``
+    so one slow CDN cannot stall the whole batch.
+    """
+
+    def __init__(
+        self,
+        cache: ImageCache = image_cache,
+        concurrency: int = 8,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeout: float = 30.0,
+        deadline: float = 60.0,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        retries: int = 3,
+        backoff: float = 0.5,
+        http2: bool = True,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        self.cache = cache
+        self.concurrency = concurrency
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.deadline = deadline
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.transport = transport
+        self._loop = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Union[Image.Image, Exception]]:
+        """Fetch every distinct URL in parallel, mapping it to its image or to the error raised."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        with self._lock:
+            loop = self._get_loop()
+            results = loop.run_until_complete(self._fetch_all(urls))
+        return dict(zip(urls, results))
+
+    def fetch(self, url: str) -> Image.Image:
+        """Fetch a single image, raising on failure."""
+        result = self.fetch_many([url])[url]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def prewarm(self):
+        """Create the event loop and pooled client ahead of the first download."""
+        with self._lock:
+            self._get_loop()
+            self._get_client()
+
+    def close(self):
+        """Close the pooled client and its event loop."""
+        with self._lock:
+            if self._loop is not None:
+                if self._client is not None:
+                    self._loop.run_until_complete(self._client.aclose())
+                self._loop.close()
+            self._loop = None
+            self._client = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self._client = None
+        return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Configure client for Lambda environment
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                verify=False,  # Disable SSL verification if needed
+                follow_redirects=True,
+                transport=self.transport
+            )
+        return self._client
+
+    async def _fetch_all(self, urls):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(url):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self._fetch_image(url), self.deadline)
+                except asyncio.TimeoutError:
+                    return TimeoutError(f"Download took longer than {self.deadline}s")
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
+
+    async def _fetch_image(self, url: str) -> Image.Image:
+        image, headers = self.cache.lookup(url)
+        if image is not None:
+            return image
+        image = self.cache.complete(url, await self._download(url, headers))
+        if image is None:
+            # Cached copy vanished after a 304: fall back to a full download
+            image = self.cache.complete(url, await self._download(url, {}))
+        return image
+
+    async def _download(self, url: str, headers: Dict[str, str]) -> CachedResponse:
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return CachedResponse(304, headers=dict(response.headers))
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                        raise _RetryableStatus(response.status_code)
+                    response.raise_for_status()  # Raise an exception for bad status codes
+                    content = await self._read_limited(response)
+                    return CachedResponse(response.status_code, content, dict(response.headers))
+            except (httpx.TransportError, _RetryableStatus) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"Erro ao baixar {url} ({str(e) or type(e).__name__}), tentativa {attempt} de {self.retries} em {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _read_limited(self, response: httpx.Response) -> bytes:
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise ValueError(f"Image is larger than {self.max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+# Shared fetcher reused across warm invocations
+image_fetcher = ImageFetcher()
+
+
+def fetch_files_certificate(urls_certificate: Iterable[str]) -> Dict[str, Union[Image.Image, Exception]]:
+    """Fetch many images in parallel; failed URLs map to an exception instead of raising."""
+    results = image_fetcher.fetch_many(urls_certificate)
+    return {
+        url: Exception(f"Error fetching certificate: {str(result)}") if isinstance(result, Exception) else result
+        for url, result in results.items()
+    }
+
 
 def fetch_file_certificate(url_certificate) -> Image:
-    # Configure client for Lambda environment
-    client = httpx.Client(
-        timeout=30.0,
-        verify=False,  # Disable SSL verification if needed
-        follow_redirects=True
-    )
-    
     try:
-        response = client.get(url_certificate)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        img = Image.open(BytesIO(response.content))
-        return img
+        return image_fetcher.fetch(url_certificate)
     except Exception as e:
         raise Exception(f"Error fetching certificate: {str(e)}")
-    finally:
-        client.close()
-    
\ No newline at end of file
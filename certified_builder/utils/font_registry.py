@@ -0,0 +1,80 @@
+import logging
+from typing import Dict, Tuple
+from PIL import Image, ImageDraw, ImageFont
+from certified_builder.utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Number of (font, text) bounding boxes kept by default
+DEFAULT_METRICS_CACHE_SIZE = 4096
+# Loaded (font file, size) pairs kept; fit_font tries a few sizes per long name
+DEFAULT_FONT_CACHE_SIZE = 128
+
+
+class FontRegistry:
+    """Load each (font file, size) pair once per process and reuse it.
+
+    The registry lives at module level so a warm Lambda container keeps the
+    parsed fonts between invocations. It also caches ``textbbox`` results,
+    since the same strings (details text, fixed labels) are measured for
+    every participant of an event.
+    """
+
+    def __init__(self, metrics_cache_size: int = DEFAULT_METRICS_CACHE_SIZE, font_cache_size: int = DEFAULT_FONT_CACHE_SIZE):
+        self._fonts = LRUCache(max_entries=font_cache_size)
+        self._metrics = LRUCache(max_entries=metrics_cache_size)
+        # Scratch surface used only to measure text exactly like ImageDraw does
+        self._draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+    @property
+    def metrics_cache_size(self) -> int:
+        return self._metrics.max_entries
+
+    @metrics_cache_size.setter
+    def metrics_cache_size(self, value: int):
+        self._metrics.max_entries = value
+
+    def reset_stats(self):
+        """Zero the font and text metric counters, keeping the loaded fonts."""
+        self._fonts.reset_stats()
+        self._metrics.reset_stats()
+
+    def get_font(self, path: str, size: int) -> ImageFont.FreeTypeFont:
+        """Return the TrueType font for (path, size), loading it on first use."""
+        return self._fonts.get_or_compute((path, size), lambda: self._load(path, size))
+
+    def textbbox(self, text: str, font: ImageFont.FreeTypeFont) -> Tuple[float, float, float, float]:
+        """Return the bounding box of text drawn at (0, 0), using the metrics cache."""
+        if self.metrics_cache_size <= 0:
+            return self._draw.textbbox((0, 0), text, font=font)
+        return self._metrics.get_or_compute((font.path, font.size, text), lambda: self._draw.textbbox((0, 0), text, font=font))
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for fonts and text metrics."""
+        return {
+            "fonts_loaded": len(self._fonts),
+            "font_hits": self._fonts.hits,
+            "font_misses": self._fonts.misses,
+            "metrics_hits": self._metrics.hits,
+            "metrics_misses": self._metrics.misses,
+        }
+
+    def clear(self):
+        """Drop every cached font and metric."""
+        self._fonts.clear()
+        self._metrics.clear()
+
+    @staticmethod
+    def _load(path: str, size: int) -> ImageFont.FreeTypeFont:
+        font = ImageFont.truetype(path, size)
+        logger.debug(f"Fonte carregada: {path} ({size}px)")
+        return font
+
+
+# Shared registry reused across warm invocations
+font_registry = FontRegistry()
+
+
+def get_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Return a cached TrueType font from the shared registry."""
+    return font_registry.get_font(path, size)
@@ -0,0 +1,57 @@
+import hashlib
+import hmac
+import json
+from functools import lru_cache
+from typing import Optional
+from models.certificate import Certificate
+from models.participant import Participant
+
+# Same length as the random codes printed until now (XXX-XXX-XXX)
+VALIDATION_CODE_LENGTH = 9
+
+
+def template_fingerprint(certificate: Certificate) -> str:
+    """Return a digest of everything drawn from the event's template.
+
+    The output profile is left out: it only changes the file extension, and
+    that already gives the certificate a different key.
+    """
+    return _fingerprint(certificate.background, certificate.logo, certificate.details)
+
+
+@lru_cache(maxsize=256)
+def _fingerprint(background: str, logo: str, details: str) -> str:
+    # Every participant of an event shares the template, so it is hashed once
+    payload = json.dumps([background, logo, details])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def idempotency_key(participant: Participant) -> str:
+    """Return the (product_id, order_id, participant_id, email, name, template fingerprint) key of a certificate.
+
+    An order can register several people under one email, so the
+    registration id and the name are part of the key too.
+    """
+    return "|".join((
+        str(participant.event.product_id),
+        str(participant.event.order_id),
+        participant.participant_id or "",
+        participant.email.strip().lower(),
+        " ".join(f"{participant.first_name} {participant.last_name}".lower().split()),
+        template_fingerprint(participant.certificate),
+    ))
+
+
+def deterministic_validation_code(participant: Participant, secret: Optional[str] = None) -> str:
+    """Derive the validation code from the idempotency key, signed with VALIDATION_CODE_SECRET.
+
+    A redelivered message gets the same code, hence the same S3 key, so a
+    certificate already uploaded can be found and skipped instead of being
+    uploaded again under a new random code. The key is made of public data,
+    so the HMAC keeps anyone without the secret from computing valid codes.
+    """
+    if secret is None:
+        from config import config
+        secret = config.VALIDATION_CODE_SECRET
+    digest = hmac.new(secret.encode("utf-8"), idempotency_key(participant).encode("utf-8"), hashlib.sha256).hexdigest()
+    return digest[:VALIDATION_CODE_LENGTH]
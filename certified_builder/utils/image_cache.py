@@ -0,0 +1,315 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+from PIL import Image
+from certified_builder.utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "/tmp/certified_builder/images"
+# Decoded pixels kept in memory (a 3508x2480 RGBA template is ~35 MB)
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+# Encoded bytes kept on disk, a fraction of Lambda's 512 MB /tmp
+DEFAULT_MAX_DISK_BYTES = 128 * 1024 * 1024
+# Seconds a cached image is trusted before being revalidated with the server
+DEFAULT_TTL = 300
+
+
+class CachedResponse:
+    """Minimal HTTP response handed to the cache by its fetch function."""
+
+    def __init__(self, status_code: int, content: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class ImageCache:
+    """Two-tier cache of downloaded images.
+
+    The memory tier is an LRU of decoded images bounded by a byte budget. The
+    disk tier keeps the encoded bytes under ``cache_dir`` (``/tmp`` survives
+    between warm Lambda invocations): an index entry per URL points to a
+    content-addressed blob and stores its ETag and Last-Modified, so stale
+    entries are revalidated with a conditional GET instead of downloaded again.
+    The disk tier is bounded by ``max_disk_bytes``: the least recently used
+    blobs are deleted along with the index entries pointing to them. The
+    directories are created, and blobs left by earlier processes accounted
+    for, on first use.
+
+    Cached images are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES, ttl: float = DEFAULT_TTL, max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        # Decoded images by content digest, bounded by their uncompressed size
+        self._memory = LRUCache(max_weight=max_memory_bytes, weigh=self._image_bytes)
+        self._index: Dict[str, dict] = {}
+        # Blob sizes by digest in least recently used order, None until the disk tier is opened
+        self._disk: "Optional[OrderedDict[str, int]]" = None
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def max_memory_bytes(self) -> int:
+        return self._memory.max_weight
+
+    @max_memory_bytes.setter
+    def max_memory_bytes(self, value: int):
+        self._memory.max_weight = value
+
+    def reset_stats(self):
+        """Zero the request counters of the next batch; cached images stay in memory and on disk."""
+        self._memory.reset_stats()
+        self.requests = 0
+        self.disk_hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.disk_evictions = 0
+
+    def get(self, url: str, fetch: Callable[[str, Dict[str, str]], CachedResponse]) -> Image.Image:
+        """Return the decoded image for url, calling fetch(url, headers) only when needed."""
+        image, headers = self.lookup(url)
+        if image is not None:
+            return image
+        image = self.complete(url, fetch(url, headers))
+        if image is None:
+            # Cached copy vanished after a 304: fall back to a full download
+            image = self.complete(url, fetch(url, {}))
+        return image
+
+    def lookup(self, url: str) -> Tuple[Optional[Image.Image], Dict[str, str]]:
+        """Return (image, {}) for a fresh cached copy, else (None, conditional request headers)."""
+        with self._lock:
+            self.requests += 1
+            entry = self._entry(url)
+            if entry and not self._available(entry):
+                # Nothing left to revalidate against, download it again
+                return None, {}
+
+            if entry and time.time() - entry["validated_at"] < self.ttl:
+                image = self._load(entry)
+                if image is not None:
+                    self.bytes_saved += entry["size"]
+                    return image, {}
+
+            headers = {}
+            if entry:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+            return None, headers
+
+    def complete(self, url: str, response: CachedResponse) -> Optional[Image.Image]:
+        """Store the response to a lookup; returns None if a 304 arrived but the cached copy is gone."""
+        with self._lock:
+            entry = self._entry(url)
+            if response.status_code == 304:
+                image = self._load(entry) if entry else None
+                if image is not None:
+                    self.revalidated += 1
+                    self.bytes_saved += entry["size"]
+                    entry["validated_at"] = time.time()
+                    self._write_index(url, entry)
+                return image
+
+            self.misses += 1
+            self.bytes_downloaded += len(response.content)
+            return self._store(url, response)
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters and the hit rate since the last reset."""
+        hits = self._memory.hits + self.disk_hits + self.revalidated
+        return {
+            "requests": self.requests,
+            "memory_hits": self._memory.hits,
+            "disk_hits": self.disk_hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": round(hits / self.requests, 4) if self.requests else 0.0,
+            "bytes_downloaded": self.bytes_downloaded,
+            "bytes_saved": self.bytes_saved,
+            "memory_bytes": self._memory.weight,
+            "disk_bytes": self._disk_bytes,
+            "disk_evictions": self.disk_evictions,
+        }
+
+    def clear(self):
+        """Drop the memory tier and the in-process index (disk blobs are kept)."""
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+        self.reset_stats()
+
+    def _open_disk(self) -> bool:
+        """Create the cache directories and account for the blobs already there, once."""
+        if not self.cache_dir:
+            return False
+        if self._disk is not None:
+            return True
+        try:
+            os.makedirs(os.path.join(self.cache_dir, "index"), exist_ok=True)
+            os.makedirs(os.path.join(self.cache_dir, "blobs"), exist_ok=True)
+            blobs = []
+            for entry in os.scandir(os.path.join(self.cache_dir, "blobs")):
+                if entry.name.endswith(".tmp"):
+                    # Left by a process that died while writing
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, entry.name, stat.st_size))
+            self._disk = OrderedDict((digest, size) for _, digest, size in sorted(blobs))
+            self._disk_bytes = sum(self._disk.values())
+            for entry in os.scandir(os.path.join(self.cache_dir, "index")):
+                index_entry = None if entry.name.endswith(".tmp") else self._read_index(entry.path)
+                if index_entry is None or index_entry["digest"] not in self._disk:
+                    # Points to a blob that was evicted, or was never completely written
+                    os.remove(entry.path)
+                else:
+                    self._index.setdefault(index_entry["url"], index_entry)
+        except OSError as e:
+            logger.warning(f"Cache de imagens em disco indisponível, usando apenas memória: {str(e)}")
+            self.cache_dir = None
+            self._disk = None
+            return False
+        self._evict_disk()
+        return True
+
+    def _entry(self, url: str) -> Optional[dict]:
+        entry = self._index.get(url)
+        if entry is None and self._open_disk():
+            entry = self._read_index(self._index_path(url))
+            if entry is not None:
+                self._index[url] = entry
+        return entry
+
+    @staticmethod
+    def _read_index(path: str) -> Optional[dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _available(self, entry: dict) -> bool:
+        digest = entry["digest"]
+        return digest in self._memory or self._open_disk() and digest in self._disk
+
+    def _load(self, entry: dict) -> Optional[Image.Image]:
+        digest = entry["digest"]
+        image = self._memory.get(digest)
+        if image is not None:
+            return image
+        if not self._open_disk() or digest not in self._disk:
+            return None
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                image = self._decode(f.read())
+            # The modification time orders the blobs for the next process
+            os.utime(self._blob_path(digest))
+        except OSError:
+            self._forget_blob(digest)
+            return None
+        self._disk.move_to_end(digest)
+        self.disk_hits += 1
+        self._remember(digest, image)
+        return image
+
+    def _store(self, url: str, response: CachedResponse) -> Image.Image:
+        image = self._decode(response.content)
+        digest = hashlib.sha256(response.content).hexdigest()
+        entry = {
+            "url": url,
+            "digest": digest,
+            "size": len(response.content),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "validated_at": time.time(),
+        }
+        self._index[url] = entry
+        if self._open_disk() and entry["size"] <= self.max_disk_bytes:
+            try:
+                if digest in self._disk:
+                    self._disk.move_to_end(digest)
+                else:
+                    self._write_atomic(self._blob_path(digest), response.content)
+                    self._disk[digest] = entry["size"]
+                    self._disk_bytes += entry["size"]
+                    self._evict_disk()
+                self._write_index(url, entry)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar imagem em cache no disco: {str(e)}")
+        self._remember(digest, image)
+        return image
+
+    def _remember(self, digest: str, image: Image.Image):
+        # Keep the image already shared for this content, so callers comparing by identity see no change
+        if digest not in self._memory:
+            self._memory.put(digest, image)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes:
+            digest = next(iter(self._disk))
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError as e:
+                logger.warning(f"Erro ao remover imagem do cache em disco: {str(e)}")
+            self._forget_blob(digest)
+            self.disk_evictions += 1
+
+    def _forget_blob(self, digest: str):
+        self._disk_bytes -= self._disk.pop(digest, 0)
+        # Index entries of the blob would only lead to a full download, remove them too
+        for url in [url for url, entry in self._index.items() if entry["digest"] == digest]:
+            if digest not in self._memory:
+                del self._index[url]
+            try:
+                os.remove(self._index_path(url))
+            except OSError:
+                pass
+
+    def _write_index(self, url: str, entry: dict):
+        if self.cache_dir:
+            try:
+                self._write_atomic(self._index_path(url), json.dumps(entry).encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"Erro ao gravar índice do cache de imagens: {str(e)}")
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, "index", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", digest)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _decode(content: bytes) -> Image.Image:
+        image = Image.open(BytesIO(content))
+        image.load()
+        return image
+
+    @staticmethod
+    def _image_bytes(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+
+# Shared cache reused across warm invocations
+image_cache = ImageCache()
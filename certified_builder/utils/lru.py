@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the most recently used entries.
+
+    Entries are evicted oldest first once there are more than
+    ``max_entries`` of them or, with ``weigh``, once their weights add up to
+    more than ``max_weight``. A limit of None is no limit; ``max_entries``
+    of 0 or less stores nothing. ``hits`` and ``misses`` count the lookups
+    made with ``get`` and ``get_or_compute``.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_weight: Optional[int] = None, weigh: Optional[Callable[[object], int]] = None):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self._weigh = weigh
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset hit/miss counters without dropping entries."""
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        """Return the value of key, marking it as recently used, or default."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self._entries[key]
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """Return the value of key, storing compute() on a miss.
+
+        compute runs outside the lock, so a slow computation does not block
+        lookups of other keys; two threads missing the same key may both run it.
+        """
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return self._entries[key]
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key: Hashable, value):
+        """Store value under key as the most recently used entry, evicting old entries past the limits."""
+        if self.max_entries is not None and self.max_entries <= 0:
+            return
+        weight = self._weigh(value) if self._weigh else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            # Would evict everything else and still not fit
+            return
+        with self._lock:
+            previous = self._entries.pop(key, _MISSING)
+            if previous is not _MISSING and self._weigh:
+                self._weight -= self._weigh(previous)
+            self._entries[key] = value
+            self._weight += weight
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_weight is not None and self._weight > self.max_weight)
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                if self._weigh:
+                    self._weight -= self._weigh(evicted)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+        self.reset_stats()
+
+    @property
+    def weight(self) -> int:
+        """Sum of the weights of the stored entries (0 without weigh)."""
+        return self._weight
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Membership does not count as a use
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_MISSING = object()
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAMESPACE = "CertifiedBuilder"
+
+
+def peak_rss_bytes() -> int:
+    """Return the high-water mark of resident memory of this process and its finished children.
+
+    It covers the whole life of the process, so on a warm container it
+    includes the peaks of earlier batches and never goes down.
+    """
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int:
+    """Return the resident memory of this process now, falling back to the high-water mark without /proc."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+class MetricsCollector:
+    """Per-stage wall time and byte counters for one batch.
+
+    Stages are timed with ``span(stage)`` and bytes added with
+    ``add_bytes(stage, n)``; both are thread-safe, so the pipeline's encode
+    and upload threads can share a collector. ``emit()`` writes the batch
+    summary as a single CloudWatch Embedded Metric Format line on stdout,
+    where Lambda turns it into metrics without any API call.
+
+    A forked child starts with an empty collector and a new lock (the
+    parent's lock may have been held by another thread at fork time); its
+    stages are sent back with ``drain()`` and added with ``merge()``.
+    """
+
+    def __init__(self, namespace: str = DEFAULT_NAMESPACE):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.reset()
+        _collectors.add(self)
+
+    def reset(self):
+        """Start a new batch."""
+        with self._lock:
+            self._stages: Dict[str, dict] = {}
+            self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as one call of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stage(stage)
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def drain(self) -> Dict[str, dict]:
+        """Return the stages recorded so far and forget them, for merging into another collector."""
+        with self._lock:
+            stages, self._stages = self._stages, {}
+        return stages
+
+    def merge(self, stages: Dict[str, dict]):
+        """Add stages drained from another collector, such as a render worker's."""
+        with self._lock:
+            for stage, other in stages.items():
+                entry = self._stage(stage)
+                entry["count"] += other["count"]
+                entry["seconds"] += other["seconds"]
+                entry["max_seconds"] = max(entry["max_seconds"], other["max_seconds"])
+                entry["bytes"] += other["bytes"]
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add_bytes(self, stage: str, count: int):
+        with self._lock:
+            self._stage(stage)["bytes"] += count
+
+    def summary(self) -> Dict:
+        """Return the stages, batch wall time, current RSS and the process's peak RSS."""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": entry["count"],
+                    "seconds": round(entry["seconds"], 4),
+                    "max_seconds": round(entry["max_seconds"], 4),
+                    "bytes": entry["bytes"],
+                }
+                for stage, entry in self._stages.items()
+            }
+            wall_seconds = time.perf_counter() - self._started
+        return {
+            "wall_seconds": round(wall_seconds, 4),
+            # Resident memory at the end of the batch, goes down when memory is released
+            "rss_bytes": current_rss_bytes(),
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "stages": stages,
+        }
+
+    def emf(self, dimensions: Optional[Dict[str, str]] = None, summary: Optional[Dict] = None) -> Dict:
+        """Return the summary as a CloudWatch Embedded Metric Format document."""
+        summary = summary or self.summary()
+        dimensions = dimensions or {}
+        document = {
+            "wall_seconds": summary["wall_seconds"],
+            "rss_bytes": summary["rss_bytes"],
+            "process_peak_rss_bytes": summary["process_peak_rss_bytes"],
+            **dimensions,
+        }
+        metrics = [
+            {"Name": "wall_seconds", "Unit": "Seconds"},
+            {"Name": "rss_bytes", "Unit": "Bytes"},
+            {"Name": "process_peak_rss_bytes", "Unit": "Bytes"},
+        ]
+        for stage, entry in summary["stages"].items():
+            document[f"{stage}_seconds"] = entry["seconds"]
+            document[f"{stage}_count"] = entry["count"]
+            metrics.append({"Name": f"{stage}_seconds", "Unit": "Seconds"})
+            metrics.append({"Name": f"{stage}_count", "Unit": "Count"})
+            if entry["bytes"]:
+                document[f"{stage}_bytes"] = entry["bytes"]
+                metrics.append({"Name": f"{stage}_bytes", "Unit": "Bytes"})
+
+        document["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": self.namespace,
+                "Dimensions": [sorted(dimensions)],
+                "Metrics": metrics,
+            }],
+        }
+        return document
+
+    def emit(self, dimensions: Optional[Dict[str, str]] = None) -> Dict:
+        """Print the batch summary as one EMF JSON line and return the summary."""
+        summary = self.summary()
+        # Printed rather than logged: the log formatter prefix would break EMF parsing
+        print(json.dumps(self.emf(dimensions, summary)), flush=True)
+        return summary
+
+    def _stage(self, stage: str) -> dict:
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = self._stages[stage] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0}
+        return entry
+
+
+_collectors = weakref.WeakSet()
+
+
+def _reset_collectors_in_child():
+    for collector in list(_collectors):
+        collector._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_collectors_in_child)
+
+# Shared collector used by the builder and the AWS services unless one is injected
+metrics = MetricsCollector()
@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import re
+import zlib
+from io import BytesIO
+from typing import BinaryIO, Dict, List, Tuple
+from PIL import Image
+from certified_builder.utils.encoder import DOCUMENT_COMPRESS_LEVEL
+from certified_builder.utils.truetype import PDF_TABLES, TrueTypeFont
+
+logger = logging.getLogger(__name__)
+
+# Resolution the certificate pixels are printed at, in pixels per inch
+DEFAULT_PDF_DPI = 150
+
+
+def png_image_data(image: Image, compress_level: int = DOCUMENT_COMPRESS_LEVEL) -> bytes:
+    """Return the zlib stream of image encoded as an RGB PNG.
+
+    PNG IDAT data is exactly what a PDF FlateDecode image with the PNG
+    predictors (/Predictor 15) expects, so Pillow's encoder does the row
+    filtering and compression.
+    """
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, format="PNG", compress_level=compress_level)
+    return png_idat(buffer.getbuffer())
+
+
+def png_idat(png: bytes) -> bytes:
+    """Return the concatenated IDAT chunks of an 8-bit RGB PNG file."""
+    data = memoryview(png)
+    position, chunks = 8, []
+    while position < len(data):
+        length = int.from_bytes(data[position:position + 4], "big")
+        if bytes(data[position + 4:position + 8]) == b"IDAT":
+            chunks.append(bytes(data[position + 8:position + 8 + length]))
+        position += 12 + length
+    return b"".join(chunks)
+
+
+class PdfWriter:
+    """Minimal PDF writer for pages made of lossless RGB images and text.
+
+    Objects are written to fileobj as soon as they are added, so memory does
+    not grow with the number of pages; only the byte offsets of the objects
+    and the page list are kept until ``close`` writes the page tree and the
+    cross-reference table. An image added once (e.g. a certificate
+    background) can be drawn on any number of pages.
+
+    Fonts are embedded by ``close`` as TrueType subsets holding only the
+    glyphs the pages used, so a font added once serves every page.
+    """
+
+    def __init__(self, fileobj: BinaryIO, dpi: int = DEFAULT_PDF_DPI, compress_level: int = DOCUMENT_COMPRESS_LEVEL):
+        self.fileobj = fileobj
+        self.scale = 72 / dpi
+        self.compress_level = compress_level
+        # Objects 1 and 2 are the catalog and the page tree, written last
+        self._offsets = {}
+        self._next_object = 3
+        self._pages: List[int] = []
+        # Font object number -> (font, {glyph id: character}) of the glyphs drawn with it
+        self._fonts: Dict[int, Tuple[TrueTypeFont, Dict[int, str]]] = {}
+        self._position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def add_image(self, image: Image) -> int:
+        """Embed image as an RGB image XObject and return its object number."""
+        return self.add_image_data(png_image_data(image, self.compress_level), image.size)
+
+    def add_image_data(self, data: bytes, size: Tuple[int, int]) -> int:
+        """Embed the IDAT stream of an RGB PNG of size pixels (see ``png_idat``) as an image XObject."""
+        width, height = size
+        return self._add_object(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+            f"/BitsPerComponent 8 /Filter /FlateDecode "
+            f"/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {width} >> /Length {len(data)} >>",
+            data,
+        )
+
+    def add_font(self, font: TrueTypeFont) -> int:
+        """Reserve a font object for font and return its number; the font is written by ``close``."""
+        number = self._next_object
+        self._next_object += 1
+        self._fonts[number] = (font, {})
+        return number
+
+    def add_page(self, size: Tuple[int, int], placements: List[Tuple[int, Tuple[int, int, int, int]]], texts: List[tuple] = ()) -> int:
+        """Add a page of size pixels drawing each (image object, (left, top, right, bottom)) in order.
+
+        texts are then drawn over the images, each as (font object, font
+        size, (x, baseline), glyphs, fill) in pixels, glyphs being
+        (glyph id, character, advance) so every glyph lands where the
+        rasterizer placed it.
+        """
+        width, height = size[0] * self.scale, size[1] * self.scale
+        commands = []
+        resources = []
+        for index, (image_object, (left, top, right, bottom)) in enumerate(placements):
+            # PDF y grows upwards from the bottom of the page
+            commands.append(
+                f"q {_number((right - left) * self.scale)} 0 0 {_number((bottom - top) * self.scale)} "
+                f"{_number(left * self.scale)} {_number(height - bottom * self.scale)} cm /Im{index} Do Q"
+            )
+            resources.append(f"/Im{index} {image_object} 0 R")
+        fonts = {}
+        for font_object, font_size, (x, baseline), glyphs, fill in texts:
+            name = fonts.setdefault(font_object, f"F{len(fonts)}")
+            commands.append(self._text_command(name, font_object, font_size, (x, height / self.scale - baseline), glyphs, fill))
+        content = "\n".join(commands).encode("ascii")
+        content_object = self._add_object(f"<< /Length {len(content)} >>", content)
+        font_resources = f" /Font << {' '.join(f'/{name} {number} 0 R' for number, name in fonts.items())} >>" if fonts else ""
+        page_object = self._add_object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_number(width)} {_number(height)}] "
+            f"/Resources << /XObject << {' '.join(resources)} >>{font_resources} >> /Contents {content_object} 0 R >>"
+        )
+        self._pages.append(page_object)
+        return page_object
+
+    def close(self):
+        """Write the fonts, page tree, catalog, cross-reference table and trailer."""
+        for number, (font, glyphs) in self._fonts.items():
+            self._write_font(number, font, glyphs)
+        kids = " ".join(f"{page} 0 R" for page in self._pages)
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>")
+        self._write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self._position
+        lines = [f"xref\n0 {self._next_object}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[number]:010d} 00000 n \n" for number in range(1, self._next_object)]
+        lines.append(f"trailer\n<< /Size {self._next_object} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode("ascii"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+
+    def _text_command(self, name: str, font_object: int, font_size: float, origin: Tuple[float, float], glyphs: list, fill: tuple) -> str:
+        font, used = self._fonts[font_object]
+        scale = 1000 / font.units_per_em
+        # Text space is in thousandths of the font size: after each glyph move
+        # from its advance in the font to the rasterizer's (hinted) advance
+        shown = []
+        for index, (glyph_id, char, advance) in enumerate(glyphs):
+            used.setdefault(glyph_id, char)
+            shown.append(f"<{glyph_id:04X}>")
+            if index < len(glyphs) - 1:
+                adjustment = font.advance_width(glyph_id) * scale - advance * 1000 / font_size
+                if abs(adjustment) >= 0.001:
+                    shown.append(_number(adjustment))
+        color = " ".join(_number(channel / 255) for channel in fill[:3])
+        return (
+            f"BT /{name} {_number(font_size * self.scale)} Tf {color} rg "
+            f"{_number(origin[0] * self.scale)} {_number(origin[1] * self.scale)} Td [{' '.join(shown)}] TJ ET"
+        )
+
+    def _write_font(self, number: int, font: TrueTypeFont, glyphs: Dict[int, str]):
+        """Write font as a Type0 font whose character codes are its glyph ids (Identity-H)."""
+        scale = 1000 / font.units_per_em
+        glyph_ids = sorted(glyphs)
+        # Subsets are named with a tag unique to their glyphs (PDF 32000-1, 9.6.4)
+        digest = hashlib.sha256(repr(glyph_ids).encode("ascii")).digest()
+        base_font = "".join(chr(ord("A") + value % 26) for value in digest[:6]) + "+" + re.sub(r"[^A-Za-z0-9_-]", "", font.postscript_name)
+
+        program = font.subset(glyph_ids, PDF_TABLES)
+        compressed = zlib.compress(program, self.compress_level)
+        font_file = self._add_object(f"<< /Length1 {len(program)} /Filter /FlateDecode /Length {len(compressed)} >>", compressed)
+        bbox = " ".join(_number(value * scale) for value in font.bbox)
+        descriptor = self._add_object(
+            f"<< /Type /FontDescriptor /FontName /{base_font} /Flags 32 /FontBBox [{bbox}] "
+            f"/ItalicAngle {_number(font.italic_angle)} /Ascent {_number(font.ascent * scale)} /Descent {_number(font.descent * scale)} "
+            f"/CapHeight {_number(font.cap_height * scale)} /StemV 80 /FontFile2 {font_file} 0 R >>"
+        )
+        widths = " ".join(f"{glyph_id} [{_number(font.advance_width(glyph_id) * scale)}]" for glyph_id in glyph_ids)
+        descendant = self._add_object(
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor} 0 R /CIDToGIDMap /Identity /W [{widths}] >>"
+        )
+        to_unicode = _to_unicode_cmap(glyphs)
+        to_unicode_object = self._add_object(f"<< /Length {len(to_unicode)} >>", to_unicode)
+        self._write_object(
+            number,
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} /Encoding /Identity-H "
+            f"/DescendantFonts [{descendant} 0 R] /ToUnicode {to_unicode_object} 0 R >>",
+        )
+
+    def _add_object(self, dictionary: str, stream: bytes = None) -> int:
+        number = self._next_object
+        self._next_object += 1
+        self._write_object(number, dictionary, stream)
+        return number
+
+    def _write_object(self, number: int, dictionary: str, stream: bytes = None):
+        self._offsets[number] = self._position
+        self._write(f"{number} 0 obj\n{dictionary}\n".encode("ascii"))
+        if stream is not None:
+            self._write(b"stream\n")
+            self._write(stream)
+            self._write(b"\nendstream\n")
+        self._write(b"endobj\n")
+
+    def _write(self, data: bytes):
+        self.fileobj.write(data)
+        self._position += len(data)
+
+
+def _to_unicode_cmap(glyphs: Dict[int, str]) -> bytes:
+    """Return the CMap mapping glyph ids back to text, for copying and searching."""
+    lines = [
+        "/CIDInit /ProcSet findresource begin",
+        "12 dict begin",
+        "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def",
+        "/CMapType 2 def",
+        "1 begincodespacerange",
+        "<0000> <FFFF>",
+        "endcodespacerange",
+    ]
+    entries = [(glyph_id, char) for glyph_id, char in sorted(glyphs.items()) if glyph_id]
+    # At most 100 entries per bfchar block
+    for start in range(0, len(entries), 100):
+        block = entries[start:start + 100]
+        lines.append(f"{len(block)} beginbfchar")
+        lines += [f"<{glyph_id:04X}> <{char.encode('utf-16-be').hex().upper()}>" for glyph_id, char in block]
+        lines.append("endbfchar")
+    lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    return "\n".join(lines).encode("ascii")
+
+
+def _number(value: float) -> str:
+    return f"{value:.4f}".rstrip("0").rstrip(".")
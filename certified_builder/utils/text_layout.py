@@ -0,0 +1,146 @@
+import logging
+import math
+from typing import Dict, List, Tuple
+from PIL import Image, ImageDraw, ImageFont
+from certified_builder.utils.font_registry import FontRegistry, font_registry
+from certified_builder.utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Number of details layouts (and rendered details images) kept by default
+DEFAULT_LAYOUT_CACHE_SIZE = 64
+# Extra line spacing below each details line, in pixels
+DETAILS_LINE_SPACING = 10
+# Rows kept below the last details line so no antialiased pixel is clipped
+DETAILS_PADDING = 4
+
+
+class DetailsLayout:
+    """Lines of a details text, each as (x, y, text) relative to the details origin."""
+
+    def __init__(self, lines: List[Tuple[float, int, str]], bottom: float, left: float = 0.0, right: float = 0.0):
+        self.lines = lines
+        # Lowest row reached by the glyphs, relative to the details origin
+        self.bottom = bottom
+        # Leftmost and rightmost columns reached by the glyphs
+        self.left = left
+        self.right = right
+        self._image = None
+
+    def image(self, width: int, font: ImageFont.FreeTypeFont, fill: tuple) -> Image.Image:
+        """Return the details drawn on a transparent strip as wide as the certificate.
+
+        The strip is rendered on first use and shared by every participant;
+        it must not be modified in place.
+        """
+        if self._image is None:
+            image = Image.new("RGBA", (width, math.ceil(self.bottom) + DETAILS_PADDING), (255, 255, 255, 0))
+            draw = ImageDraw.Draw(image)
+            for x, y, line in self.lines:
+                draw.text((x, y), line, fill=fill, font=font)
+            self._image = image
+        return self._image
+
+
+class TextLayout:
+    """Cached text layout shared by every certificate of an event.
+
+    The details text is the same for all participants, so its line breaking,
+    measurements and rendered strip are computed once per (text, font,
+    width) and kept in an LRU. Long names can be shrunk to fit the
+    certificate width with ``fit_font``.
+    """
+
+    def __init__(self, registry: FontRegistry = font_registry, cache_size: int = DEFAULT_LAYOUT_CACHE_SIZE):
+        self.registry = registry
+        self._layouts = LRUCache(max_entries=cache_size)
+
+    @property
+    def cache_size(self) -> int:
+        return self._layouts.max_entries
+
+    @cache_size.setter
+    def cache_size(self, value: int):
+        self._layouts.max_entries = value
+
+    def reset_stats(self):
+        """Start counting layout hits and misses from zero (the cached layouts stay)."""
+        self._layouts.reset_stats()
+
+    def details(self, text: str, font: ImageFont.FreeTypeFont, width: int, max_width: int) -> DetailsLayout:
+        """Return the centered layout of the details text for a certificate width."""
+        key = (text, font.path, font.size, width, max_width)
+        return self._layouts.get_or_compute(key, lambda: self._layout_details(text, font, width, max_width))
+
+    def fit_font(self, text: str, path: str, size: int, max_width: int, min_size: int) -> ImageFont.FreeTypeFont:
+        """Return the font at size, or the largest smaller size (down to min_size) whose text fits max_width."""
+        font = self.registry.get_font(path, size)
+        if self._width(text, font) <= max_width or size <= min_size:
+            return font
+        low, high = min_size, size - 1
+        best = min_size
+        while low <= high:
+            middle = (low + high) // 2
+            if self._width(text, self.registry.get_font(path, middle)) <= max_width:
+                best, low = middle, middle + 1
+            else:
+                high = middle - 1
+        logger.debug(f"Fonte reduzida de {size}px para {best}px para caber '{text}'")
+        return self.registry.get_font(path, best)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "layouts_cached": len(self._layouts),
+            "layout_hits": self._layouts.hits,
+            "layout_misses": self._layouts.misses,
+        }
+
+    def clear(self):
+        """Drop every cached layout."""
+        self._layouts.clear()
+
+    def _layout_details(self, text: str, font: ImageFont.FreeTypeFont, width: int, max_width: int) -> DetailsLayout:
+        line_height = font.size + DETAILS_LINE_SPACING
+        lines = []
+        bottom = 0
+        left, right = width, 0
+        for index, line in enumerate(self._break_lines(text.split(), font, max_width)):
+            bbox = self.registry.textbbox(line, font)
+            x = (width - (bbox[2] - bbox[0])) / 2
+            y = line_height * index
+            lines.append((x, y, line))
+            bottom = max(bottom, y + bbox[3])
+            if bbox[2] > bbox[0]:
+                left, right = min(left, x + bbox[0]), max(right, x + bbox[2])
+        return DetailsLayout(lines, bottom, left, max(left, right))
+
+    def _break_lines(self, words: List[str], font: ImageFont.FreeTypeFont, max_width: int) -> List[str]:
+        # Historical layout: three lines with the same number of words
+        words_per_line = len(words) // 3
+        lines = [
+            ' '.join(words[:words_per_line]),
+            ' '.join(words[words_per_line:words_per_line * 2]),
+            ' '.join(words[words_per_line * 2:]),
+        ]
+        if all(self._width(line, font) <= max_width for line in lines):
+            return lines
+
+        # Too wide for the certificate: greedy wrap on the measured width
+        lines, current = [], []
+        for word in words:
+            if current and self._width(' '.join(current + [word]), font) > max_width:
+                lines.append(' '.join(current))
+                current = [word]
+            else:
+                current.append(word)
+        if current:
+            lines.append(' '.join(current))
+        return lines
+
+    def _width(self, text: str, font: ImageFont.FreeTypeFont) -> float:
+        bbox = self.registry.textbbox(text, font)
+        return bbox[2] - bbox[0]
+
+
+# One instance per process, so a warm container keeps the details layouts of recent events
+text_layout = TextLayout()
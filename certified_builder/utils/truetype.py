@@ -0,0 +1,267 @@
+import itertools
+import logging
+from collections import deque
+import os
+import struct
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tables a PDF viewer needs to draw glyphs by id (FontFile2 of a CIDFontType2)
+PDF_TABLES = ("head", "hhea", "maxp", "loca", "glyf", "hmtx", "cvt ", "fpgm", "prep")
+# Tables browsers require of a web font (@font-face in SVG), which maps text through cmap
+WEB_TABLES = PDF_TABLES + ("cmap", "OS/2", "name", "post", "gasp")
+
+# Tables read when the font is opened
+REQUIRED_TABLES = ("head", "hhea", "maxp", "hmtx", "loca", "glyf", "cmap")
+
+# Composite glyph component flags (glyf table)
+_ARG_1_AND_2_ARE_WORDS = 0x0001
+_WE_HAVE_A_SCALE = 0x0008
+_MORE_COMPONENTS = 0x0020
+_WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+_WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+class TrueTypeFont:
+    """Read-only view of a TrueType font file for embedding it in documents.
+
+    Only what the vector backend needs is parsed: the character map, the
+    horizontal metrics, the global metrics of the font descriptor and the
+    glyph outlines, which ``subset`` copies for the glyphs a document uses.
+    Glyph ids are kept in subsets, so text can be written as glyph ids of
+    the original font.
+
+    Fonts that are truncated or whose tables point outside the file raise
+    ValueError when opened or subset, instead of producing a broken font.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+        try:
+            self._read()
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"Malformed TrueType font {path}: {str(e)}") from e
+
+    def _read(self):
+        count = struct.unpack_from(">H", self.data, 4)[0]
+        self.tables: Dict[str, Tuple[int, int]] = {}
+        for index in range(count):
+            tag, _, offset, length = struct.unpack_from(">4sIII", self.data, 12 + 16 * index)
+            if offset + length > len(self.data):
+                raise ValueError(f"Malformed TrueType font {self.path}: table {tag!r} ends past the end of the file")
+            self.tables[tag.decode("latin-1")] = (offset, length)
+        missing = [tag for tag in REQUIRED_TABLES if tag not in self.tables]
+        if missing:
+            raise ValueError(f"Malformed TrueType font {self.path}: missing tables {', '.join(missing)}")
+
+        head = self.table("head")
+        self.units_per_em = struct.unpack_from(">H", head, 18)[0]
+        self.bbox = struct.unpack_from(">hhhh", head, 36)
+        long_offsets = struct.unpack_from(">h", head, 50)[0] == 1
+        hhea = self.table("hhea")
+        self.ascent, self.descent = struct.unpack_from(">hh", hhea, 4)
+        metrics_count = struct.unpack_from(">H", hhea, 34)[0]
+        self.glyph_count = struct.unpack_from(">H", self.table("maxp"), 4)[0]
+
+        os2 = self.table("OS/2") if "OS/2" in self.tables else b""
+        version = struct.unpack_from(">H", os2, 0)[0] if os2 else 0
+        self.cap_height = struct.unpack_from(">h", os2, 88)[0] if version >= 2 and len(os2) >= 90 else self.ascent
+        post = self.table("post") if "post" in self.tables else b""
+        self.italic_angle = struct.unpack_from(">i", post, 4)[0] / 65536 if post else 0.0
+
+        hmtx = self.table("hmtx")
+        advances = [struct.unpack_from(">H", hmtx, 4 * index)[0] for index in range(metrics_count)]
+        self._advances = advances + [advances[-1]] * (self.glyph_count - metrics_count)
+
+        loca = self.table("loca")
+        if long_offsets:
+            self._loca = struct.unpack_from(f">{self.glyph_count + 1}I", loca)
+        else:
+            self._loca = tuple(offset * 2 for offset in struct.unpack_from(f">{self.glyph_count + 1}H", loca))
+        if any(start > end for start, end in zip(self._loca, self._loca[1:])) or self._loca[-1] > self.tables["glyf"][1]:
+            raise ValueError(f"Malformed TrueType font {self.path}: glyph offsets (loca) out of order or past the glyf table")
+        self._cmap = self._read_cmap()
+        self.postscript_name = self._read_postscript_name() or os.path.splitext(os.path.basename(self.path))[0]
+
+    def table(self, tag: str) -> bytes:
+        offset, length = self.tables[tag]
+        return self.data[offset:offset + length]
+
+    def glyph_id(self, char: str) -> int:
+        """Return the glyph of char, 0 (.notdef) if the font does not have it."""
+        return self._cmap.get(ord(char), 0)
+
+    def advance_width(self, glyph_id: int) -> int:
+        """Return the advance of a glyph in font units."""
+        return self._advances[glyph_id]
+
+    def subset(self, glyph_ids: Iterable[int], tables: Iterable[str] = PDF_TABLES) -> bytes:
+        """Return a font file with only the outlines of glyph_ids (and of .notdef), keeping glyph ids.
+
+        Every other glyph is left empty, the components of composite glyphs
+        are kept, and only the given tables are written; ``post`` is reduced
+        to its header since glyph names are not needed.
+        """
+        glyf = self.table("glyf")
+        outlines, lengths = [], [0] * self.glyph_count
+        for glyph_id in sorted(self._with_components(set(glyph_ids) | {0})):
+            outline = glyf[self._loca[glyph_id]:self._loca[glyph_id + 1]]
+            outline += b"\0" * (-len(outline) % 4)
+            outlines.append(outline)
+            lengths[glyph_id] = len(outline)
+        loca = [0, *itertools.accumulate(lengths)]
+
+        written = {}
+        for tag in tables:
+            if tag == "glyf":
+                written[tag] = b"".join(outlines)
+            elif tag == "loca":
+                written[tag] = struct.pack(f">{len(loca)}I", *loca)
+            elif tag == "head":
+                head = bytearray(self.table("head"))
+                # Checksum adjustment is computed over the new file, offsets are now long
+                struct.pack_into(">I", head, 8, 0)
+                struct.pack_into(">h", head, 50, 1)
+                written[tag] = bytes(head)
+            elif tag == "post":
+                written[tag] = struct.pack(">I", 0x00030000) + self.table("post")[4:32]
+            elif tag in self.tables:
+                written[tag] = self.table(tag)
+        return _write_font(written)
+
+    def _with_components(self, glyph_ids: set) -> set:
+        glyf = self.table("glyf")
+        pending = deque(glyph_id for glyph_id in glyph_ids if 0 <= glyph_id < self.glyph_count)
+        keep = set(pending)
+        while pending:
+            glyph_id = pending.popleft()
+            start, end = self._loca[glyph_id], self._loca[glyph_id + 1]
+            if end - start < 10 or struct.unpack_from(">h", glyf, start)[0] >= 0:
+                continue
+            position, flags = start + 10, _MORE_COMPONENTS
+            while flags & _MORE_COMPONENTS:
+                # Loca was checked against the table, the component records must also end inside the glyph
+                if position + 4 > end:
+                    raise ValueError(f"Malformed TrueType font {self.path}: composite glyph {glyph_id} runs past its end")
+                flags, component = struct.unpack_from(">HH", glyf, position)
+                position += 4 + (4 if flags & _ARG_1_AND_2_ARE_WORDS else 2)
+                if flags & _WE_HAVE_A_SCALE:
+                    position += 2
+                elif flags & _WE_HAVE_AN_X_AND_Y_SCALE:
+                    position += 4
+                elif flags & _WE_HAVE_A_TWO_BY_TWO:
+                    position += 8
+                if position > end:
+                    raise ValueError(f"Malformed TrueType font {self.path}: composite glyph {glyph_id} runs past its end")
+                if component not in keep and component < self.glyph_count:
+                    keep.add(component)
+                    pending.append(component)
+        return keep
+
+    def _read_cmap(self) -> Dict[int, int]:
+        cmap = self.table("cmap")
+        subtables = {}
+        for index in range(struct.unpack_from(">H", cmap, 2)[0]):
+            platform, encoding, offset = struct.unpack_from(">HHI", cmap, 4 + 8 * index)
+            subtables[(platform, encoding)] = offset
+        # Full Unicode (format 12) first, then the BMP subtables
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            offset = subtables.get(key)
+            if offset is None:
+                continue
+            format = struct.unpack_from(">H", cmap, offset)[0]
+            if format == 12:
+                return _read_cmap_format_12(cmap, offset)
+            if format == 4:
+                return _read_cmap_format_4(cmap, offset)
+        logger.warning(f"Fonte sem cmap Unicode suportado: {self.path}")
+        return {}
+
+    def _read_postscript_name(self) -> Optional[str]:
+        name = self.table("name") if "name" in self.tables else b""
+        if not name:
+            return None
+        count, strings = struct.unpack_from(">HH", name, 2)
+        for index in range(count):
+            platform, _, _, name_id, length, offset = struct.unpack_from(">HHHHHH", name, 6 + 12 * index)
+            if name_id != 6:
+                continue
+            value = name[strings + offset:strings + offset + length]
+            return value.decode("utf-16-be" if platform in (0, 3) else "latin-1")
+        return None
+
+
+def _read_cmap_format_4(cmap: bytes, offset: int) -> Dict[int, int]:
+    segments = struct.unpack_from(">H", cmap, offset + 6)[0] // 2
+    ends = struct.unpack_from(f">{segments}H", cmap, offset + 14)
+    starts = struct.unpack_from(f">{segments}H", cmap, offset + 16 + 2 * segments)
+    deltas = struct.unpack_from(f">{segments}h", cmap, offset + 16 + 4 * segments)
+    range_offsets_at = offset + 16 + 6 * segments
+    range_offsets = struct.unpack_from(f">{segments}H", cmap, range_offsets_at)
+    mapping = {}
+    for index in range(segments):
+        for code in range(starts[index], ends[index] + 1):
+            if code == 0xFFFF:
+                break
+            if range_offsets[index] == 0:
+                glyph_id = (code + deltas[index]) & 0xFFFF
+            else:
+                # idRangeOffset is relative to its own position in the array
+                position = range_offsets_at + 2 * index + range_offsets[index] + 2 * (code - starts[index])
+                glyph_id = struct.unpack_from(">H", cmap, position)[0]
+                if glyph_id:
+                    glyph_id = (glyph_id + deltas[index]) & 0xFFFF
+            if glyph_id:
+                mapping[code] = glyph_id
+    return mapping
+
+
+def _read_cmap_format_12(cmap: bytes, offset: int) -> Dict[int, int]:
+    mapping = {}
+    for index in range(struct.unpack_from(">I", cmap, offset + 12)[0]):
+        start, end, glyph_id = struct.unpack_from(">III", cmap, offset + 16 + 12 * index)
+        for code in range(start, end + 1):
+            mapping[code] = glyph_id + code - start
+    return mapping
+
+
+def _checksum(data: bytes) -> int:
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _write_font(tables: Dict[str, bytes]) -> bytes:
+    tags = sorted(tables)
+    count = len(tags)
+    power = 1 << (count.bit_length() - 1)
+    header = struct.pack(">IHHHH", 0x00010000, count, power * 16, power.bit_length() - 1, count * 16 - power * 16)
+    records, body = [], []
+    offset = 12 + 16 * count
+    for tag in tags:
+        data = tables[tag]
+        records.append(struct.pack(">4sIII", tag.encode("latin-1"), _checksum(data), offset, len(data)))
+        data += b"\0" * (-len(data) % 4)
+        body.append(data)
+        offset += len(data)
+    font = bytearray(header + b"".join(records) + b"".join(body))
+    if "head" in tables:
+        head_offset = 12 + 16 * count + sum(len(data) for tag, data in zip(tags, body) if tag < "head")
+        struct.pack_into(">I", font, head_offset + 8, (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+    return bytes(font)
+
+
+_fonts: Dict[str, TrueTypeFont] = {}
+_lock = threading.Lock()
+
+
+def load_font(path: str) -> TrueTypeFont:
+    """Return the parsed font file at path, read once per process."""
+    with _lock:
+        font = _fonts.get(path)
+        if font is None:
+            font = _fonts[path] = TrueTypeFont(path)
+        return font
@@ -0,0 +1,159 @@
+import base64
+import logging
+import time
+from typing import BinaryIO, Dict, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+from PIL import ImageFont
+from certified_builder.prepared_template import PreparedTemplate
+from certified_builder.utils.encoder import EncodedCertificate, OutputProfile
+from certified_builder.utils.glyph_atlas import DEFAULT_MAX_GLYPHS, DEFAULT_MAX_KERNING_PAIRS
+from certified_builder.utils.lru import LRUCache
+from certified_builder.utils.pdf_writer import DEFAULT_PDF_DPI, PdfWriter, png_idat
+from certified_builder.utils.truetype import WEB_TABLES, load_font
+
+logger = logging.getLogger(__name__)
+
+# Advances by (font, size, character) and kerning by (font, size, pair), shared by every run
+_advances = LRUCache(max_entries=DEFAULT_MAX_GLYPHS)
+_kerning = LRUCache(max_entries=DEFAULT_MAX_KERNING_PAIRS)
+
+
+class TextRun:
+    """A line of text placed like ``ImageDraw.text(position, text, fill=fill, font=font)``."""
+
+    def __init__(self, text: str, font: ImageFont.FreeTypeFont, position: Tuple[float, float], fill: tuple):
+        self.text = text
+        self.font = font
+        self.position = position
+        self.fill = fill
+
+    @property
+    def baseline(self) -> float:
+        # ImageDraw.text places the ascender line at position (anchor "la")
+        return self.position[1] + self.font.getmetrics()[0]
+
+    def advances(self) -> List[float]:
+        """Return the advance of each character, hinted and kerned like the rasterizer lays it out."""
+        font, text = self.font, self.text
+        if font.layout_engine != ImageFont.Layout.BASIC:
+            # Shaped text: measure every prefix
+            pens = [0.0] + [font.getlength(text[:end]) for end in range(1, len(text) + 1)]
+            return [right - left for left, right in zip(pens, pens[1:])]
+        # The basic layout adds hinted advances and pair kerning, like the glyph atlas
+        advances = [_advances.get_or_compute((font.path, font.size, char), lambda: font.getlength(char)) for char in text]
+        for index, pair in enumerate(zip(text, text[1:])):
+            advances[index] += _kerning.get_or_compute(
+                (font.path, font.size) + pair,
+                lambda: font.getlength(pair[0] + pair[1]) - font.getlength(pair[0]) - font.getlength(pair[1]),
+            )
+        return advances
+
+    def glyphs(self) -> List[Tuple[int, str, float]]:
+        """Return (glyph id, character, advance) for each character of the line."""
+        font = load_font(self.font.path)
+        return [(font.glyph_id(char), char, advance) for char, advance in zip(self.text, self.advances())]
+
+
+class VectorCertificate:
+    """Certificate as a document: text typeset with the bundled fonts over the template.
+
+    The template PNG (logo included) is embedded, encoded once per template
+    and shared by every certificate; only the svg_linked profile draws it
+    from the background and logo URLs instead. Fonts are embedded as
+    subsets of the glyphs the document uses.
+    """
+
+    def __init__(self, template: PreparedTemplate, runs: List[TextRun]):
+        self.template = template
+        self.size = template.size
+        self.runs = runs
+
+    @property
+    def background(self) -> bytes:
+        """PNG of the prepared template, encoded on first use."""
+        return self.template.background_png()
+
+    def write_svg(self, fileobj: BinaryIO, link_images: bool = False):
+        """Write the certificate as an SVG document of size pixels.
+
+        With link_images the template is referenced by the URLs it was built
+        from, when it has them, instead of embedded.
+        """
+        width, height = self.size
+        families, glyph_ids, texts = {}, {}, []
+        for run in self.runs:
+            family = families.setdefault(run.font.path, f"f{len(families)}")
+            glyphs = run.glyphs()
+            glyph_ids.setdefault(run.font.path, set()).update(glyph_id for glyph_id, _, _ in glyphs)
+            # One x per character keeps the rasterizer's advances whatever the viewer's shaping
+            pens, pen = [], run.position[0]
+            for _, _, advance in glyphs:
+                pens.append(_number(pen))
+                pen += advance
+            texts.append(
+                f'<text xml:space="preserve" font-family="{family}" font-size="{run.font.size}" fill="#{bytes(run.fill[:3]).hex()}" '
+                f'x="{" ".join(pens)}" y="{_number(run.baseline)}">{escape(run.text)}</text>\n'
+            )
+
+        fileobj.write(
+            f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n<style>\n'.encode("utf-8")
+        )
+        for path, family in families.items():
+            font = base64.b64encode(load_font(path).subset(glyph_ids[path], WEB_TABLES)).decode("ascii")
+            fileobj.write(f'@font-face{{font-family:"{family}";src:url(data:font/ttf;base64,{font}) format("truetype")}}\n'.encode("ascii"))
+        # Glyphs are placed one by one, the fonts' own kerning and ligatures must not move them
+        fileobj.write(b"text{font-kerning:none;font-variant-ligatures:none}\n</style>\n")
+        sources = self.template.image_sources() if link_images else None
+        if sources:
+            for url, (x, y, image_width, image_height) in sources:
+                fileobj.write(
+                    f'<image x="{x}" y="{y}" width="{image_width}" height="{image_height}" '
+                    f'preserveAspectRatio="none" xlink:href={quoteattr(url)}/>\n'.encode("utf-8")
+                )
+        else:
+            fileobj.write(f'<image width="{width}" height="{height}" xlink:href="data:image/png;base64,'.encode("ascii"))
+            fileobj.write(base64.b64encode(self.background))
+            fileobj.write(b'"/>\n')
+        fileobj.write("".join(texts).encode("utf-8"))
+        fileobj.write(b"</svg>\n")
+
+    def write_pdf(self, fileobj: BinaryIO, dpi: int = DEFAULT_PDF_DPI):
+        """Write the certificate as a one-page PDF, printed at dpi pixels per inch."""
+        with PdfWriter(fileobj, dpi=dpi) as writer:
+            self.add_pdf_page(writer, writer.add_image_data(png_idat(self.background), self.size), {})
+
+    def add_pdf_page(self, writer: PdfWriter, background: int, fonts: Dict[str, int]) -> int:
+        """Add the certificate as a page of writer over the background image object.
+
+        fonts maps font paths to the font objects of writer; fonts missing
+        from it are added, so a file embeds each font once for all its pages.
+        """
+        texts = []
+        for run in self.runs:
+            font_object = fonts.get(run.font.path)
+            if font_object is None:
+                font_object = fonts[run.font.path] = writer.add_font(load_font(run.font.path))
+            texts.append((font_object, run.font.size, (run.position[0], run.baseline), run.glyphs(), run.fill))
+        return writer.add_page(self.size, [(background, (0, 0) + tuple(self.size))], texts)
+
+
+def encode_vector(certificate: VectorCertificate, profile: OutputProfile) -> EncodedCertificate:
+    """Write a vector certificate with the given (SVG or PDF) profile."""
+    if not profile.vector:
+        raise ValueError(f"Output profile {profile.name} cannot encode vector certificates")
+    start = time.perf_counter()
+    encoded = EncodedCertificate(profile)
+    if profile.format == "SVG":
+        certificate.write_svg(encoded, link_images=profile.options.get("link_images", False))
+    else:
+        certificate.write_pdf(encoded)
+    encoded.encode_seconds = time.perf_counter() - start
+    encoded.seek(0)
+    logger.debug(f"Certificado vetorial gerado ({profile.name}): {encoded.size} bytes em {encoded.encode_seconds:.3f}s")
+    return encoded
+
+
+def _number(value: float) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".")
@@ -7,7 +7,18 @@ class Config(BaseSettings):
     REGION: str
     BUCKET_NAME: str    
     QUEUE_URL: str
-
+    # HTTP connections kept by each boto3 client, also the size of the S3 upload thread pool
+    AWS_MAX_POOL_CONNECTIONS: int = 32
+    # S3 transfer settings used for certificate uploads
+    S3_MULTIPART_THRESHOLD: int = 8 * 1024 * 1024
+    S3_MULTIPART_CHUNKSIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 10
+    # SQS limit for a message body and for the total payload of a send_message_batch call
+    SQS_MAX_MESSAGE_BYTES: int = 256 * 1024
+    # Forked processes rendering and encoding certificates; 1 renders in the handler process
+    RENDER_WORKERS: int = 1
+    # HMAC key of the validation codes derived from the registration; changing it changes every code
+    VALIDATION_CODE_SECRET: str
 
     class Config:
         env_file = ".env"
@@ -1,14 +1,8 @@
 import logging
 import json
-from certified_builder.certified_builder import CertifiedBuilder
-from models.participant import Participant
-from models.certificate import Certificate
-from models.event import Event
 from datetime import datetime
 import base64
 import os
-from aws.s3_service import S3Service
-from aws.sqs_service import SQSService
 
 # Configure logging for CloudWatch
 logger = logging.getLogger()
@@ -26,6 +20,44 @@ handler.setFormatter(logging.Formatter(
 ))
 logger.addHandler(handler)
 
+# "lazy" imports boto3, Pillow, httpx and pydantic on the first event;
+# "eager" calls prewarm() while the container initializes
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "lazy")
+
+# Clients and builder kept at module level across warm invocations
+_warm_state = {}
+
+def _warm(name, factory):
+    instance = _warm_state.get(name)
+    if instance is None:
+        instance = _warm_state[name] = factory()
+    return instance
+
+def get_s3_service():
+    from aws.s3_service import S3Service
+    return _warm("s3_service", S3Service)
+
+def get_sqs_service():
+    from aws.sqs_service import SQSService
+    return _warm("sqs_service", SQSService)
+
+def get_builder():
+    from config import config
+    from certified_builder.certified_builder import CertifiedBuilder
+    return _warm("builder", lambda: CertifiedBuilder(workers=config.RENDER_WORKERS))
+
+def prewarm():
+    """Import dependencies and create clients, fonts and the HTTP client ahead of the first event."""
+    if _warm_state.get("prewarmed"):
+        return
+    from certified_builder.utils.fetch_file_certificate import image_fetcher
+    get_s3_service()
+    get_sqs_service()
+    get_builder().prewarm()
+    image_fetcher.prewarm()
+    _warm_state["prewarmed"] = True
+    logger.info("Container pré-aquecido")
+
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, datetime):
@@ -34,57 +66,134 @@ class DateTimeEncoder(json.JSONEncoder):
             return obj.model_dump()
         return super().default(obj)
 
-def extract_data_body(event):
-    try:        
-        logger.info("Event recebido : {}".format(event))
-        record = event['Records'][0]
-        if isinstance(record['body'], str):
-            body = json.loads(record['body'])
-            return body
-        else:
-            return record['body']
-    except Exception as e:
-        logger.error(f"Erro ao extrair dados do body: {str(e)}", exc_info=True)
-        raise
+def extract_record_body(record):
+    if isinstance(record['body'], str):
+        return json.loads(record['body'])
+    return record['body']
+
+def extract_records(event):
+    """Return (message_id, body, error) for every SQS record in the event."""
+    logger.info("Event recebido : {}".format(event))
+    records = []
+    for position, record in enumerate(event['Records']):
+        message_id = record.get('messageId', str(position))
+        try:
+            records.append((message_id, extract_record_body(record), None))
+        except Exception as e:
+            logger.error(f"Erro ao extrair dados do body da mensagem {message_id}: {str(e)}", exc_info=True)
+            records.append((message_id, None, e))
+    return records
+
+def batch_item_failures(message_ids):
+    # Only these messages are redelivered when ReportBatchItemFailures is enabled
+    return [{'itemIdentifier': message_id} for message_id in dict.fromkeys(message_ids)]
+
+def _participant_fields(participant_data):
+    """Map a flat SQS participant to the nested fields of Participant."""
+    fields = {
+        "first_name": participant_data.get('first_name'),
+        "last_name": participant_data.get('last_name'),
+        "email": participant_data.get('email'),
+        "phone": participant_data.get('phone'),
+        "cpf": participant_data.get('cpf', ''),
+        "participant_id": str(participant_data['participant_id']) if participant_data.get('participant_id') is not None else None,
+        "certificate": {
+            "details": participant_data.get('certificate_details'),
+            "logo": participant_data.get('certificate_logo'),
+            "background": participant_data.get('certificate_background'),
+            "output_profile": participant_data.get('certificate_output_profile'),
+        },
+        "event": {
+            "order_id": participant_data.get('order_id'),
+            "product_id": participant_data.get('product_id'),
+            "product_name": participant_data.get('product_name'),
+            # pydantic parses "%Y-%m-%d %H:%M:%S" natively, without strptime
+            "date": participant_data.get('order_date'),
+            "time_checkin": participant_data.get('time_checkin') or None,
+            "checkin_latitude": participant_data.get('checkin_latitude') or None,
+            "checkin_longitude": participant_data.get('checkin_longitude') or None,
+        },
+    }
+    if participant_data.get('validation_code'):
+        fields["validation_code"] = participant_data['validation_code']
+    return fields
+
+def _participants_adapter():
+    def build():
+        from typing import List
+        from pydantic import TypeAdapter
+        from models.participant import Participant
+        return TypeAdapter(List[Participant])
+    return _warm("participants_adapter", build)
+
+def create_participant_objects(participants_data):
+    """Validate every participant in one TypeAdapter pass.
+
+    Returns a (participant, error) pair per item, in order; an invalid item
+    gets its validation errors without failing the others.
+    """
+    from pydantic import ValidationError
+    from models.participant import DEFER_VALIDATION_CODE
+    from certified_builder.utils.idempotency import deterministic_validation_code
+
+    created = [None] * len(participants_data)
+    pending = []
+    for index, participant_data in enumerate(participants_data):
+        try:
+            pending.append((index, _participant_fields(participant_data)))
+        except Exception as e:
+            created[index] = (None, e)
+
+    adapter = _participants_adapter()
+    while pending:
+        try:
+            # Codes missing from the payload are derived below instead of drawn at random
+            participants = adapter.validate_python([fields for _, fields in pending], context={DEFER_VALIDATION_CODE: True})
+        except ValidationError as e:
+            # Errors are located by list position; drop those items and validate the rest again
+            errors = {}
+            for error in e.errors():
+                location = ".".join(str(part) for part in error["loc"][1:])
+                errors.setdefault(error["loc"][0], []).append(f"{location}: {error['msg']}")
+            for position, messages in errors.items():
+                created[pending[position][0]] = (None, ValueError("; ".join(messages)))
+            pending = [item for position, item in enumerate(pending) if position not in errors]
+            continue
+
+        for (index, fields), participant in zip(pending, participants):
+            if "validation_code" not in fields:
+                # Same code on every delivery of the message, so retries reuse the S3 key
+                participant.validation_code = deterministic_validation_code(participant)
+            created[index] = (participant, None)
+        break
+    return created
 
 def create_participant_object(participant_data):
-    # Create Certificate object
-    certificate = Certificate(
-        details=participant_data.get('certificate_details'),
-        logo=participant_data.get('certificate_logo'),
-        background=participant_data.get('certificate_background')
-    )
-    
-    # Create Event object
-    event = Event(
-        order_id=participant_data.get('order_id'),
-        product_id=participant_data.get('product_id'),
-        product_name=participant_data.get('product_name'),
-        date=datetime.strptime(participant_data.get('order_date'), "%Y-%m-%d %H:%M:%S"),
-        time_checkin=datetime.strptime(participant_data.get('time_checkin'), "%Y-%m-%d %H:%M:%S") if participant_data.get('time_checkin') else None,
-        checkin_latitude=float(participant_data.get('checkin_latitude')) if participant_data.get('checkin_latitude') else None,
-        checkin_longitude=float(participant_data.get('checkin_longitude')) if participant_data.get('checkin_longitude') else None
-    )
-    
-    # Create Participant object
-    participant = Participant(
-        first_name=participant_data.get('first_name'),
-        last_name=participant_data.get('last_name'),
-        email=participant_data.get('email'),
-        phone=participant_data.get('phone'),
-        cpf=participant_data.get('cpf', ''),
-        certificate=certificate,
-        event=event
-    )
+    """Validate a single participant, raising its validation errors; see create_participant_objects."""
+    participant, error = create_participant_objects([participant_data])[0]
+    if error is not None:
+        raise error
     return participant
 
 def lambda_handler(event, context):
+    from certified_builder.utils.metrics import metrics
+
     # Log the start of the Lambda execution
+    message_ids = []
+    metrics.reset()
     try:
 
         logger.info("Starting Lambda execution")    
-        body = extract_data_body(event)
-        participants_data = body
+        records = extract_records(event)
+        message_ids = [message_id for message_id, _, _ in records]
+        failed_messages = [message_id for message_id, _, error in records if error is not None]
+        
+        # Merge the participants of every record into one rendering pass
+        participants_data = [
+            (message_id, participant_data)
+            for message_id, body, error in records if error is None
+            for participant_data in (body or [])
+        ]
         
         if not participants_data:
             logger.warning("No participants found in message")
@@ -93,43 +202,46 @@ def lambda_handler(event, context):
                 'body': json.dumps({
                     'error': 'No participants found in message',
                     'message': 'Nenhum participante encontrado para processamento'
-                })
+                }),
+                'batchItemFailures': batch_item_failures(failed_messages)
             }
-        s3_service = S3Service()
-        sqs_service = SQSService()
+        s3_service = get_s3_service()
+        sqs_service = get_sqs_service()
 
-        logger.info(f"Processing {len(participants_data)} participants")
+        logger.info(f"Processing {len(participants_data)} participants from {len(records)} messages")
         
-        # Create list of participants
+        # Create list of participants and the message each one came from
         participants = []
+        participants_messages = []
         results = []
         
-        for participant_data in participants_data:
-            try:
-                participant = create_participant_object(participant_data)
+        created = create_participant_objects([participant_data for _, participant_data in participants_data])
+        for (message_id, participant_data), (participant, error) in zip(participants_data, created):
+            if error is None:
                 participants.append(participant)
-            except Exception as e:
-                logger.error(f"Error creating participant object: {str(e)}")
+                participants_messages.append(message_id)
+            else:
+                logger.error(f"Error creating participant object: {str(error)}")
                 results.append({
                     'participant_data': participant_data,
-                    'error': str(e),
+                    'error': str(error),
                     'success': False
                 })
         
         # Generate certificates if we have valid participants
         if participants:
-            builder = CertifiedBuilder()
-            certificates_results = builder.build_certificates(participants)
+            from certified_builder.pipeline import CertificatePipeline
+            builder = get_builder()
+            # Render, encode and upload as overlapping stages, skipping certificates already uploaded
+            pipeline = CertificatePipeline(builder, s3_service, upload_workers=s3_service.max_workers, skip_existing=True)
+            certificates_results = pipeline.run(participants)
             # Format results before adding to response
             certificates_results_messagens = []
             
-            for result in certificates_results:
-                
-                
-                if result.get('success'):
-                    s3_service.upload_file(result.get('certificate_path'), result.get('certificate_key'))
-                
-
+            for message_id, result in zip(participants_messages, certificates_results):
+                if not result.get('success'):
+                    # Retry the whole message so the missing certificate is generated again
+                    failed_messages.append(message_id)
                 certificates_results_messagens.append({                
                     "order_id": result.get('participant', {}).get('event', {}).get('order_id', ""),
                     "product_id": result.get('participant', {}).get('event', {}).get('product_id', ""),
@@ -139,15 +251,19 @@ def lambda_handler(event, context):
                     "success": result.get('success', False)
                 })
             
-            sqs_service.send_message(certificates_results_messagens)
+            sqs_service.send_results(certificates_results_messagens)
+            # One EMF line per batch with the time spent in each stage
+            metrics.emit()
             
-            logger.info("Certificados gerados com sucesso")
+            logger.info(f"Certificados gerados, {len(set(failed_messages))} de {len(records)} mensagens com falha")
             return {
                 'statusCode': 200,
                 'body': json.dumps({
                     'message': 'Processamento concluído',
-                    'results': results
-                }, cls=DateTimeEncoder)
+                    'results': results,
+                    'stats': builder.last_batch_stats
+                }, cls=DateTimeEncoder),
+                'batchItemFailures': batch_item_failures(failed_messages)
             }
         else:
             logger.warning("No valid participants to process")
@@ -157,15 +273,22 @@ def lambda_handler(event, context):
                     'error': 'No valid participants to process',
                     'message': 'Nenhum participante válido para processamento',
                     'results': results
-                }, cls=DateTimeEncoder)
+                }, cls=DateTimeEncoder),
+                'batchItemFailures': batch_item_failures(failed_messages)
             }
             
     except Exception as e:
         logger.error(f"Error in lambda handler: {str(e)}")
+        metrics.emit()
         return {
             'statusCode': 500,
             'body': json.dumps({
                 'error': str(e),
                 'message': 'Erro ao gerar certificados'
-            })
+            }),
+            # Nothing is known to be done, so every message is redelivered
+            'batchItemFailures': batch_item_failures(message_ids)
         }
+
+if STARTUP_MODE == "eager":
+    prewarm()
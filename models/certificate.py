@@ -1,7 +1,19 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
+from typing import Optional
 
 
 class Certificate(BaseModel):
     details: str
     logo: str
-    background: str
\ No newline at end of file
+    background: str
+    # Encoding profile for the event (png_fast, png_archival, webp_lossless, jpeg_hq, svg, svg_linked, pdf...)
+    output_profile: Optional[str] = None
+
+    @field_validator("output_profile")
+    @classmethod
+    def validate_output_profile(cls, value: Optional[str]) -> Optional[str]:
+        # Imported here so loading the models does not load Pillow
+        from certified_builder.utils.encoder import OUTPUT_PROFILES
+        if value is not None and value not in OUTPUT_PROFILES:
+            raise ValueError(f"Invalid output profile: {value}. Available: {', '.join(OUTPUT_PROFILES)}")
+        return value
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from pydantic import AfterValidator, BaseModel, PrivateAttr, ValidationInfo, model_validator
+from pydantic.networks import validate_email
+from functools import lru_cache
+from typing import Annotated, Optional
 from .certificate import Certificate
 from .event import Event
 import re
@@ -12,109 +14,167 @@ import string
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+# Substituições aplicadas antes de remover os demais caracteres especiais
+SPECIAL_CHARS = {
+    'º': 'o',
+    'ª': 'a', 
+    '×': 'x',
+    '@': '_at_',
+    '&': '_and_',
+    '+': '_plus_',
+    '=': '_equals_',
+    '%': '_percent_',
+    '#': '_hash_',
+    '?': '_question_',
+    '/': '_slash_',
+    '\\': '_backslash_',
+    ':': '_colon_',
+    ';': '_semicolon_',
+    '<': '_lt_',
+    '>': '_gt_',
+    '|': '_pipe_',
+    '*': '_star_',
+    '"': '_quote_',
+    "'": '_apostrophe_'
+}
+_SPECIAL_CHARS_TABLE = str.maketrans(SPECIAL_CHARS)
+_INVALID_CHARS = re.compile(r'[^\w\s\-_]')
+_WHITESPACE = re.compile(r'\s+')
+_UNDERSCORES = re.compile(r'_+')
+# Texts already safe as they are, such as formatted validation codes
+_SAFE_FILENAME = re.compile(r'[A-Za-z0-9\-]+')
+
+# Validation context flag of callers that set the validation code themselves right after validating
+DEFER_VALIDATION_CODE = "defer_validation_code"
+
+
+# Plain ASCII local part (dot-atom), the shape of nearly every address received
+_SIMPLE_LOCAL_PART = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
+
+@lru_cache(maxsize=1024)
+def _normalized_email_domain(domain: str) -> str:
+    return validate_email(f"a@{domain}")[1].rpartition("@")[2]
+
+
+def _validate_email(value: str) -> str:
+    """Validate like EmailStr, checking each domain once.
+
+    Domain validation (IDNA) is most of the cost of EmailStr and a batch has
+    a handful of distinct domains, so simple addresses only validate their
+    domain through a cache; anything else goes through validate_email.
+    """
+    local_part, at, domain = value.rpartition("@")
+    if at and len(value) <= 254 and len(local_part) <= 64 and _SIMPLE_LOCAL_PART.fullmatch(local_part):
+        return f"{local_part}@{_normalized_email_domain(domain)}"
+    return validate_email(value)[1]
+
+
+CachedEmailStr = Annotated[str, AfterValidator(_validate_email)]
+
+
+@lru_cache(maxsize=4096)
+def sanitize_filename(text: str) -> str:
+    """
+    Sanitiza uma string para ser usada como nome de arquivo no S3.
+    Remove ou substitui caracteres especiais que podem causar problemas em URLs.
+    
+    Args:
+        text (str): Texto a ser sanitizado
+        
+    Returns:
+        str: Texto sanitizado adequado para nomes de arquivo S3
+    """
+    if _SAFE_FILENAME.fullmatch(text):
+        return text
+
+    # Normaliza caracteres unicode (remove acentos)
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    
+    # Aplica as substituições de caracteres especiais
+    text = text.translate(_SPECIAL_CHARS_TABLE)
+    
+    # Remove caracteres que não são alfanuméricos, espaços, hífens ou underscores
+    text = _INVALID_CHARS.sub('', text)
+    
+    # Substitui espaços múltiplos por um único espaço
+    text = _WHITESPACE.sub(' ', text)
+    
+    # Substitui espaços por underscores
+    text = text.replace(' ', '_')
+    
+    # Remove underscores múltiplos consecutivos
+    text = _UNDERSCORES.sub('_', text)
+    
+    # Remove underscores do início e fim
+    return text.strip('_')
+
 class Participant(BaseModel): 
     first_name: str
     last_name: str
-    email: EmailStr
+    email: CachedEmailStr
     phone: str
     cpf: str    
-    validation_code: Optional[str] = Field(default_factory= lambda: ''.join(random.choices(string.hexdigits, k=9)), init=False)
+    # Registration id from the ticketing system, distinguishes registrations sharing an email
+    participant_id: Optional[str] = None
+    validation_code: Optional[str] = None
     certificate: Optional[Certificate] = None
     event: Optional[Event] = None
+    # Derived strings keyed by the fields they come from, so updates never serve stale values
+    _derived: dict = PrivateAttr(default_factory=dict)
+
+    @model_validator(mode="after")
+    def fill_validation_code(self, info: ValidationInfo):
+        # A random code only when none was given and the caller does not derive one
+        if self.validation_code is None and not (info.context or {}).get(DEFER_VALIDATION_CODE):
+            self.validation_code = ''.join(random.choices(string.hexdigits, k=9))
+        return self
 
     def __str__(self):
         return f"Participant: {self.first_name} {self.last_name} - {self.email}"   
 
     # criar metodo name_completed
     def name_completed(self):
-        self.first_name = self.first_name.lower()
-        self.last_name = self.last_name.lower()
-        
-        name_completed = self.first_name + " " + self.last_name
+        derived = self._derived
+        key = ("name", self.first_name, self.last_name)
+        name_completed = derived.get(key)
+        if name_completed is None:
+            name_completed = derived[key] = self._compose_name()
+        return name_completed
+
+    def _compose_name(self):
+        name_completed = self.first_name.lower() + " " + self.last_name.lower()
+        words = name_completed.split()
         if len(name_completed.split(" ")) > 3:
-            self.first_name = name_completed.split()[0]
-            self.last_name = name_completed.split()[1] + " " + name_completed.split()[-1]
-            name_completed = self.first_name + " " + self.last_name
-        
+            name_completed = words[0] + " " + words[1] + " " + words[-1]
         return name_completed.title()
     
     def _sanitize_filename(self, text: str) -> str:
         """
         Sanitiza uma string para ser usada como nome de arquivo no S3.
-        Remove ou substitui caracteres especiais que podem causar problemas em URLs.
-        
-        Args:
-            text (str): Texto a ser sanitizado
-            
-        Returns:
-            str: Texto sanitizado adequado para nomes de arquivo S3
+        Veja sanitize_filename.
         """
-        # Normaliza caracteres unicode (remove acentos)
-        text = unicodedata.normalize('NFD', text)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        
-        # Substitui caracteres especiais comuns por versões seguras
-        special_chars = {
-            'º': 'o',
-            'ª': 'a', 
-            '×': 'x',
-            '@': '_at_',
-            '&': '_and_',
-            '+': '_plus_',
-            '=': '_equals_',
-            '%': '_percent_',
-            '#': '_hash_',
-            '?': '_question_',
-            '/': '_slash_',
-            '\\': '_backslash_',
-            ':': '_colon_',
-            ';': '_semicolon_',
-            '<': '_lt_',
-            '>': '_gt_',
-            '|': '_pipe_',
-            '*': '_star_',
-            '"': '_quote_',
-            "'": '_apostrophe_'
-        }
-        
-        # Aplica as substituições de caracteres especiais
-        for char, replacement in special_chars.items():
-            text = text.replace(char, replacement)
-        
-        # Remove caracteres que não são alfanuméricos, espaços, hífens ou underscores
-        text = re.sub(r'[^\w\s\-_]', '', text)
-        
-        # Substitui espaços múltiplos por um único espaço
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Substitui espaços por underscores
-        text = text.replace(' ', '_')
-        
-        # Remove underscores múltiplos consecutivos
-        text = re.sub(r'_+', '_', text)
-        
-        # Remove underscores do início e fim
-        text = text.strip('_')
-        
-        return text
-                
+        return sanitize_filename(text)
 
     def formated_validation_code(self):
-        self.validation_code = self.validation_code.upper()
-        return f"{self.validation_code[0:3]}-{self.validation_code[3:6]}-{self.validation_code[6:9]}"
+        code = self.validation_code.upper()
+        return f"{code[0:3]}-{code[3:6]}-{code[6:9]}"
+
+    def create_name_certificate(self, extension: str = ".png"):        
+        derived = self._derived
+        key = ("certificate", self.first_name, self.last_name, self.event.product_name, self.validation_code, extension)
+        name_certificate = derived.get(key)
+        if name_certificate is not None:
+            return name_certificate
 
-    def create_name_certificate(self):        
         # Sanitiza o nome do participante e o nome do produto separadamente
-        sanitized_name = self._sanitize_filename(self.name_completed())
-        sanitized_product = self._sanitize_filename(self.event.product_name)
-        sanitized_validation = self._sanitize_filename(self.formated_validation_code())
+        sanitized_name = sanitize_filename(self.name_completed())
+        sanitized_product = sanitize_filename(self.event.product_name)
+        sanitized_validation = sanitize_filename(self.formated_validation_code())
         
         # Combina os componentes sanitizados
-        name_certificate = f"{sanitized_name}{sanitized_product}_{sanitized_validation}.png"
-        
-        logger.info(f"Nome do participante antes da sanitização: {self.name_completed()}")
-        logger.info(f"Nome do produto antes da sanitização: {self.event.product_name}")
-        logger.info(f"Código de validação antes da sanitização: {self.formated_validation_code()}")
-        logger.info(f"Nome do certificado após a sanitização: {name_certificate}")
-        
-        return name_certificate
\ No newline at end of file
+        name_certificate = f"{sanitized_name}{sanitized_product}_{sanitized_validation}{extension}"
+        logger.debug(f"Nome do certificado de {self.name_completed()} ({self.event.product_name}): {name_certificate}")
+        derived[key] = name_certificate
+        return name_certificate
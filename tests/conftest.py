@@ -0,0 +1,7 @@
+import os
+
+# Settings required by config.Config so the AWS services can be imported in tests
+os.environ.setdefault("REGION", "us-east-1")
+os.environ.setdefault("BUCKET_NAME", "test-bucket")
+os.environ.setdefault("QUEUE_URL", "https://sqs.us-east-1.amazonaws.com/000000000000/test-queue")
+os.environ.setdefault("VALIDATION_CODE_SECRET", "test-secret")
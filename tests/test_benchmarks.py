@@ -0,0 +1,28 @@
+from benchmarks.fixtures import make_background, synthetic_participants
+from benchmarks.run import compare, percentile, run_scenario
+
+def test_fixtures_are_deterministic():
+    assert make_background((320, 180)).tobytes() == make_background((320, 180)).tobytes()
+    first, second = synthetic_participants(5, "1080p"), synthetic_participants(5, "1080p")
+    assert [participant.model_dump(exclude={"validation_code"}) for participant in first] == [participant.model_dump(exclude={"validation_code"}) for participant in second]
+
+def test_percentile_uses_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 99) == 3.0
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"builder/1080p": {"certificates_per_second": 10.0, "p99_ms": 100.0}}}
+    slower = {"results": {"builder/1080p": {"certificates_per_second": 8.0, "p99_ms": 105.0}, "builder/a4_300dpi": {"certificates_per_second": 1.0, "p99_ms": 1.0}}}
+
+    rows = compare(slower, baseline, tolerance=0.1)
+
+    assert rows == [{"scenario": "builder/1080p", "throughput_change": -0.2, "p99_change": 0.05, "regression": True}]
+
+def test_builder_scenario_runs_offline():
+    result = run_scenario("builder", "1080p", 2, output_profile="png_fast")
+
+    assert result["count"] == 2
+    assert result["certificates_per_second"] > 0
+    assert result["p50_ms"] <= result["p99_ms"]
@@ -1,7 +1,9 @@
+import os
 import pytest
 from unittest.mock import Mock, patch
 from PIL import Image
 from certified_builder.certified_builder import CertifiedBuilder
+from certified_builder.parallel import fork_available
 from models.participant import Participant
 from models.certificate import Certificate
 from models.event import Event
@@ -89,3 +91,270 @@ def test_build_certificates(certified_builder, mock_participant, mock_certificat
         assert isinstance(args[0], Image.Image)
         assert args[1] == mock_participant
         
+
+def _textured_image(size):
+    """Opaque-ish RGBA image with gradients, noise and semi-transparent pixels."""
+    red = Image.linear_gradient("L").resize(size)
+    green = Image.effect_noise(size, 64)
+    blue = Image.radial_gradient("L").resize(size)
+    alpha = Image.linear_gradient("L").rotate(90).resize(size).point(lambda value: 128 + value // 2)
+    return Image.merge("RGBA", (red, green, blue, alpha))
+
+@pytest.mark.parametrize("size", [(1920, 1080), (400, 300)])
+def test_canvas_render_matches_legacy(mock_participant, size):
+    template = _textured_image(size)
+    logo = _textured_image((300, 200))
+    legacy = CertifiedBuilder(render_mode="legacy").generate_certificate(mock_participant, template, logo)
+    canvas = CertifiedBuilder(render_mode="canvas").generate_certificate(mock_participant, template, logo)
+
+    assert canvas.mode == legacy.mode == "RGBA"
+    assert canvas.size == legacy.size
+    assert canvas.tobytes() == legacy.tobytes()
+
+def test_canvas_render_matches_legacy_with_long_texts(mock_participant):
+    long_certificate = mock_participant.certificate.model_copy(update={"details": " ".join([mock_participant.certificate.details] * 3)})
+    participant = mock_participant.model_copy(update={"first_name": "Maria Aparecida Conceição", "last_name": "Albuquerque Figueiredo Nascimento", "certificate": long_certificate})
+    template = _textured_image((800, 600))
+    logo = _textured_image((300, 200))
+    legacy = CertifiedBuilder(render_mode="legacy").generate_certificate(participant, template, logo)
+    canvas = CertifiedBuilder(render_mode="canvas").generate_certificate(participant, template, logo)
+
+    assert canvas.tobytes() == legacy.tobytes()
+
+def test_glyph_atlas_render_matches_freetype(mock_participant):
+    template = _textured_image((1920, 1080))
+    logo = _textured_image((300, 200))
+    freetype = CertifiedBuilder(use_glyph_atlas=False).generate_certificate(mock_participant, template, logo)
+    atlas = CertifiedBuilder(use_glyph_atlas=True).generate_certificate(mock_participant, template, logo)
+
+    assert atlas.tobytes() == freetype.tobytes()
+
+@pytest.mark.parametrize("size", [(1920, 1080), (400, 300), (800, 600)])
+def test_numpy_compositing_matches_pillow(mock_participant, size):
+    pytest.importorskip("numpy")
+    template = _textured_image(size)
+    logo = _textured_image((300, 200))
+    pillow = CertifiedBuilder(compositing="pillow").generate_certificate(mock_participant, template, logo)
+    numpy_render = CertifiedBuilder(compositing="numpy").generate_certificate(mock_participant, template, logo)
+
+    assert numpy_render.mode == "RGB"
+    assert numpy_render.tobytes() == pillow.convert("RGB").tobytes()
+
+def test_invalid_compositing_backend():
+    with pytest.raises(ValueError):
+        CertifiedBuilder(compositing="unknown")
+
+def test_canvas_tiles_cover_only_the_text(mock_participant):
+    builder = CertifiedBuilder()
+    layers = builder._text_layers(mock_participant, (1920, 1080))
+    tiles = builder._merge_tiles([box for box, _ in layers])
+
+    assert all(right - left < 1920 for left, _, right, _ in tiles)
+    assert sum((right - left) * (bottom - top) for left, top, right, bottom in tiles) < 1920 * 1080 // 10
+
+def test_merge_tiles_joins_overlapping_boxes():
+    builder = CertifiedBuilder()
+
+    tiles = builder._merge_tiles([(0, 0, 10, 10), (50, 0, 60, 10), (5, 5, 55, 8), (100, 100, 110, 110)])
+
+    assert sorted(tiles) == [(0, 0, 60, 10), (100, 100, 110, 110)]
+
+def test_canvas_render_does_not_modify_template(certified_builder, mock_participant):
+    template = _textured_image((800, 600))
+    original = template.tobytes()
+    certified_builder.generate_certificate(mock_participant, template, _textured_image((150, 150)))
+
+    assert template.tobytes() == original
+
+def test_invalid_render_mode():
+    with pytest.raises(ValueError):
+        CertifiedBuilder(render_mode="unknown")
+
+def test_prepared_template_composites_logo_once(mock_participant):
+    template = _textured_image((1920, 1080))
+    logo = _textured_image((300, 200))
+    builder = CertifiedBuilder()
+    prepared = builder.prepare_template(template, logo, ("background.png", "logo.png"))
+
+    assert prepared.key == ("background.png", "logo.png")
+    assert prepared.logo.size == (150, 150)
+    assert prepared.source_background is None
+    expected = CertifiedBuilder(render_mode="legacy").generate_certificate(mock_participant, template, logo)
+    assert builder.render_certificate(mock_participant, prepared).tobytes() == expected.tobytes()
+    # The prepared image is reused untouched by the next certificate
+    assert builder.render_certificate(mock_participant, prepared).tobytes() == expected.tobytes()
+
+def test_build_certificates_prepares_each_template_once(certified_builder, mock_participant, mock_certificate_template, mock_logo):
+    participants = [mock_participant, mock_participant.model_copy()]
+
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images), \
+         patch.object(certified_builder, 'prepare_template', wraps=certified_builder.prepare_template) as mock_prepare, \
+         patch.object(certified_builder, 'save_certificate', return_value="/tmp/certificates/test.png"):
+        results = certified_builder.build_certificates(participants)
+
+    assert mock_prepare.call_count == 1
+    assert all(result["success"] for result in results)
+
+def test_prepared_template_is_reused_by_warm_batches(certified_builder, mock_participant, mock_certificate_template, mock_logo):
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', side_effect=lambda urls: dict(images)), \
+         patch.object(certified_builder, 'prepare_template', wraps=certified_builder.prepare_template) as mock_prepare, \
+         patch.object(certified_builder, 'save_certificate', return_value="/tmp/certificates/test.png"):
+        certified_builder.build_certificates([mock_participant])
+        certified_builder.build_certificates([mock_participant])
+        # A changed background (new object from the image cache) is prepared again
+        images[mock_participant.certificate.background] = mock_certificate_template.copy()
+        certified_builder.build_certificates([mock_participant])
+
+    assert mock_prepare.call_count == 2
+
+def test_build_certificates_fetches_each_distinct_url_once(certified_builder, mock_participant, mock_certificate_template, mock_logo):
+    other_background = mock_participant.certificate.model_copy(update={"background": "https://example.com/other.png"})
+    participants = [
+        mock_participant,
+        mock_participant.model_copy(update={"certificate": other_background, "first_name": "Maria"}),
+        mock_participant.model_copy(update={"first_name": "Ana"}),
+    ]
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+        "https://example.com/other.png": mock_certificate_template,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', side_effect=lambda urls: {url: images[url] for url in urls}) as mock_fetch, \
+         patch.object(certified_builder, 'save_certificate', return_value="/tmp/certificates/test.png"):
+        results = certified_builder.build_certificates(participants)
+
+    mock_fetch.assert_called_once()
+    assert sorted(set(mock_fetch.call_args[0][0])) == sorted(images)
+    assert [result["participant"]["first_name"].lower() for result in results] == ["jardel", "maria", "ana"]
+    assert all(result["success"] for result in results)
+
+def test_build_certificates_download_error_only_fails_its_group(certified_builder, mock_participant, mock_certificate_template, mock_logo):
+    broken = mock_participant.certificate.model_copy(update={"background": "https://example.com/missing.png"})
+    participants = [mock_participant.model_copy(update={"certificate": broken}), mock_participant]
+
+    images = {
+        "https://example.com/missing.png": Exception("404"),
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images), \
+         patch.object(certified_builder, 'save_certificate', return_value="/tmp/certificates/test.png"):
+        results = certified_builder.build_certificates(participants)
+
+    assert results[0]["success"] is False
+    assert "404" in results[0]["error"]
+    assert results[1]["success"] is True
+
+@pytest.mark.skipif(not fork_available(), reason="fork start method not available")
+def test_build_certificates_in_worker_processes(tmp_path, mock_participant, mock_certificate_template, mock_logo):
+    participants = [mock_participant.model_copy(update={"first_name": f"Pessoa{index}"}) for index in range(7)]
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+    sequential = CertifiedBuilder()
+    parallel = CertifiedBuilder(workers=3, chunk_size=2)
+    sequential.temp_dir = str(tmp_path.joinpath("sequential"))
+    parallel.temp_dir = str(tmp_path.joinpath("parallel"))
+    os.makedirs(sequential.temp_dir)
+    os.makedirs(parallel.temp_dir)
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images):
+        expected = sequential.build_certificates(participants)
+        results = parallel.build_certificates(participants)
+
+    assert [result["participant"]["first_name"] for result in results] == [result["participant"]["first_name"] for result in expected]
+    assert all(result["success"] for result in results)
+    for result, reference in zip(results, expected):
+        assert result["certificate_path"].startswith(parallel.temp_dir)
+        assert Image.open(result["certificate_path"]).tobytes() == Image.open(reference["certificate_path"]).tobytes()
+
+def test_build_certificates_iter_yields_before_the_batch_ends(certified_builder, mock_participant, mock_certificate_template, mock_logo, tmp_path):
+    certified_builder.temp_dir = str(tmp_path)
+    participants = [mock_participant.model_copy(update={"first_name": f"Pessoa{index}"}) for index in range(3)]
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+    render = certified_builder.render_certificate
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images), \
+         patch.object(certified_builder, "render_certificate", side_effect=render) as rendered:
+        results = certified_builder.build_certificates_iter(participants)
+        index, first = next(results)
+        assert rendered.call_count == 1
+        rest = list(results)
+
+    assert index == 0 and first["success"]
+    assert sorted(index for index, _ in rest) == [1, 2]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_build_certificates_iter_in_memory(mock_participant, mock_certificate_template, mock_logo, tmp_path, workers):
+    builder = CertifiedBuilder(workers=workers, chunk_size=1)
+    builder.temp_dir = str(tmp_path)
+    participants = [mock_participant.model_copy(update={"first_name": f"Pessoa{index}"}) for index in range(3)]
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images):
+        results = dict(builder.build_certificates_iter(participants, in_memory=True))
+
+    assert sorted(results) == [0, 1, 2]
+    assert os.listdir(tmp_path) == []
+    for index, result in results.items():
+        assert result["certificate_path"] is None
+        assert result["participant"]["first_name"] == f"Pessoa{index}"
+        assert result["certificate_bytes"] == result["certificate"].size
+        assert Image.open(result["certificate"]).size == mock_certificate_template.size
+
+def test_output_profile_selected_per_event(certified_builder, mock_participant, mock_certificate_template, mock_logo, tmp_path):
+    certified_builder.temp_dir = str(tmp_path)
+    webp_certificate = mock_participant.certificate.model_copy(update={"output_profile": "webp_lossless"})
+    participants = [mock_participant, mock_participant.model_copy(update={"certificate": webp_certificate})]
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images):
+        results = certified_builder.build_certificates(participants)
+
+    assert [result["output_profile"] for result in results] == ["png_archival", "webp_lossless"]
+    assert results[0]["certificate_key"].endswith(".png")
+    assert results[1]["certificate_key"].endswith(".webp")
+    assert Image.open(results[1]["certificate_path"]).format == "WEBP"
+    assert all(result["certificate_bytes"] > 0 for result in results)
+
+@pytest.mark.parametrize("profile, header", [("svg", b"<?xml"), ("pdf", b"%PDF-1.4")])
+def test_vector_output_profile_skips_the_raster(mock_participant, mock_certificate_template, mock_logo, tmp_path, profile, header):
+    builder = CertifiedBuilder()
+    builder.temp_dir = str(tmp_path)
+    participant = mock_participant.model_copy(update={"certificate": mock_participant.certificate.model_copy(update={"output_profile": profile})})
+    images = {
+        mock_participant.certificate.background: mock_certificate_template,
+        mock_participant.certificate.logo: mock_logo,
+    }
+
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images), \
+         patch.object(builder, "_render_on_canvas") as render_on_canvas:
+        (_, result), = builder.build_certificates_iter([participant], in_memory=True)
+
+    render_on_canvas.assert_not_called()
+    assert result["success"] and result["output_profile"] == profile
+    assert result["certificate_key"].endswith(f".{profile}")
+    assert result["certificate"].profile.content_type in ("image/svg+xml", "application/pdf")
+    assert result["certificate"].getvalue().startswith(header)
@@ -0,0 +1,40 @@
+import pytest
+from PIL import Image
+from certified_builder.prepared_template import ensure_valid_rgba
+
+np = pytest.importorskip("numpy")
+from certified_builder.utils.compositing import composite_rgb
+
+def _random_rgba(rng, size, alpha=None):
+    array = rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8)
+    if alpha is not None:
+        array[..., 3] = alpha
+    return array
+
+@pytest.mark.parametrize("destination_alpha", [None, 0, 255])
+def test_composite_rgb_matches_pillow(destination_alpha):
+    rng = np.random.default_rng(0)
+    destination = _random_rgba(rng, (320, 240), destination_alpha)
+    source = _random_rgba(rng, (320, 240))
+    source[::3, ::2, 3] = 0
+
+    expected = Image.alpha_composite(Image.fromarray(destination, "RGBA"), Image.fromarray(source, "RGBA")).convert("RGB")
+
+    assert composite_rgb(destination, source).tobytes() == expected.tobytes()
+
+def test_composite_rgb_keeps_destination_under_transparent_source():
+    rng = np.random.default_rng(1)
+    destination = _random_rgba(rng, (64, 32))
+    source = _random_rgba(rng, (64, 32), 0)
+
+    assert np.array_equal(composite_rgb(destination, source), destination[..., :3])
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_opaque_images_are_normalized_to_a_copy(mode):
+    image = Image.effect_noise((50, 40), 64).convert(mode)
+
+    normalized = ensure_valid_rgba(image)
+
+    assert normalized is not image
+    assert normalized.mode == "RGBA"
+    assert normalized.tobytes() == image.convert("RGBA").tobytes()
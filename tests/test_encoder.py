@@ -0,0 +1,35 @@
+import pytest
+from PIL import Image
+from certified_builder.utils.encoder import OUTPUT_PROFILES, encode_image, get_output_profile
+
+@pytest.fixture
+def certificate():
+    return Image.linear_gradient("L").resize((320, 200)).convert("RGBA")
+
+@pytest.mark.parametrize("name", sorted(name for name, profile in OUTPUT_PROFILES.items() if not profile.vector))
+def test_encode_image_with_every_profile(certificate, name):
+    profile = get_output_profile(name)
+    encoded = encode_image(certificate, profile)
+    decoded = Image.open(encoded)
+
+    assert decoded.format == profile.format
+    assert decoded.size == certificate.size
+    stats = encoded.stats()
+    assert stats["output_profile"] == name
+    assert stats["certificate_bytes"] == len(encoded.getvalue())
+    assert stats["encode_seconds"] >= 0
+
+@pytest.mark.parametrize("name", ["png_fast", "png_archival", "webp_lossless"])
+def test_lossless_profiles_keep_pixels(certificate, name):
+    encoded = encode_image(certificate, get_output_profile(name))
+
+    assert Image.open(encoded).convert("RGB").tobytes() == certificate.convert("RGB").tobytes()
+
+@pytest.mark.parametrize("name", ["svg", "svg_linked", "pdf"])
+def test_vector_profiles_do_not_encode_images(certificate, name):
+    with pytest.raises(ValueError):
+        encode_image(certificate, get_output_profile(name))
+
+def test_invalid_output_profile():
+    with pytest.raises(ValueError):
+        get_output_profile("gif")
@@ -0,0 +1,73 @@
+import httpx
+import pytest
+from io import BytesIO
+from PIL import Image
+from certified_builder.utils.fetch_file_certificate import ImageFetcher
+from certified_builder.utils.image_cache import ImageCache
+
+def _png_bytes(size=(40, 20)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 10, 10)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def make_fetcher(tmp_path):
+    fetchers = []
+
+    def make(handler, **kwargs):
+        kwargs.setdefault("backoff", 0)
+        fetcher = ImageFetcher(cache=ImageCache(cache_dir=str(tmp_path)), transport=httpx.MockTransport(handler), **kwargs)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield make
+    for fetcher in fetchers:
+        fetcher.close()
+
+def test_fetch_many_downloads_each_url_once(make_fetcher):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=_png_bytes())
+
+    fetcher = make_fetcher(handler)
+    urls = ["https://cdn.example.com/a.png", "https://cdn.example.com/b.png", "https://cdn.example.com/a.png"]
+    images = fetcher.fetch_many(urls)
+
+    assert sorted(requested) == ["https://cdn.example.com/a.png", "https://cdn.example.com/b.png"]
+    assert all(image.size == (40, 20) for image in images.values())
+    # A second batch in the same warm container is served from the cache
+    fetcher.fetch_many(urls)
+    assert len(requested) == 2
+
+def test_fetch_retries_transient_errors(make_fetcher):
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, content=_png_bytes())
+
+    image = make_fetcher(handler, retries=3).fetch("https://cdn.example.com/a.png")
+
+    assert image.size == (40, 20)
+    assert len(attempts) == 3
+
+def test_fetch_many_reports_errors_per_url(make_fetcher):
+    def handler(request):
+        if request.url.path == "/missing.png":
+            return httpx.Response(404)
+        return httpx.Response(200, content=_png_bytes())
+
+    images = make_fetcher(handler).fetch_many(["https://cdn.example.com/missing.png", "https://cdn.example.com/a.png"])
+
+    assert isinstance(images["https://cdn.example.com/missing.png"], httpx.HTTPStatusError)
+    assert isinstance(images["https://cdn.example.com/a.png"], Image.Image)
+
+def test_fetch_aborts_oversized_downloads(make_fetcher):
+    fetcher = make_fetcher(lambda request: httpx.Response(200, content=_png_bytes()), max_bytes=10)
+
+    with pytest.raises(ValueError):
+        fetcher.fetch("https://cdn.example.com/a.png")
@@ -0,0 +1,56 @@
+import pytest
+from PIL import Image, ImageDraw
+from certified_builder.certified_builder import FONT_NAME, DETAILS_FONT, CertifiedBuilder
+from certified_builder.utils.font_registry import FontRegistry, font_registry
+
+@pytest.fixture
+def registry():
+    return FontRegistry()
+
+def test_get_font_loads_each_pair_once(registry):
+    first = registry.get_font(FONT_NAME, 70)
+    second = registry.get_font(FONT_NAME, 70)
+    other_size = registry.get_font(FONT_NAME, 30)
+
+    assert first is second
+    assert other_size is not first
+    stats = registry.stats()
+    assert stats["fonts_loaded"] == 2
+    assert stats["font_hits"] == 1
+    assert stats["font_misses"] == 2
+
+def test_textbbox_matches_image_draw(registry):
+    font = registry.get_font(DETAILS_FONT, 18)
+    draw = ImageDraw.Draw(Image.new("RGBA", (10, 10)))
+    expected = draw.textbbox((0, 0), "Python Floripa", font=font)
+
+    assert registry.textbbox("Python Floripa", font) == expected
+    assert registry.textbbox("Python Floripa", font) == expected
+    assert registry.stats()["metrics_hits"] == 1
+    assert registry.stats()["metrics_misses"] == 1
+
+def test_textbbox_cache_is_bounded(registry):
+    registry.metrics_cache_size = 2
+    font = registry.get_font(DETAILS_FONT, 18)
+    for text in ("a", "b", "c"):
+        registry.textbbox(text, font)
+
+    registry.textbbox("a", font)
+    assert registry.stats()["metrics_misses"] == 4
+
+def test_textbbox_without_metrics_cache(registry):
+    registry.metrics_cache_size = 0
+    font = registry.get_font(DETAILS_FONT, 18)
+    registry.textbbox("a", font)
+    registry.textbbox("a", font)
+
+    assert registry.stats()["metrics_hits"] == 0
+    assert registry.stats()["metrics_misses"] == 0
+
+def test_builder_reuses_fonts_across_certificates():
+    builder = CertifiedBuilder()
+    builder.create_name_image("Jardel Godinho", (800, 600))
+    misses = font_registry.stats()["font_misses"]
+    builder.create_name_image("Maria Silva", (800, 600))
+
+    assert font_registry.stats()["font_misses"] == misses
@@ -0,0 +1,64 @@
+import pytest
+from PIL import Image, ImageDraw
+from certified_builder.certified_builder import FONT_NAME, VALIDATION_CODE
+from certified_builder.utils.font_registry import FontRegistry
+from certified_builder.utils.glyph_atlas import GlyphAtlas
+
+TEXT_COLOR = (0, 0, 0, 255)
+
+def _draw_both(atlas, font, xy, text, size=(900, 120)):
+    expected = Image.new("RGBA", size, (255, 255, 255, 0))
+    ImageDraw.Draw(expected).text(xy, text, fill=TEXT_COLOR, font=font)
+    actual = Image.new("RGBA", size, (255, 255, 255, 0))
+    atlas.draw_text(actual, xy, text, font, TEXT_COLOR)
+    return expected, actual
+
+@pytest.mark.parametrize("text", ["Jardel Godinho", "Maria Conceição Albuquerque", "AVATAR Wolf", "Jo'ão D. Ávila-Souza"])
+@pytest.mark.parametrize("xy", [(40, 10), (40.5, 10), (123.25, 7.75)])
+def test_names_match_freetype(text, xy):
+    atlas = GlyphAtlas()
+    font = FontRegistry().get_font(FONT_NAME, 70)
+
+    expected, actual = _draw_both(atlas, font, xy, text)
+
+    assert expected.getbbox() is not None
+    assert actual.tobytes() == expected.tobytes()
+
+@pytest.mark.parametrize("code", ["8A3-F91-C0D", "000-000-000", "FFF-BEE-123"])
+def test_validation_codes_match_freetype(code):
+    atlas = GlyphAtlas()
+    font = FontRegistry().get_font(VALIDATION_CODE, 20)
+
+    expected, actual = _draw_both(atlas, font, (812.5, 40), code)
+
+    assert actual.tobytes() == expected.tobytes()
+
+def test_glyphs_are_rasterized_once():
+    atlas = GlyphAtlas()
+    font = FontRegistry().get_font(VALIDATION_CODE, 20)
+
+    _draw_both(atlas, font, (10, 10), "ABC-ABC-ABC")
+    misses = atlas.stats()["glyph_misses"]
+    _draw_both(atlas, font, (10, 10), "CBA-CBA-CBA")
+
+    assert misses == 4
+    assert atlas.stats()["glyph_misses"] == 4
+    assert atlas.stats()["glyph_hits"] == 7 + 11
+
+def test_unsupported_text_falls_back_to_freetype():
+    atlas = GlyphAtlas()
+    font = FontRegistry().get_font(FONT_NAME, 70)
+
+    expected, actual = _draw_both(atlas, font, (-3.5, 10), "Jardel\nGodinho", size=(900, 250))
+
+    assert actual.tobytes() == expected.tobytes()
+    assert atlas.stats()["fallbacks"] == 1
+    assert atlas.stats()["glyphs_cached"] == 0
+
+def test_cache_is_bounded():
+    atlas = GlyphAtlas(max_glyphs=5)
+    font = FontRegistry().get_font(VALIDATION_CODE, 20)
+
+    _draw_both(atlas, font, (10, 10), "0123456789")
+
+    assert atlas.stats()["glyphs_cached"] == 5
@@ -0,0 +1,53 @@
+import hashlib
+import hmac
+from datetime import datetime
+from models.participant import Participant
+from models.certificate import Certificate
+from models.event import Event
+from certified_builder.utils.idempotency import deterministic_validation_code, idempotency_key
+
+def _participant(email="jardel@example.com", details="Participou do evento de teste", order_id=452, first_name="Jardel", participant_id=None):
+    certificate = Certificate(details=details, logo="https://example.com/logo.png", background="https://example.com/background.png")
+    event = Event(order_id=order_id, product_id=316, product_name="Evento de Teste", date=datetime(2025, 3, 26, 20, 55, 25))
+    return Participant(first_name=first_name, last_name="Godinho", email=email, phone="", cpf="", participant_id=participant_id, certificate=certificate, event=event)
+
+def test_validation_code_is_stable_across_deliveries():
+    first, redelivered = _participant(), _participant()
+
+    assert first.validation_code != redelivered.validation_code
+    assert deterministic_validation_code(first) == deterministic_validation_code(redelivered)
+    assert len(deterministic_validation_code(first)) == 9
+
+def test_email_case_does_not_change_the_key():
+    assert idempotency_key(_participant("Jardel@Example.com")) == idempotency_key(_participant())
+
+def test_validation_code_changes_with_participant_or_template():
+    codes = {
+        deterministic_validation_code(_participant()),
+        deterministic_validation_code(_participant(email="maria@example.com")),
+        deterministic_validation_code(_participant(order_id=453)),
+        deterministic_validation_code(_participant(details="Outro texto")),
+    }
+    assert len(codes) == 4
+
+def test_registrations_sharing_an_email_get_their_own_code():
+    # Two people registered in the same order under one email
+    codes = {
+        deterministic_validation_code(_participant(first_name="Ana", participant_id="1001")),
+        deterministic_validation_code(_participant(first_name="Ana", participant_id="1002")),
+        deterministic_validation_code(_participant(first_name="Bia")),
+        deterministic_validation_code(_participant(first_name="Caio")),
+    }
+    assert len(codes) == 4
+
+def test_name_spacing_and_case_do_not_change_the_key():
+    assert idempotency_key(_participant(first_name="  JARDEL ")) == idempotency_key(_participant())
+
+def test_validation_code_is_signed_with_the_secret():
+    participant = _participant()
+    expected = hmac.new(b"test-secret", idempotency_key(participant).encode("utf-8"), hashlib.sha256).hexdigest()[:9]
+
+    assert deterministic_validation_code(participant) == expected
+    assert deterministic_validation_code(participant, secret="outra-chave") != expected
+    # Without the secret the code cannot be derived from the registration data
+    assert hashlib.sha256(idempotency_key(participant).encode("utf-8")).hexdigest()[:9] != expected
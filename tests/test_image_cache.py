@@ -0,0 +1,115 @@
+import hashlib
+import os
+import pytest
+from io import BytesIO
+from PIL import Image
+from certified_builder.utils.image_cache import CachedResponse, ImageCache
+
+URL = "https://example.com/background.png"
+
+def _png_bytes(size=(64, 32), color=(10, 20, 30, 255)):
+    buffer = BytesIO()
+    Image.new("RGBA", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class FakeServer:
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def __call__(self, url, headers):
+        self.calls.append(headers)
+        if headers.get("If-None-Match") == "v1":
+            return CachedResponse(304)
+        return CachedResponse(200, self.content, {"etag": "v1", "last-modified": "Mon, 06 Oct 2025 10:00:00 GMT"})
+
+@pytest.fixture
+def server():
+    return FakeServer(_png_bytes())
+
+def test_memory_hit_skips_network(tmp_path, server):
+    cache = ImageCache(cache_dir=str(tmp_path))
+    first = cache.get(URL, server)
+    second = cache.get(URL, server)
+
+    assert first is second
+    assert first.size == (64, 32)
+    assert len(server.calls) == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["bytes_saved"] == len(server.content)
+
+def test_disk_tier_survives_new_process(tmp_path, server):
+    ImageCache(cache_dir=str(tmp_path)).get(URL, server)
+    warm = ImageCache(cache_dir=str(tmp_path))
+    image = warm.get(URL, server)
+
+    assert image.size == (64, 32)
+    assert len(server.calls) == 1
+    assert warm.stats()["disk_hits"] == 1
+
+def test_stale_entry_is_revalidated_with_etag(tmp_path, server):
+    cache = ImageCache(cache_dir=str(tmp_path), ttl=0)
+    cache.get(URL, server)
+    image = cache.get(URL, server)
+
+    assert image.size == (64, 32)
+    assert server.calls[1] == {"If-None-Match": "v1", "If-Modified-Since": "Mon, 06 Oct 2025 10:00:00 GMT"}
+    assert cache.stats()["revalidated"] == 1
+    assert cache.stats()["bytes_downloaded"] == len(server.content)
+
+def test_memory_budget_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(cache_dir=None, max_memory_bytes=64 * 32 * 4 * 2)
+    for index in range(3):
+        cache.get(f"{URL}?{index}", FakeServer(_png_bytes(color=(index, 0, 0, 255))))
+
+    assert cache.stats()["memory_bytes"] == 64 * 32 * 4 * 2
+    server = FakeServer(_png_bytes(color=(0, 0, 0, 255)))
+    cache.get(f"{URL}?0", server)
+    assert len(server.calls) == 1
+
+def test_directories_are_created_on_first_use(tmp_path, server):
+    cache_dir = tmp_path / "images"
+    cache = ImageCache(cache_dir=str(cache_dir))
+    assert not cache_dir.exists()
+
+    cache.get(URL, server)
+    assert len(list((cache_dir / "blobs").iterdir())) == 1
+
+def test_disk_budget_evicts_least_recently_used(tmp_path):
+    contents = [_png_bytes(color=(index, 0, 0, 255)) for index in range(3)]
+    cache = ImageCache(cache_dir=str(tmp_path), max_memory_bytes=0, max_disk_bytes=len(contents[0]) * 2)
+    cache.get(f"{URL}?0", FakeServer(contents[0]))
+    cache.get(f"{URL}?1", FakeServer(contents[1]))
+    # Used again, so ?1 is the least recently used when ?2 arrives
+    cache.get(f"{URL}?0", FakeServer(contents[0]))
+    cache.get(f"{URL}?2", FakeServer(contents[2]))
+
+    stats = cache.stats()
+    assert stats["disk_evictions"] == 1
+    assert stats["disk_bytes"] <= len(contents[0]) * 2
+    assert len(list((tmp_path / "blobs").iterdir())) == 2
+    assert len(list((tmp_path / "index").iterdir())) == 2
+    server = FakeServer(contents[1])
+    cache.get(f"{URL}?1", server)
+    # The evicted entry is downloaded again, without a conditional request
+    assert server.calls == [{}]
+
+def test_new_process_honours_the_disk_budget(tmp_path):
+    contents = [_png_bytes(color=(index, 0, 0, 255)) for index in range(3)]
+    cache = ImageCache(cache_dir=str(tmp_path))
+    for index, content in enumerate(contents):
+        cache.get(f"{URL}?{index}", FakeServer(content))
+        # Blobs are ordered by modification time, oldest first
+        os.utime(tmp_path / "blobs" / hashlib.sha256(content).hexdigest(), (1000 + index, 1000 + index))
+
+    warm = ImageCache(cache_dir=str(tmp_path), max_disk_bytes=len(contents[0]))
+    server = FakeServer(contents[2])
+    warm.get(f"{URL}?2", server)
+
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+    assert len(list((tmp_path / "index").iterdir())) == 1
+    assert warm.stats()["disk_evictions"] == 2
+    assert server.calls == []
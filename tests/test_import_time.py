@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dependencies the handler must not load before the first event
+HEAVY_MODULES = ("boto3", "botocore", "httpx", "PIL", "pydantic", "pydantic_settings")
+# Cumulative import time allowed for lambda_function (about 15 ms measured, headroom for slow CI runners)
+IMPORT_BUDGET_MS = 100
+
+def import_times(module: str) -> dict:
+    """Return {module: cumulative microseconds} parsed from python -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def test_lambda_handler_defers_heavy_imports():
+    times = import_times("lambda_function")
+
+    loaded = sorted({name.split(".")[0] for name in times} & set(HEAVY_MODULES))
+    assert loaded == []
+    assert times["lambda_function"] / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,165 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+import lambda_function
+
+def _participant_data(email, order_id=452):
+    return {
+        "first_name": "Jardel",
+        "last_name": "Godinho",
+        "email": email,
+        "phone": "(48) 98866-7447",
+        "cpf": "000.000.000-00",
+        "order_id": order_id,
+        "product_id": 316,
+        "product_name": "Evento de Teste",
+        "certificate_details": "Participou do evento de teste",
+        "certificate_logo": "https://example.com/logo.png",
+        "certificate_background": "https://example.com/background.png",
+        "order_date": "2025-03-26 20:55:25",
+    }
+
+def _record(message_id, participants):
+    return {"messageId": message_id, "body": json.dumps(participants)}
+
+@pytest.fixture
+def services():
+    with patch('lambda_function.get_s3_service') as s3, \
+         patch('lambda_function.get_sqs_service') as sqs, \
+         patch('certified_builder.pipeline.CertificatePipeline') as pipeline, \
+         patch('lambda_function.get_builder') as builder:
+        builder.return_value.last_batch_stats = {}
+        yield {"s3": s3, "sqs": sqs, "pipeline": pipeline}
+
+def _results_for(failed_emails):
+    def run(participants):
+        return [
+            {"participant": participant.model_dump(), "success": participant.email not in failed_emails}
+            for participant in participants
+        ]
+    return run
+
+def test_handler_merges_every_record_into_one_pass(services):
+    services["pipeline"].return_value.run.side_effect = _results_for(set())
+    event = {"Records": [
+        _record("msg-1", [_participant_data("a@example.com")]),
+        _record("msg-2", [_participant_data("b@example.com"), _participant_data("c@example.com", order_id=453)]),
+    ]}
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert response["batchItemFailures"] == []
+    services["pipeline"].return_value.run.assert_called_once()
+    assert len(services["pipeline"].return_value.run.call_args[0][0]) == 3
+    messages = services["sqs"].return_value.send_results.call_args[0][0]
+    assert [message["email"] for message in messages] == ["a@example.com", "b@example.com", "c@example.com"]
+
+def test_handler_reports_only_failed_messages(services):
+    services["pipeline"].return_value.run.side_effect = _results_for({"b@example.com"})
+    event = {"Records": [
+        _record("msg-1", [_participant_data("a@example.com")]),
+        _record("msg-2", [_participant_data("b@example.com")]),
+        {"messageId": "msg-3", "body": "{not json"},
+    ]}
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["batchItemFailures"] == [{"itemIdentifier": "msg-3"}, {"itemIdentifier": "msg-2"}]
+
+def test_handler_rejects_an_invalid_output_profile_per_participant(services):
+    services["pipeline"].return_value.run.side_effect = _results_for(set())
+    event = {"Records": [
+        _record("msg-1", [{**_participant_data("a@example.com"), "certificate_output_profile": "gif"}]),
+        _record("msg-2", [_participant_data("b@example.com")]),
+    ]}
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    # A bad profile fails the same way on every delivery, so neither message is redelivered
+    assert response["batchItemFailures"] == []
+    participants = services["pipeline"].return_value.run.call_args[0][0]
+    assert [participant.email for participant in participants] == ["b@example.com"]
+    results = json.loads(response["body"])["results"]
+    assert not results[0]["success"] and "Invalid output profile: gif" in results[0]["error"]
+
+def test_handler_retries_every_message_on_unexpected_error(services):
+    services["pipeline"].return_value.run.side_effect = _results_for(set())
+    services["sqs"].return_value.send_results.side_effect = RuntimeError("SQS fora do ar")
+    event = {"Records": [_record("msg-1", [_participant_data("a@example.com")]), _record("msg-2", [_participant_data("b@example.com")])]}
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 500
+    assert response["batchItemFailures"] == [{"itemIdentifier": "msg-1"}, {"itemIdentifier": "msg-2"}]
+
+def test_redelivered_message_keeps_validation_code():
+    first = lambda_function.create_participant_object(_participant_data("a@example.com"))
+    redelivered = lambda_function.create_participant_object(_participant_data("a@example.com"))
+
+    assert first.validation_code == redelivered.validation_code
+    assert first.create_name_certificate() == redelivered.create_name_certificate()
+
+def test_bulk_creation_does_not_draw_random_codes():
+    with patch('models.participant.random.choices') as choices:
+        created = lambda_function.create_participant_objects([_participant_data(f"{index}@example.com") for index in range(3)])
+
+    choices.assert_not_called()
+    assert all(len(participant.validation_code) == 9 for participant, _ in created)
+
+def test_warm_state_is_reused_between_invocations():
+    lambda_function._warm_state.clear()
+    with patch('aws.s3_service.get_instance_aws'), patch('aws.sqs_service.get_instance_aws'):
+        assert lambda_function.get_s3_service() is lambda_function.get_s3_service()
+        assert lambda_function.get_sqs_service() is lambda_function.get_sqs_service()
+    assert lambda_function.get_builder() is lambda_function.get_builder()
+    lambda_function._warm_state.clear()
+
+def test_builder_render_workers_come_from_config():
+    from config import config
+    lambda_function._warm_state.clear()
+    with patch.object(config, "RENDER_WORKERS", 3):
+        assert lambda_function.get_builder().workers == 3
+    lambda_function._warm_state.clear()
+
+def test_prewarm_loads_fonts_and_http_client():
+    from certified_builder.utils.fetch_file_certificate import image_fetcher
+    from certified_builder.utils.font_registry import font_registry
+    lambda_function._warm_state.clear()
+    font_registry.reset_stats()
+    with patch('aws.s3_service.get_instance_aws'), patch('aws.sqs_service.get_instance_aws'):
+        lambda_function.prewarm()
+        lambda_function.prewarm()
+
+    assert font_registry.stats()["font_hits"] + font_registry.stats()["font_misses"] == 3
+    assert image_fetcher._client is not None
+    image_fetcher.close()
+    lambda_function._warm_state.clear()
+
+def test_create_participant_objects_validates_in_bulk():
+    invalid = _participant_data("not-an-email")
+    missing_date = {**_participant_data("c@example.com"), "order_date": None}
+    with_checkin = {**_participant_data("d@example.com"), "time_checkin": "2025-03-26 21:00:00", "checkin_latitude": "-27.5"}
+
+    created = lambda_function.create_participant_objects([_participant_data("a@example.com"), invalid, missing_date, with_checkin])
+
+    assert [error is None for _, error in created] == [True, False, False, True]
+    assert "email" in str(created[1][1])
+    assert "event.date" in str(created[2][1])
+    participant = created[3][0]
+    assert participant.event.time_checkin.hour == 21
+    assert participant.event.checkin_latitude == -27.5
+    single = lambda_function.create_participant_object(with_checkin)
+    assert participant.model_dump() == single.model_dump()
+
+def test_registrations_sharing_an_email_get_distinct_keys():
+    from certified_builder.certified_builder import CertifiedBuilder
+    first = {**_participant_data("familia@example.com"), "participant_id": 1001}
+    second = {**_participant_data("familia@example.com"), "participant_id": 1002}
+
+    (first, _), (second, _) = lambda_function.create_participant_objects([first, second])
+
+    assert first.participant_id == "1001"
+    builder = CertifiedBuilder()
+    assert builder.certificate_key(first) != builder.certificate_key(second)
@@ -0,0 +1,50 @@
+from certified_builder.utils.lru import LRUCache
+
+def test_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+def test_counts_hits_and_misses():
+    cache = LRUCache(max_entries=4)
+    calls = []
+    for _ in range(3):
+        cache.get_or_compute("a", lambda: calls.append("a") or 1)
+
+    assert calls == ["a"]
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.reset_stats()
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert cache.get("a") == 1
+
+def test_weight_budget():
+    cache = LRUCache(max_weight=10, weigh=len)
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    cache.put("c", "x" * 4)
+    cache.put("huge", "x" * 11)
+
+    assert "a" not in cache and "huge" not in cache
+    assert cache.weight == 8
+    cache.put("b", "x" * 2)
+    assert cache.weight == 6
+
+def test_zero_entries_stores_nothing():
+    cache = LRUCache(max_entries=0)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert len(cache) == 0
+
+def test_clear_drops_entries_and_counters():
+    cache = LRUCache(max_weight=10, weigh=len)
+    cache.put("a", "xx")
+    cache.get("a")
+    cache.clear()
+
+    assert len(cache) == 0 and cache.weight == 0
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,75 @@
+import json
+import mmap
+import time
+from certified_builder.utils.metrics import MetricsCollector
+
+def test_spans_and_bytes_are_aggregated_per_stage():
+    metrics = MetricsCollector()
+    for _ in range(3):
+        with metrics.span("encode"):
+            time.sleep(0.001)
+    metrics.add_bytes("encode", 100)
+    metrics.add_bytes("encode", 50)
+
+    summary = metrics.summary()
+    encode = summary["stages"]["encode"]
+    assert encode["count"] == 3
+    assert encode["bytes"] == 150
+    assert encode["max_seconds"] <= encode["seconds"] <= summary["wall_seconds"]
+    assert summary["rss_bytes"] > 0 and summary["process_peak_rss_bytes"] > 0
+
+def test_span_is_recorded_when_the_block_raises():
+    metrics = MetricsCollector()
+    try:
+        with metrics.span("s3_upload"):
+            raise RuntimeError("SlowDown")
+    except RuntimeError:
+        pass
+    assert metrics.summary()["stages"]["s3_upload"]["count"] == 1
+
+def test_emit_writes_one_emf_line(capsys):
+    metrics = MetricsCollector(namespace="Teste")
+    with metrics.span("render"):
+        pass
+    metrics.add_bytes("s3_upload", 2048)
+    metrics.emit({"Service": "certificados"})
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    document = json.loads(lines[0])
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "Teste"
+    assert directive["Dimensions"] == [["Service"]]
+    names = {metric["Name"] for metric in directive["Metrics"]}
+    assert {"wall_seconds", "rss_bytes", "process_peak_rss_bytes", "render_seconds", "render_count", "s3_upload_bytes"} <= names
+    assert all(name in document for name in names)
+    assert document["s3_upload_bytes"] == 2048
+    assert "render_bytes" not in names
+
+def test_rss_is_reported_per_batch():
+    metrics = MetricsCollector()
+    # Mapped directly so closing it gives the pages back whatever the allocator's state
+    block = mmap.mmap(-1, 64 * 1024 * 1024)
+    block.write(b"\x01" * len(block))
+    during = metrics.summary()
+    block.close()
+    after = metrics.summary()
+
+    # The process peak keeps the block, the batch RSS does not
+    assert after["rss_bytes"] < during["rss_bytes"] - 32 * 1024 * 1024
+    assert after["process_peak_rss_bytes"] > after["rss_bytes"] + 32 * 1024 * 1024
+
+def test_drained_stages_merge_into_another_collector():
+    worker, parent = MetricsCollector(), MetricsCollector()
+    worker.record("render", 0.5)
+    worker.add_bytes("encode", 10)
+    parent.record("render", 0.25)
+
+    parent.merge(worker.drain())
+
+    stages = parent.summary()["stages"]
+    assert stages["render"]["count"] == 2
+    assert stages["render"]["seconds"] == 0.75
+    assert stages["render"]["max_seconds"] == 0.5
+    assert stages["encode"]["bytes"] == 10
+    assert worker.summary()["stages"] == {}
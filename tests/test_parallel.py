@@ -0,0 +1,59 @@
+import os
+import time
+import pytest
+from certified_builder.parallel import fork_available, iter_in_processes, run_in_processes
+
+pytestmark = pytest.mark.skipif(not fork_available(), reason="fork start method not available")
+
+def test_run_in_processes_keeps_input_order():
+    results = run_in_processes(lambda item: (item, os.getpid()), list(range(10)), workers=3, chunk_size=2, on_error=None)
+
+    assert [item for item, _ in results] == list(range(10))
+    assert os.getpid() not in {pid for _, pid in results}
+
+def test_run_in_processes_reports_dead_worker_chunk():
+    def render(item):
+        if item == 3:
+            os._exit(1)
+        return item
+
+    results = run_in_processes(render, list(range(6)), workers=2, chunk_size=2, on_error=lambda item, error: ("error", item))
+
+    assert results[2:4] == [("error", 2), ("error", 3)]
+    assert [result for result in results if not isinstance(result, tuple)] == [0, 1, 4, 5]
+
+def test_iter_in_processes_yields_each_index_once():
+    results = dict(iter_in_processes(lambda item: item * 2, list(range(9)), workers=2, chunk_size=2, on_error=None))
+
+    assert results == {index: index * 2 for index in range(9)}
+
+def test_iter_in_processes_stops_workers_when_closed():
+    results = iter_in_processes(lambda item: os.getpid(), list(range(20)), workers=2, chunk_size=1, on_error=None)
+    _, pid = next(results)
+    results.close()
+
+    with pytest.raises(ProcessLookupError):
+        for _ in range(100):
+            os.kill(pid, 0)
+            time.sleep(0.01)
+
+def test_iter_in_processes_kills_a_stuck_worker():
+    def render(item):
+        if item == 2:
+            time.sleep(60)
+        return item
+
+    start = time.monotonic()
+    results = dict(iter_in_processes(render, list(range(6)), workers=2, chunk_size=2, on_error=lambda item, error: ("error", str(error)), chunk_timeout=1))
+
+    assert time.monotonic() - start < 30
+    assert results[2] == results[3] == ("error", "Render worker timed out after 1s")
+    assert [results[index] for index in (0, 1, 4, 5)] == [0, 1, 4, 5]
+
+def test_iter_in_processes_sends_chunk_state_back():
+    merged = []
+    results = dict(iter_in_processes(lambda item: item, list(range(5)), workers=2, chunk_size=2, on_error=None, chunk_state=os.getpid, merge_state=merged.append))
+
+    assert results == {index: index for index in range(5)}
+    assert len(merged) == 3
+    assert os.getpid() not in merged
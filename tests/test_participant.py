@@ -226,4 +226,38 @@ def test_sanitize_filename_edge_cases(mock_certificate, mock_event):
         result = participant._sanitize_filename(input_text)
         assert result == expected_output, f"Para '{input_text}', esperado '{expected_output}', obtido '{result}'"
     
-    
\ No newline at end of file
+    
+def test_derived_names_do_not_mutate_fields(mock_certificate, mock_event):
+    participant = Participant(
+        first_name="Jardel Silva",
+        last_name="Godinho Santos",
+        email="jardelgodinho@gmail.com",
+        phone="(48) 98866-7447",
+        cpf="000.000.000-00",
+        validation_code="abc123def",
+        certificate=mock_certificate,
+        event=mock_event
+    )
+    name_certificate = participant.create_name_certificate()
+
+    assert participant.first_name == "Jardel Silva"
+    assert participant.last_name == "Godinho Santos"
+    assert participant.validation_code == "abc123def"
+    assert participant.formated_validation_code() == "ABC-123-DEF"
+    assert name_certificate == "Jardel_Silva_SantosEvento_de_Teste_ABC-123-DEF.png"
+    # Derived values follow updated fields instead of serving the cached ones
+    renamed = participant.model_copy(update={"first_name": "Maria"})
+    assert renamed.name_completed() == "Maria Godinho Santos"
+    assert renamed.create_name_certificate() == "Maria_Godinho_SantosEvento_de_Teste_ABC-123-DEF.png"
+    assert participant.name_completed() == "Jardel Silva Santos"
+
+@pytest.mark.parametrize("email", ["Jardel@Gmail.COM", "a.b+c@example.com", "Nome <a@x.com>", "ação@x.com", "a@bücher.de"])
+def test_email_validation_matches_email_str(mock_certificate, mock_event, email):
+    from pydantic import EmailStr, TypeAdapter
+    participant = Participant(first_name="A", last_name="B", email=email, phone="", cpf="", certificate=mock_certificate, event=mock_event)
+    assert participant.email == TypeAdapter(EmailStr).validate_python(email)
+
+@pytest.mark.parametrize("email", ["a..b@example.com", "a@x", "a@-x.com", "a@b@c.com", "a@example.com."])
+def test_invalid_email_variants(mock_certificate, mock_event, email):
+    with pytest.raises(ValidationError, match="value is not a valid email address"):
+        Participant(first_name="A", last_name="B", email=email, phone="", cpf="", certificate=mock_certificate, event=mock_event)
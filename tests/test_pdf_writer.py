@@ -0,0 +1,226 @@
+import os
+import re
+import struct
+import zlib
+from datetime import datetime
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image
+from certified_builder.certified_builder import CertifiedBuilder
+from certified_builder.utils.pdf_writer import PdfWriter
+from models.certificate import Certificate
+from models.event import Event
+from models.participant import Participant
+
+def read_objects(data: bytes) -> dict:
+    """Map object numbers to (dictionary, stream) using the cross-reference table."""
+    xref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[xref:]).group(1))
+    objects = {}
+    for number in range(1, count):
+        entry = data[xref + len(f"xref\n0 {count}\n".encode()) + 20 * number:][:20]
+        offset = int(entry[:10])
+        header = re.match(rb"(\d+) 0 obj\n(.*?)\n(stream\n|endobj)", data[offset:], re.S)
+        assert int(header.group(1)) == number
+        dictionary, stream = header.group(2).decode(), None
+        if header.group(3) == b"stream\n":
+            length = int(re.search(r"/Length (\d+) >>$", dictionary).group(1))
+            start = offset + header.end()
+            stream = data[start:start + length]
+            assert data[start + length:start + length + 11] == b"\nendstream\n"
+        objects[number] = (dictionary, stream)
+    return objects
+
+def decode_image(dictionary: str, stream: bytes) -> Image.Image:
+    """Rebuild a PNG from a /Predictor 15 image XObject and open it with Pillow."""
+    width = int(re.search(r"/Width (\d+)", dictionary).group(1))
+    height = int(re.search(r"/Height (\d+)", dictionary).group(1))
+
+    def chunk(kind, payload):
+        return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + chunk(b"IDAT", stream) + chunk(b"IEND", b"")
+    return Image.open(BytesIO(png)).convert("RGB")
+
+def test_images_are_stored_losslessly():
+    image = Image.effect_noise((64, 48), 80).convert("RGB")
+    buffer = BytesIO()
+    with PdfWriter(buffer) as writer:
+        number = writer.add_image(image)
+        writer.add_page(image.size, [(number, (0, 0, 64, 48))])
+
+    dictionary, stream = read_objects(buffer.getvalue())[number]
+    assert "/Subtype /Image" in dictionary
+    assert decode_image(dictionary, stream).tobytes() == image.tobytes()
+
+def test_pages_share_an_image_and_place_tiles_from_the_top():
+    buffer = BytesIO()
+    with PdfWriter(buffer, dpi=72) as writer:
+        background = writer.add_image(Image.new("RGB", (200, 100), (255, 0, 0)))
+        for index in range(3):
+            tile = writer.add_image(Image.new("RGB", (20, 10), (0, 0, index)))
+            writer.add_page((200, 100), [(background, (0, 0, 200, 100)), (tile, (30, 5, 50, 15))])
+
+    data = buffer.getvalue()
+    objects = read_objects(data)
+    pages = [dictionary for dictionary, _ in objects.values() if "/Type /Page " in dictionary]
+    assert data.startswith(b"%PDF-1.4")
+    assert data.endswith(b"%%EOF\n")
+    assert "/Count 3" in objects[2][0]
+    assert len(pages) == 3
+    assert all(f"/Im0 {background} 0 R" in page and "/MediaBox [0 0 200 100]" in page for page in pages)
+    contents = [objects[int(re.search(r"/Contents (\d+) 0 R", page).group(1))][1] for page in pages]
+    assert all(b"q 20 0 0 10 30 85 cm /Im1 Do Q" in content for content in contents)
+
+def _participants(count, product_id=316):
+    certificate = Certificate(details="In recognition of their participation in the Python Floripa Community Meeting.", logo="https://example.com/logo.png", background="https://example.com/background.png")
+    event = Event(order_id=452, product_id=product_id, product_name="Evento de Teste", date=datetime(2025, 3, 26, 20, 55, 25))
+    return [
+        Participant(first_name=f"Pessoa{index}", last_name="Silva", email="pessoa@example.com", phone="(48) 98866-7447", cpf="", certificate=certificate, event=event, validation_code=f"ABC{index:06d}")
+        for index in range(count)
+    ]
+
+def _page_images(data):
+    """Rebuild every page by drawing its images at the positions of its content stream."""
+    objects = read_objects(data)
+    pages = []
+    for dictionary, _ in objects.values():
+        if "/Type /Page " not in dictionary:
+            continue
+        height = float(re.search(r"/MediaBox \[0 0 \S+ (\S+)\]", dictionary).group(1))
+        names = dict(re.findall(r"/(Im\d+) (\d+) 0 R", dictionary))
+        content = objects[int(re.search(r"/Contents (\d+) 0 R", dictionary).group(1))][1].decode()
+        page = None
+        for w, h, x, y, name in re.findall(r"q (\S+) 0 0 (\S+) (\S+) (\S+) cm /(\w+) Do Q", content):
+            image = decode_image(*objects[int(names[name])])
+            scale = image.width / float(w)
+            if page is None:
+                page = image
+            else:
+                page.paste(image, (round(float(x) * scale), round((height - float(y) - float(h)) * scale)))
+        pages.append(page)
+    return objects, pages
+
+def test_build_pdfs_pages_match_the_png_renders(tmp_path):
+    builder = CertifiedBuilder()
+    builder.temp_dir = str(tmp_path)
+    participants = _participants(5)
+    background, logo = Image.effect_noise((640, 480), 60).convert("RGBA"), Image.new("RGBA", (100, 100), (30, 90, 160, 200))
+    images = {participants[0].certificate.background: background, participants[0].certificate.logo: logo}
+
+    with patch("certified_builder.certified_builder.fetch_files_certificate", return_value=images):
+        results = list(builder.build_pdfs(participants, pages_per_file=3))
+    prepared_template = builder.prepare_template(background, logo)
+    expected = [builder.render_certificate(participant, prepared_template).convert("RGB") for participant in participants]
+
+    assert [result["pages"] for result in results] == [3, 2]
+    assert all(result["success"] and result["certificate_key"].startswith("certificates/316/pdf/") for result in results)
+    assert [participant["first_name"] for result in results for participant in result["participants"]] == [f"Pessoa{index}" for index in range(5)]
+    pages = []
+    for result in results:
+        with open(result["certificate_path"], "rb") as f:
+            objects, file_pages = _page_images(f.read())
+        # The background is embedded once per file
+        assert sum(1 for dictionary, _ in objects.values() if "/Width 640 /Height 480" in dictionary) == 1
+        pages += file_pages
+    assert [page.tobytes() for page in pages] == [image.tobytes() for image in expected]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(result["certificate_path"]) for result in results)
+
+def test_build_pdfs_in_memory_splits_events_and_reports_errors(tmp_path):
+    builder = CertifiedBuilder()
+    builder.temp_dir = str(tmp_path)
+    participants = _participants(2, product_id=1) + _participants(1, product_id=2)
+    images = {participants[0].certificate.background: Image.new("RGBA", (400, 300), "white"), participants[0].certificate.logo: Image.new("RGBA", (50, 50), "blue")}
+    render = builder.render_certificate_tiles
+
+    def failing_render(participant, prepared_template):
+        if participant.event.product_id == 2:
+            raise RuntimeError("falha")
+        return render(participant, prepared_template)
+
+    with patch("certified_builder.certified_builder.fetch_files_certificate", return_value=images), \
+         patch.object(builder, "render_certificate_tiles", side_effect=failing_render):
+        results = {result["certificate_key"]: result for result in builder.build_pdfs(participants, in_memory=True)}
+
+    assert os.listdir(tmp_path) == []
+    failed = results.pop(None)
+    assert failed["pages"] == 0 and not failed["success"]
+    assert [error["error"] for error in failed["errors"]] == ["falha"]
+    (key, result), = results.items()
+    assert key.startswith("certificates/1/pdf/")
+    assert result["pages"] == 2
+    assert result["certificate"].getvalue().startswith(b"%PDF-1.4")
+    assert len(_page_images(result["certificate"].getvalue())[1]) == 2
+
+def _page_texts(objects, page, dpi):
+    """Return (base font, size, baseline, [(glyph id, x)]) of every text of a page, in pixels."""
+    scale = 72 / dpi
+    height = float(re.search(r"/MediaBox \[0 0 \S+ (\S+)\]", page).group(1))
+    fonts = dict(re.findall(r"/(F\d+) (\d+) 0 R", page))
+    content = objects[int(re.search(r"/Contents (\d+) 0 R", page).group(1))][1].decode()
+    texts = []
+    for name, size, x, y, shown in re.findall(r"BT /(F\d+) (\S+) Tf \S+ \S+ \S+ rg (\S+) (\S+) Td \[(.*?)\] TJ ET", content):
+        font = objects[int(fonts[name])][0]
+        descendant = objects[int(re.search(r"/DescendantFonts \[(\d+) 0 R\]", font).group(1))][0]
+        widths = {int(glyph_id): float(width) for glyph_id, width in re.findall(r"(\d+) \[(\S+)\]", re.search(r"/W \[(.*)\]", descendant).group(1))}
+        size, pen, glyphs = float(size), float(x), []
+        for glyph, adjustment in re.findall(r"<([0-9A-F]{4})>|(-?[\d.]+)", shown):
+            if glyph:
+                glyphs.append((int(glyph, 16), round(pen / scale, 3)))
+                pen += widths[int(glyph, 16)] * size / 1000
+            else:
+                pen -= float(adjustment) * size / 1000
+        texts.append((re.search(r"/BaseFont /(\S+)", font).group(1), round(size / scale, 3), round((height - float(y)) / scale, 3), glyphs))
+    return texts
+
+def _vector_participants(count, product_id=316):
+    return [
+        participant.model_copy(update={"certificate": participant.certificate.model_copy(update={"output_profile": "pdf"})})
+        for participant in _participants(count, product_id)
+    ]
+
+def test_vector_page_places_every_glyph_like_the_rasterizer():
+    builder = CertifiedBuilder()
+    participant, = _vector_participants(1)
+    certificate = builder.generate_certificate(participant, Image.new("RGBA", (800, 600), "white"), Image.new("RGBA", (50, 50), "blue"))
+
+    data = builder.encode_certificate(certificate, participant).getvalue()
+
+    objects = read_objects(data)
+    page, = [dictionary for dictionary, _ in objects.values() if "/Type /Page " in dictionary]
+    texts = _page_texts(objects, page, 150)
+    expected = []
+    for run in certificate.runs:
+        pens = [run.position[0] + sum(run.advances()[:index]) for index in range(len(run.text))]
+        expected.append((run.font.size, round(run.baseline, 3), [(glyph_id, round(pen, 3)) for (glyph_id, _, _), pen in zip(run.glyphs(), pens)]))
+    assert [(size, baseline, glyphs) for _, size, baseline, glyphs in texts] == expected
+    assert [base_font.split("+")[1] for base_font, _, _, _ in texts] == ["PinyonScript-Regular"] + ["ChakraPetch-Regular"] * 3 + ["ChakraPetch-SemiBold"]
+    # Fonts are embedded as subsets with a map back to the text
+    assert sum(1 for dictionary, _ in objects.values() if "/Subtype /Type0" in dictionary and "/ToUnicode" in dictionary) == 3
+    font_files = [stream for dictionary, stream in objects.values() if "/Length1" in dictionary]
+    assert len(font_files) == 3
+    assert sum(int(re.search(r"/Length1 (\d+)", dictionary).group(1)) for dictionary, _ in objects.values() if "/Length1" in dictionary) < 64 * 1024
+    unicode_maps = b"".join(stream for dictionary, stream in objects.values() if stream and b"beginbfchar" in stream)
+    assert f"<{participant.name_completed()[0].encode('utf-16-be').hex().upper()}>".encode() in unicode_maps
+
+def test_build_pdfs_vector_pages_share_background_and_fonts(tmp_path):
+    builder = CertifiedBuilder()
+    builder.temp_dir = str(tmp_path)
+    participants = _vector_participants(4)
+    background = Image.effect_noise((640, 480), 60).convert("RGBA")
+    images = {participants[0].certificate.background: background, participants[0].certificate.logo: Image.new("RGBA", (100, 100), (30, 90, 160, 200))}
+
+    with patch("certified_builder.certified_builder.fetch_files_certificate", return_value=images):
+        result, = builder.build_pdfs(participants, in_memory=True)
+    data = result["certificate"].getvalue()
+    objects, pages = _page_images(data)
+
+    assert result["pages"] == 4
+    assert sum(1 for dictionary, _ in objects.values() if "/Width 640 /Height 480" in dictionary) == 1
+    assert sum(1 for dictionary, _ in objects.values() if "/Subtype /Type0" in dictionary) == 3
+    # Pages hold the template; the lines are text on top of it
+    prepared_template = builder.prepare_template(background, images[participants[0].certificate.logo])
+    assert all(page.tobytes() == prepared_template.image.convert("RGB").tobytes() for page in pages)
+    page_dictionaries = [dictionary for dictionary, _ in objects.values() if "/Type /Page " in dictionary]
+    names = [_page_texts(objects, page, 150)[0][3] for page in page_dictionaries]
+    assert len(set(map(tuple, names))) == 4
@@ -0,0 +1,208 @@
+import os
+import threading
+import pytest
+from unittest.mock import patch
+from PIL import Image
+from certified_builder.certified_builder import CertifiedBuilder
+from certified_builder.parallel import iter_in_processes
+from certified_builder.pipeline import CertificatePipeline
+from models.participant import Participant
+from models.certificate import Certificate
+from models.event import Event
+from datetime import datetime
+
+class RecordingS3:
+    def __init__(self, fail_keys=(), existing=()):
+        self.uploaded = []
+        self.existing = set(existing)
+        self.first_upload = threading.Event()
+        self.fail_keys = fail_keys
+
+    def upload_file(self, file_path, key, delete_after=False):
+        self._record(key, file_path)
+        if delete_after:
+            os.remove(file_path)
+
+    def upload_fileobj(self, fileobj, key, content_type="image/png"):
+        self._record(key, fileobj.getvalue())
+
+    def existing_keys(self, keys):
+        return self.existing.intersection(keys)
+
+    def _record(self, key, payload):
+        if any(fail in key for fail in self.fail_keys):
+            raise RuntimeError("S3 indisponível")
+        self.uploaded.append((payload, key))
+        self.first_upload.set()
+
+@pytest.fixture
+def participants():
+    certificate = Certificate(details="Participou do evento de teste", logo="https://example.com/logo.png", background="https://example.com/background.png")
+    event = Event(order_id=1, product_id=2, product_name="Evento", date=datetime(2025, 3, 26, 20, 55, 25))
+    return [
+        Participant(first_name=f"Pessoa{index}", last_name="Teste", email=f"pessoa{index}@example.com", phone="", cpf="", certificate=certificate, event=event)
+        for index in range(6)
+    ]
+
+@pytest.fixture
+def builder(tmp_path):
+    builder = CertifiedBuilder()
+    builder.temp_dir = str(tmp_path)
+    images = {
+        "https://example.com/background.png": Image.new("RGBA", (800, 600), (255, 255, 255, 255)),
+        "https://example.com/logo.png": Image.new("RGBA", (150, 150), (0, 0, 0, 255)),
+    }
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images):
+        yield builder
+
+def test_pipeline_uploads_every_certificate_in_order(builder, participants):
+    s3 = RecordingS3()
+    results = CertificatePipeline(builder, s3, queue_size=1).run(participants)
+
+    assert [result["participant"]["email"] for result in results] == [participant.email for participant in participants]
+    assert all(result["success"] for result in results)
+    assert sorted(key for _, key in s3.uploaded) == sorted(result["certificate_key"] for result in results)
+
+def test_pipeline_uploads_while_rendering(builder, participants):
+    s3 = RecordingS3()
+    render = builder.render_certificate
+    uploaded_before_last_render = []
+
+    def slow_last_render(participant, prepared_template):
+        if participant is participants[-1]:
+            uploaded_before_last_render.append(s3.first_upload.wait(timeout=5))
+        return render(participant, prepared_template)
+
+    with patch.object(builder, 'render_certificate', side_effect=slow_last_render):
+        CertificatePipeline(builder, s3, queue_size=2).run(participants)
+
+    assert uploaded_before_last_render == [True]
+
+def test_pipeline_reports_upload_failures(builder, participants):
+    s3 = RecordingS3(fail_keys=["Pessoa2"])
+    results = CertificatePipeline(builder, s3).run(participants)
+
+    assert [result["success"] for result in results] == [True, True, False, True, True, True]
+    assert results[2]["error"] == "S3 indisponível"
+
+def test_pipeline_uploads_from_memory(builder, participants, tmp_path):
+    s3 = RecordingS3()
+    results = CertificatePipeline(builder, s3).run(participants)
+
+    assert all(result["certificate_path"] is None for result in results)
+    assert all(payload.startswith(b"\x89PNG") for payload, _ in s3.uploaded)
+    assert list(tmp_path.iterdir()) == []
+
+def test_pipeline_removes_spilled_files_after_upload(builder, participants, tmp_path):
+    s3 = RecordingS3()
+    results = CertificatePipeline(builder, s3, in_memory=False).run(participants)
+
+    assert all(result["certificate_path"].startswith(str(tmp_path)) for result in results)
+    assert list(tmp_path.iterdir()) == []
+
+def test_pipeline_skips_certificates_already_in_s3(builder, participants):
+    keys = [builder.certificate_key(participant) for participant in participants]
+    s3 = RecordingS3(existing=keys[1::2])
+
+    with patch.object(builder, 'render_certificate', wraps=builder.render_certificate) as render:
+        results = CertificatePipeline(builder, s3, skip_existing=True).run(participants)
+
+    assert render.call_count == 3
+    assert [result["certificate_key"] for result in results] == keys
+    assert all(result["success"] for result in results)
+    assert [result.get("skipped", False) for result in results] == [False, True] * 3
+    assert sorted(key for _, key in s3.uploaded) == sorted(keys[0::2])
+
+def test_pipeline_fails_only_the_participant_without_a_key(builder, participants):
+    # model_copy skips validation, like a participant built before the profile was checked
+    participants[2] = participants[2].model_copy(update={"certificate": participants[2].certificate.model_copy(update={"output_profile": "gif"})})
+    s3 = RecordingS3()
+
+    results = CertificatePipeline(builder, s3, skip_existing=True).run(participants)
+
+    assert [result["success"] for result in results] == [True, True, False, True, True, True]
+    assert "Invalid output profile: gif" in results[2]["error"]
+    assert len(s3.uploaded) == 5
+
+def test_pipeline_renders_in_worker_processes(builder, participants):
+    builder.workers, builder.chunk_size = 2, 2
+    s3 = RecordingS3()
+
+    with patch.object(builder, 'render_certificates') as render_here:
+        results = CertificatePipeline(builder, s3).run(participants)
+
+    render_here.assert_not_called()
+    assert all(result["success"] for result in results)
+    assert [result["certificate_key"] for result in results] == [builder.certificate_key(participant) for participant in participants]
+    assert all(payload.startswith(b"\x89PNG") for payload, _ in s3.uploaded)
+
+def test_pipeline_forks_once_before_starting_threads(builder, participants):
+    from certified_builder import certified_builder as module
+    # Two templates: the workers are still forked once for the whole batch
+    other = participants[0].certificate.model_copy(update={"logo": "https://example.com/other-logo.png"})
+    participants = [participant.model_copy(update={"certificate": other}) if index % 2 else participant for index, participant in enumerate(participants)]
+    builder.workers, builder.chunk_size = 2, 2
+    threads_at_fork = []
+
+    def forking(*args, **kwargs):
+        threads_at_fork.append(threading.active_count())
+        yield from iter_in_processes(*args, **kwargs)
+
+    images = {
+        "https://example.com/background.png": Image.new("RGBA", (800, 600), (255, 255, 255, 255)),
+        "https://example.com/logo.png": Image.new("RGBA", (150, 150), (0, 0, 0, 255)),
+        "https://example.com/other-logo.png": Image.new("RGBA", (150, 150), (0, 0, 255, 255)),
+    }
+    with patch('certified_builder.certified_builder.fetch_files_certificate', return_value=images), \
+         patch.object(module, "iter_in_processes", side_effect=forking):
+        results = CertificatePipeline(builder, RecordingS3()).run(participants)
+
+    assert all(result["success"] for result in results)
+    assert threads_at_fork == [threading.active_count()]
+
+def test_pipeline_records_stage_metrics(builder, participants):
+    from certified_builder.utils.metrics import MetricsCollector
+    builder.metrics = MetricsCollector()
+    CertificatePipeline(builder, RecordingS3()).run(participants)
+
+    stages = builder.metrics.summary()["stages"]
+    assert stages["render"]["count"] == len(participants)
+    assert stages["encode"]["count"] == len(participants)
+    assert stages["encode"]["bytes"] > 0
+    assert {"fetch", "prepare_template", "layout", "text_layers", "composite"} <= set(stages)
+
+def test_pipeline_merges_metrics_from_worker_processes(builder, participants):
+    from certified_builder.utils.metrics import MetricsCollector
+    builder.metrics = MetricsCollector()
+    builder.workers, builder.chunk_size = 2, 2
+    CertificatePipeline(builder, RecordingS3()).run(participants)
+
+    stages = builder.last_batch_stats["metrics"]["stages"]
+    assert stages["render"]["count"] == len(participants)
+    assert stages["encode"]["count"] == len(participants)
+    assert {"layout", "text_layers", "composite"} <= set(stages)
+
+def test_pipeline_stats_include_the_uploads(builder, participants):
+    from certified_builder.utils.metrics import MetricsCollector
+    builder.metrics = MetricsCollector()
+
+    class TimedS3(RecordingS3):
+        def upload_fileobj(self, fileobj, key, content_type="image/png"):
+            with builder.metrics.span("s3_upload"):
+                super().upload_fileobj(fileobj, key, content_type)
+
+    CertificatePipeline(builder, TimedS3(), queue_size=1).run(participants)
+
+    assert builder.last_batch_stats["metrics"]["stages"]["s3_upload"]["count"] == len(participants)
+
+def test_pipeline_does_not_report_the_previous_batch_when_everything_is_skipped(builder, participants):
+    from certified_builder.utils.text_layout import text_layout
+    text_layout.clear()
+    CertificatePipeline(builder, RecordingS3()).run(participants)
+    assert builder.last_batch_stats["layout"]["layout_misses"] > 0
+    keys = [builder.certificate_key(participant) for participant in participants]
+
+    results = CertificatePipeline(builder, RecordingS3(existing=keys), skip_existing=True).run(participants)
+
+    assert all(result["skipped"] for result in results)
+    assert builder.last_batch_stats["layout"]["layout_misses"] == 0
@@ -0,0 +1,97 @@
+import pytest
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+from aws.s3_service import S3Service
+
+@pytest.fixture
+def s3_service():
+    with patch('aws.s3_service.get_instance_aws', return_value=MagicMock()):
+        yield S3Service()
+
+def test_upload_fileobj_sends_buffer_with_transfer_config(s3_service):
+    buffer = BytesIO(b"\x89PNG certificate")
+    buffer.read()
+    s3_service.upload_fileobj(buffer, "certificates/1/2/a.png")
+
+    args, kwargs = s3_service.aws.upload_fileobj.call_args
+    assert args == (buffer, "test-bucket", "certificates/1/2/a.png")
+    assert kwargs["ExtraArgs"] == {"ContentType": "image/png"}
+    assert kwargs["Config"] is s3_service.transfer_config
+    assert buffer.tell() == 0
+
+def test_upload_file_deletes_spilled_file(s3_service, tmp_path):
+    certificate = tmp_path.joinpath("a.png")
+    certificate.write_bytes(b"png")
+    s3_service.upload_file(str(certificate), "certificates/1/2/a.png", delete_after=True)
+
+    s3_service.aws.upload_file.assert_called_once()
+    assert not certificate.exists()
+
+def test_upload_file_keeps_file_when_upload_fails(s3_service, tmp_path):
+    certificate = tmp_path.joinpath("a.png")
+    certificate.write_bytes(b"png")
+    s3_service.aws.upload_file.side_effect = RuntimeError("denied")
+
+    with pytest.raises(RuntimeError):
+        s3_service.upload_file(str(certificate), "certificates/1/2/a.png", delete_after=True)
+    assert certificate.exists()
+
+def test_upload_many_reports_each_key(s3_service):
+    def upload_fileobj(fileobj, bucket, key, **kwargs):
+        if key.endswith("b.png"):
+            raise RuntimeError("SlowDown")
+
+    s3_service.aws.upload_fileobj.side_effect = upload_fileobj
+    results = s3_service.upload_many([(BytesIO(b"a"), "certificates/a.png"), (BytesIO(b"b"), "certificates/b.png"), (BytesIO(b"c"), "certificates/c.png")])
+
+    assert results == {
+        "certificates/a.png": {"success": True},
+        "certificates/b.png": {"success": False, "error": "SlowDown"},
+        "certificates/c.png": {"success": True},
+    }
+
+def test_get_instance_aws_reuses_client():
+    from aws import boto_aws
+    boto_aws._instances.clear()
+    with patch('aws.boto_aws.client', side_effect=lambda *args, **kwargs: MagicMock()) as mock_client:
+        first = boto_aws.get_instance_aws(boto_aws.ServiceNameAWS.S3)
+        second = boto_aws.get_instance_aws(boto_aws.ServiceNameAWS.S3)
+
+    assert first is second
+    mock_client.assert_called_once()
+    assert mock_client.call_args.kwargs["config"].max_pool_connections == 32
+    boto_aws._instances.clear()
+
+def test_existing_keys_lists_each_prefix_once(s3_service):
+    from botocore.exceptions import ClientError
+    listings = {
+        "certificates/1/10/": [{"Contents": [{"Key": "certificates/1/10/a.png"}]}, {"Contents": [{"Key": "certificates/1/10/b.png"}, {"Key": "certificates/1/10/other.png"}]}],
+        "certificates/1/11/": [{}],
+    }
+
+    def paginate(Bucket, Prefix):
+        if Prefix == "certificates/2/20/":
+            raise ClientError({"Error": {"Code": "403"}}, "ListObjectsV2")
+        return iter(listings[Prefix])
+
+    s3_service.aws.get_paginator.return_value.paginate.side_effect = paginate
+    existing = s3_service.existing_keys([
+        "certificates/1/10/a.png", "certificates/1/10/b.png", "certificates/1/10/c.png",
+        "certificates/1/11/a.png", "certificates/2/20/a.png", "certificates/1/10/a.png",
+    ])
+
+    assert existing == {"certificates/1/10/a.png", "certificates/1/10/b.png"}
+    s3_service.aws.get_paginator.assert_called_with("list_objects_v2")
+    assert sorted(call.kwargs["Prefix"] for call in s3_service.aws.get_paginator.return_value.paginate.call_args_list) == ["certificates/1/10/", "certificates/1/11/", "certificates/2/20/"]
+    s3_service.aws.head_object.assert_not_called()
+
+def test_uploads_record_bytes_moved():
+    from certified_builder.utils.metrics import MetricsCollector
+    metrics = MetricsCollector()
+    with patch('aws.s3_service.get_instance_aws', return_value=MagicMock()):
+        s3_service = S3Service(metrics=metrics)
+    s3_service.upload_fileobj(BytesIO(b"x" * 1000), "certificates/a.png")
+    s3_service.upload_fileobj(BytesIO(b"x" * 24), "certificates/b.png")
+
+    assert metrics.summary()["stages"]["s3_upload"]["count"] == 2
+    assert metrics.summary()["stages"]["s3_upload"]["bytes"] == 1024
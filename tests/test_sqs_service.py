@@ -0,0 +1,89 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from aws.sqs_service import SQSService
+
+def _results(count, order_id=452, padding=0):
+    return [
+        {"order_id": order_id, "product_id": 316, "email": f"p{index}@example.com", "certificate_key": "k" * padding, "success": True}
+        for index in range(count)
+    ]
+
+@pytest.fixture
+def sqs_service():
+    client = MagicMock()
+    client.send_message_batch.return_value = {"Successful": [], "Failed": []}
+    with patch('aws.sqs_service.get_instance_aws', return_value=client):
+        yield SQSService()
+
+def _sent_bodies(sqs_service):
+    return [
+        json.loads(entry["MessageBody"])
+        for call in sqs_service.aws.send_message_batch.call_args_list
+        for entry in call.kwargs["Entries"]
+    ]
+
+def test_send_results_splits_below_size_limit(sqs_service):
+    sqs_service.max_message_bytes = 8 * 1024
+    results = _results(60, padding=500)
+
+    sent = sqs_service.send_results(results)
+
+    bodies = _sent_bodies(sqs_service)
+    assert sent == len(bodies) > 1
+    assert [result for body in bodies for result in body] == results
+    for call in sqs_service.aws.send_message_batch.call_args_list:
+        entries = call.kwargs["Entries"]
+        assert len(entries) <= 10
+        assert sum(len(entry["MessageBody"].encode()) for entry in entries) <= 8 * 1024
+
+def test_send_results_retries_only_failed_entries(sqs_service):
+    responses = [{"Failed": [{"Id": "1", "Code": "InternalError", "SenderFault": False}]}]
+    sqs_service.aws.send_message_batch.side_effect = lambda **kwargs: responses.pop() if responses else {"Failed": []}
+    # Two bodies (a full one and a short one) that fit in a single batch
+    sqs_service.max_message_bytes = 4 * 1024
+    results = _results(8, padding=300)
+
+    sqs_service.send_results(results, backoff=0)
+
+    first, retry = sqs_service.aws.send_message_batch.call_args_list
+    assert len(first.kwargs["Entries"]) == 2
+    assert retry.kwargs["Entries"] == [first.kwargs["Entries"][1]]
+
+def test_send_results_raises_on_sender_fault(sqs_service):
+    sqs_service.aws.send_message_batch.return_value = {"Failed": [{"Id": "0", "Code": "InvalidMessageContents", "SenderFault": True}]}
+
+    with pytest.raises(RuntimeError):
+        sqs_service.send_results(_results(1), backoff=0)
+    sqs_service.aws.send_message_batch.assert_called_once()
+
+def test_send_results_retries_connection_errors(sqs_service):
+    from botocore.exceptions import EndpointConnectionError
+    errors = [EndpointConnectionError(endpoint_url="https://sqs.us-east-1.amazonaws.com")]
+
+    def send_message_batch(**kwargs):
+        if errors:
+            raise errors.pop()
+        return {"Failed": []}
+
+    sqs_service.aws.send_message_batch.side_effect = send_message_batch
+
+    assert sqs_service.send_results(_results(1), backoff=0) == 1
+    assert sqs_service.aws.send_message_batch.call_count == 2
+
+def test_send_results_reports_batches_lost_to_connection_errors(sqs_service):
+    from botocore.exceptions import ReadTimeoutError
+    sqs_service.aws.send_message_batch.side_effect = ReadTimeoutError(endpoint_url="https://sqs.us-east-1.amazonaws.com")
+
+    with pytest.raises(RuntimeError, match="Failed to send 1 of 1"):
+        sqs_service.send_results(_results(1), retries=1, backoff=0)
+    assert sqs_service.aws.send_message_batch.call_count == 2
+
+def test_send_results_groups_fifo_messages_by_order(sqs_service):
+    sqs_service.is_fifo = True
+    sqs_service.send_results(_results(2, order_id=1) + _results(1, order_id=2))
+
+    entries = [entry for call in sqs_service.aws.send_message_batch.call_args_list for entry in call.kwargs["Entries"]]
+    assert sorted(entry["MessageGroupId"] for entry in entries) == ["1", "2"]
+    assert all(entry["MessageDeduplicationId"] for entry in entries)
+    assert all(len({result["order_id"] for result in json.loads(entry["MessageBody"])}) == 1 for entry in entries)
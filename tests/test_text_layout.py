@@ -0,0 +1,64 @@
+from certified_builder.certified_builder import DETAILS_FONT, FONT_NAME
+from certified_builder.utils.font_registry import FontRegistry
+from certified_builder.utils.text_layout import TextLayout
+
+DETAILS = "In recognition of their participation in the 84st edition of the Python Floripa Community Meeting, held on March 29, 2025, in Florianópolis, Brazil."
+
+def _width(registry, text, font):
+    bbox = registry.textbbox(text, font)
+    return bbox[2] - bbox[0]
+
+def test_details_keep_three_lines_when_they_fit():
+    registry = FontRegistry()
+    layout = TextLayout(registry).details(DETAILS, registry.get_font(DETAILS_FONT, 18), 1920, 1720)
+
+    words = DETAILS.split()
+    third = len(words) // 3
+    assert [line for _, _, line in layout.lines] == [" ".join(words[:third]), " ".join(words[third:third * 2]), " ".join(words[third * 2:])]
+    assert [y for _, y, _ in layout.lines] == [0, 28, 56]
+
+def test_details_horizontal_extent_covers_every_line():
+    registry = FontRegistry()
+    font = registry.get_font(DETAILS_FONT, 18)
+    layout = TextLayout(registry).details(DETAILS, font, 1920, 1720)
+
+    assert layout.left == min(x + registry.textbbox(line, font)[0] for x, _, line in layout.lines)
+    assert layout.right == max(x + registry.textbbox(line, font)[2] for x, _, line in layout.lines)
+    assert 0 < layout.left < layout.right < 1920
+
+def test_long_details_are_wrapped_to_the_width():
+    registry = FontRegistry()
+    font = registry.get_font(DETAILS_FONT, 18)
+    details = " ".join([DETAILS] * 4)
+    layout = TextLayout(registry).details(details, font, 800, 600)
+
+    lines = [line for _, _, line in layout.lines]
+    assert len(lines) > 3
+    assert " ".join(lines) == " ".join(details.split())
+    assert all(_width(registry, line, font) <= 600 for line in lines)
+    assert all(0 <= x and x + _width(registry, line, font) <= 800 for x, _, line in layout.lines)
+
+def test_details_layout_and_image_are_computed_once():
+    registry = FontRegistry()
+    text_layout = TextLayout(registry)
+    font = registry.get_font(DETAILS_FONT, 18)
+
+    first = text_layout.details(DETAILS, font, 1920, 1720)
+    second = text_layout.details(DETAILS, font, 1920, 1720)
+
+    assert first is second
+    assert first.image(1920, font, (0, 0, 0)) is second.image(1920, font, (0, 0, 0))
+    assert text_layout.stats()["layout_hits"] == 1
+    assert text_layout.stats()["layout_misses"] == 1
+
+def test_fit_font_shrinks_only_long_names():
+    registry = FontRegistry()
+    text_layout = TextLayout(registry)
+    long_name = "Maria Aparecida Conceição Albuquerque Figueiredo"
+
+    assert text_layout.fit_font("Ana Souza", FONT_NAME, 70, 600, 36).size == 70
+    fitted = text_layout.fit_font(long_name, FONT_NAME, 70, 600, 20)
+    assert fitted.size < 70
+    assert _width(registry, long_name, fitted) <= 600
+    assert _width(registry, long_name, registry.get_font(FONT_NAME, fitted.size + 1)) > 600
+    assert text_layout.fit_font(long_name, FONT_NAME, 70, 50, 36).size == 36
@@ -0,0 +1,78 @@
+import struct
+from io import BytesIO
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from certified_builder.certified_builder import DETAILS_FONT, FONT_NAME
+from certified_builder.utils.truetype import PDF_TABLES, WEB_TABLES, TrueTypeFont, load_font
+
+def _draw(font, text):
+    image = Image.new("L", (900, 120), 0)
+    ImageDraw.Draw(image).text((5, 5), text, fill=255, font=font)
+    return image.tobytes()
+
+def _tables(data):
+    count = struct.unpack_from(">H", data, 4)[0]
+    return {struct.unpack_from(">4s", data, 12 + 16 * index)[0].decode("latin-1") for index in range(count)}
+
+def _checksum(data):
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+def test_reads_metrics_and_character_map():
+    font = load_font(FONT_NAME)
+    pillow = ImageFont.truetype(FONT_NAME, font.units_per_em)
+
+    assert font.postscript_name == "PinyonScript-Regular"
+    assert font.glyph_id("☃") == 0
+    for char in "AaçÉ 1-":
+        assert font.glyph_id(char) != 0
+        assert font.advance_width(font.glyph_id(char)) == pillow.getlength(char)
+    assert load_font(FONT_NAME) is font
+
+def test_subset_keeps_glyph_ids_and_outlines():
+    font = TrueTypeFont(DETAILS_FONT)
+    text = "Conceição 2025"
+
+    full = font.subset(range(font.glyph_count), WEB_TABLES)
+    subset = font.subset([font.glyph_id(char) for char in text], WEB_TABLES)
+
+    # Same outlines as the original file when every glyph is kept
+    assert _draw(ImageFont.truetype(BytesIO(full), 40), text) == _draw(ImageFont.truetype(DETAILS_FONT, 40), text)
+    assert ImageFont.truetype(BytesIO(subset), 40).getbbox(text) == ImageFont.truetype(DETAILS_FONT, 40).getbbox(text)
+    assert len(subset) < len(full) / 2
+
+def test_subset_writes_only_the_requested_tables():
+    font = load_font(FONT_NAME)
+
+    subset = font.subset([font.glyph_id("A")], PDF_TABLES)
+
+    assert _tables(subset) == set(PDF_TABLES)
+    # head.checkSumAdjustment makes the whole file sum to the magic number
+    assert _checksum(subset) == 0xB1B0AFBA
+
+def _corrupted(tmp_path, mutate):
+    data = bytearray(open(DETAILS_FONT, "rb").read())
+    mutate(TrueTypeFont(DETAILS_FONT), data)
+    path = tmp_path / "corrupted.ttf"
+    path.write_bytes(data)
+    return str(path)
+
+def test_truncated_font_is_rejected(tmp_path):
+    path = _corrupted(tmp_path, lambda font, data: data.__delitem__(slice(len(data) // 2, None)))
+
+    with pytest.raises(ValueError, match="past the end of the file"):
+        TrueTypeFont(path)
+
+def test_composite_glyph_running_past_its_end_is_rejected(tmp_path):
+    def mutate(font, data):
+        glyph_id = font.glyph_id("é")
+        start = font.tables["glyf"][0] + font._loca[glyph_id]
+        end = font.tables["glyf"][0] + font._loca[glyph_id + 1]
+        assert struct.unpack_from(">h", data, start)[0] < 0
+        # Every component now announces another one after it
+        data[start + 10:end] = b"\xff" * (end - start - 10)
+    font = TrueTypeFont(_corrupted(tmp_path, mutate))
+
+    with pytest.raises(ValueError, match="composite glyph"):
+        font.subset([font.glyph_id("é")])
+    assert font.subset([font.glyph_id("e")])
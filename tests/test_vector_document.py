@@ -0,0 +1,145 @@
+import base64
+import json
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+from certified_builder.certified_builder import CertifiedBuilder, DETAILS_FONT, FONT_NAME, VALIDATION_CODE
+from certified_builder.prepared_template import PreparedTemplate
+from certified_builder.utils.encoder import get_output_profile
+from certified_builder.utils.font_registry import get_font
+from certified_builder.utils.vector_document import TextRun, VectorCertificate, encode_vector
+from models.certificate import Certificate
+from models.event import Event
+from models.participant import Participant
+
+# Text placement of the golden certificates; regenerate with UPDATE_GOLDEN=1 after an intended layout change
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "vector_text_runs.json")
+SVG = "{http://www.w3.org/2000/svg}"
+CASES = {
+    "1080p": ("Jardel", "Godinho", (1920, 1080)),
+    "a4_300dpi": ("Conceição &", "Évora", (3508, 2480)),
+    # Shrunk to fit the certificate width
+    "long_name": ("Maximiliano Wolfeschlegelsteinhausen", "Bergerdorff-Sant'Anna", (1000, 700)),
+}
+# Font families in drawing order: name, details, validation code
+FAMILIES = {"f0": FONT_NAME, "f1": DETAILS_FONT, "f2": VALIDATION_CODE}
+
+def _participant(case, output_profile="svg"):
+    first_name, last_name, _ = CASES[case]
+    certificate = Certificate(
+        details="In recognition of their participation in the 84st edition of the Python Floripa Community Meeting, held on March 29, 2025, in Florianópolis, Brazil.",
+        logo="https://example.com/logo.png",
+        background="https://example.com/background.png",
+        output_profile=output_profile,
+    )
+    event = Event(order_id=452, product_id=316, product_name="Evento de Teste", date=datetime(2025, 3, 26, 20, 55, 25))
+    return Participant(first_name=first_name, last_name=last_name, email="pessoa@example.com", phone="(48) 98866-7447", cpf="", certificate=certificate, event=event, validation_code="8cbbdf02e")
+
+def _template(case):
+    return PreparedTemplate(Image.new("RGBA", CASES[case][2], "white"), Image.new("RGBA", (150, 150), "white"))
+
+def _svg_runs(data):
+    """Return the placement of every text element of an SVG certificate."""
+    return [
+        {
+            "text": element.text,
+            "family": element.get("font-family"),
+            "size": int(element.get("font-size")),
+            "x": [float(value) for value in element.get("x").split()],
+            "baseline": float(element.get("y")),
+        }
+        for element in ET.fromstring(data).iter(f"{SVG}text")
+    ]
+
+def _golden():
+    with open(GOLDEN, encoding="utf-8") as f:
+        return json.load(f)
+
+def test_svg_text_placement_matches_the_golden_file():
+    builder = CertifiedBuilder()
+    runs = {}
+    for case in CASES:
+        certificate = builder.render_certificate(_participant(case), _template(case))
+        runs[case] = _svg_runs(encode_vector(certificate, get_output_profile("svg")).getvalue())
+    if os.environ.get("UPDATE_GOLDEN"):
+        # One text run per line keeps the diff of a layout change readable
+        cases = [
+            f" {json.dumps(case)}: [\n" + ",\n".join(f"  {json.dumps(run, ensure_ascii=False)}" for run in case_runs) + "\n ]"
+            for case, case_runs in runs.items()
+        ]
+        with open(GOLDEN, "w", encoding="utf-8") as f:
+            f.write("{\n" + ",\n".join(cases) + "\n}\n")
+
+    assert runs == _golden()
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_golden_placement_matches_the_raster_render(case):
+    template = _template(case)
+    raster = CertifiedBuilder().render_certificate(_participant(case, "png_fast"), template)
+    # Black text on white: the difference is the coverage of the raster glyphs
+    ink = ImageChops.difference(raster.convert("RGB"), template.image.convert("RGB")).convert("L")
+
+    # Every glyph set on its own at the x and baseline of the golden file
+    placed = Image.new("L", template.size, 0)
+    draw = ImageDraw.Draw(placed)
+    for run in _golden()[case]:
+        font = get_font(FAMILIES[run["family"]], run["size"])
+        for char, x in zip(run["text"], run["x"]):
+            draw.text((x, run["baseline"]), char, fill=255, font=font, anchor="ls")
+
+    assert placed.getbbox() == ink.getbbox()
+    # Only antialiasing differs, no pixel is covered in one and not in the other
+    assert max(ImageChops.difference(placed, ink).getdata()) < 128
+
+def test_text_runs_follow_the_rasterizer_advances():
+    font = get_font(FONT_NAME, 70)
+    run = TextRun("Água Vítor", font, (10.5, 20), (0, 0, 0))
+
+    pens = [sum(run.advances()[:index]) for index in range(len(run.text) + 1)]
+
+    assert pens == [font.getlength(run.text[:index]) for index in range(len(run.text) + 1)]
+    assert run.baseline == 20 + font.getmetrics()[0]
+
+def test_svg_embeds_the_template_once_and_font_subsets():
+    builder = CertifiedBuilder()
+    template = _template("1080p")
+
+    certificates = [builder.render_certificate(_participant("1080p"), template) for _ in range(2)]
+    data = encode_vector(certificates[0], get_output_profile("svg")).getvalue()
+
+    assert all(isinstance(certificate, VectorCertificate) for certificate in certificates)
+    # The template PNG is encoded once and shared by every certificate
+    assert certificates[0].background is certificates[1].background is template.background_png()
+    root = ET.fromstring(data)
+    images = list(root.iter(f"{SVG}image"))
+    assert len(images) == 1
+    assert images[0].get("{http://www.w3.org/1999/xlink}href") == "data:image/png;base64," + base64.b64encode(template.background_png()).decode()
+    assert root.find(f"{SVG}style").text.count("@font-face") == 3
+
+def test_svg_embeds_the_template_even_when_built_from_urls():
+    key = ("https://example.com/background.png", "https://example.com/logo.png")
+    template = PreparedTemplate(Image.new("RGBA", CASES["1080p"][2], "white"), Image.new("RGBA", (150, 150), "white"), key)
+
+    data = encode_vector(CertifiedBuilder().render_certificate(_participant("1080p"), template), get_output_profile("svg")).getvalue()
+
+    images = list(ET.fromstring(data).iter(f"{SVG}image"))
+    assert [image.get("{http://www.w3.org/1999/xlink}href") for image in images] == ["data:image/png;base64," + base64.b64encode(template.background_png()).decode()]
+
+def test_svg_linked_references_the_template_urls():
+    builder = CertifiedBuilder()
+    key = ("https://example.com/background.png?a=1&b=2", "https://example.com/logo.png")
+    sizes = {}
+    for case in ("1080p", "a4_300dpi"):
+        template = PreparedTemplate(Image.new("RGBA", CASES[case][2], "white"), Image.new("RGBA", (150, 150), "white"), key)
+        data = encode_vector(builder.render_certificate(_participant("1080p"), template), get_output_profile("svg_linked")).getvalue()
+        images = list(ET.fromstring(data).iter(f"{SVG}image"))
+
+        assert [image.get("{http://www.w3.org/1999/xlink}href") for image in images] == list(key)
+        assert [image.get("width") for image in images] == [str(CASES[case][2][0]), "150"]
+        assert template._background_png is None
+        sizes[case] = len(data)
+
+    # Same text on a template 4x larger: only the text placement changes the size
+    assert abs(sizes["a4_300dpi"] - sizes["1080p"]) < 1024